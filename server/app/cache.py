@@ -0,0 +1,324 @@
+from __future__ import annotations
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """按 key 合并并发调用：同一 key 同一时刻只执行一次 fn，其余调用者等待并共享结果（或异常）。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def in_flight(self, key: Optional[str] = None) -> int:
+        with self._lock:
+            if key is not None:
+                return 1 if key in self._calls else 0
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        return {"executed": self.executed, "shared": self.shared, "inFlight": self.in_flight()}
+
+
+def approx_size(obj: Any, _depth: int = 0) -> int:
+    """粗略估算对象占用字节数（递归容器 / __dict__ / __slots__，深度受限）。"""
+    size = sys.getsizeof(obj, 64)
+    if _depth >= 8:
+        return size
+    d = _depth + 1
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        return size + sum(approx_size(k, d) + approx_size(v, d) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(approx_size(x, d) for x in obj)
+    attrs = getattr(obj, "__dict__", None)
+    if isinstance(attrs, dict):
+        return size + approx_size(attrs, d)
+    slots = getattr(type(obj), "__slots__", None)
+    if slots:
+        return size + sum(approx_size(getattr(obj, n, None), d) for n in slots)
+    return size
+
+
+class BoundedCache:
+    """有界 LRU + TTL 缓存。
+
+    - max_entries / max_bytes（近似字节数）任一超限即按 LRU 淘汰；
+    - 每个条目可单独指定 TTL（None 表示不过期，仅受容量约束）；
+    - 统计命中、未命中、淘汰与过期次数；线程安全。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 1000,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        sizeof: Callable[[Any], int] = approx_size,
+    ) -> None:
+        self.name = name
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = int(max_bytes) if max_bytes else None
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._lock = threading.RLock()
+        # key -> (value, expires_at | None, size)
+        self._data: "OrderedDict[str, tuple[Any, Optional[float], int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            value, exp, _ = item
+            if exp is not None and exp <= time.time():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: str, default: Any = None) -> Any:
+        """读取但不计入命中统计、不调整 LRU 顺序（用于状态展示）。"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or (item[1] is not None and item[1] <= time.time()):
+                return default
+            return item[0]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        t = ttl if ttl is not None else self.ttl
+        exp = (time.time() + t) if t is not None else None
+        size = self._sizeof(value) if self.max_bytes else 0
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, exp, size)
+            self._bytes += size
+            self._evict()
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            self._remove(key)
+            return item[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._data.keys())
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _evict(self) -> None:
+        while len(self._data) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes and len(self._data) > 1):
+            key = next(iter(self._data))
+            self._remove(key)
+            self.evictions += 1
+
+    # dict 风格访问（不过期条目），便于替换原有 dict 缓存
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            item = self._data.get(key)  # type: ignore[arg-type]
+            return item is not None and (item[1] is None or item[1] > time.time())
+
+    def __getitem__(self, key: str) -> Any:
+        sentinel = object()
+        v = self.get(key, sentinel)
+        if v is sentinel:
+            raise KeyError(key)
+        return v
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.set(key, value)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "entries": len(self._data),
+                "maxEntries": self.max_entries,
+                "approxBytes": self._bytes if self.max_bytes else None,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class RedisL2:
+    """可选的 Redis 二级缓存：多个 worker / 节点共享同一份目录数据。
+
+    值格式：1 字节头（b"j" 原始 JSON / b"z" zlib 压缩 JSON）+ `[fetched_at, payload]` 紧凑 JSON。
+    Redis 不可用时所有操作静默失败，并在 `down_seconds` 内跳过 Redis（避免每个请求都等超时）。
+    """
+
+    def __init__(self, client: Any, prefix: str = "simigo:catalog:", compress_min_bytes: int = 1024, down_seconds: float = 30.0) -> None:
+        self.client = client
+        self.prefix = prefix
+        self.compress_min_bytes = compress_min_bytes
+        self.down_seconds = down_seconds
+        self._down_until = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+        self.bytes_written = 0
+
+    def _available(self) -> bool:
+        return time.time() >= self._down_until
+
+    def _failed(self) -> None:
+        self.errors += 1
+        self._down_until = time.time() + self.down_seconds
+
+    @staticmethod
+    def encode(fetched_at: float, payload: Any, compress_min_bytes: int = 1024) -> bytes:
+        raw = json.dumps([round(fetched_at, 3), payload], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if len(raw) >= compress_min_bytes:
+            return b"z" + zlib.compress(raw, 6)
+        return b"j" + raw
+
+    @staticmethod
+    def decode(blob: bytes) -> tuple[float, Any]:
+        head, body = blob[:1], blob[1:]
+        if head == b"z":
+            body = zlib.decompress(body)
+        elif head != b"j":
+            raise ValueError("unknown cache encoding")
+        fetched_at, payload = json.loads(body.decode("utf-8"))
+        return float(fetched_at), payload
+
+    def get(self, key: str) -> Optional[tuple[float, Any]]:
+        """返回 (fetched_at, payload)；未命中或 Redis 不可用时返回 None。"""
+        if not self._available():
+            return None
+        try:
+            blob = self.client.get(self.prefix + key)
+        except Exception:
+            self._failed()
+            return None
+        if not blob:
+            self.misses += 1
+            return None
+        try:
+            if isinstance(blob, str):
+                blob = blob.encode("latin-1")
+            value = self.decode(blob)
+        except Exception:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key: str, fetched_at: float, payload: Any, ttl: Optional[float]) -> None:
+        """ttl=None 时不设过期（由 Redis 的 maxmemory 淘汰策略约束）。"""
+        if not self._available():
+            return
+        try:
+            blob = self.encode(fetched_at, payload, self.compress_min_bytes)
+            if ttl is None:
+                self.client.set(self.prefix + key, blob)
+            else:
+                self.client.setex(self.prefix + key, max(1, int(ttl)), blob)
+            self.writes += 1
+            self.bytes_written += len(blob)
+        except Exception:
+            self._failed()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors,
+            "bytesWritten": self.bytes_written,
+            "available": self._available(),
+        }
+
+
+def redis_l2_from_env(prefix: str = "simigo:catalog:") -> Optional[RedisL2]:
+    """CATALOG_REDIS_URL（回退 REDIS_URL）配置时创建 Redis 二级缓存；redis 未安装或配置为空时返回 None。"""
+    url = os.getenv("CATALOG_REDIS_URL") or os.getenv("REDIS_URL")
+    if not url or os.getenv("CATALOG_REDIS_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    try:
+        timeout = float(os.getenv("CATALOG_REDIS_TIMEOUT_MS", "200")) / 1000.0
+    except Exception:
+        timeout = 0.2
+    try:
+        import importlib
+        mod = importlib.import_module("redis")
+        client = mod.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+    except Exception:
+        return None
+    return RedisL2(client, prefix=prefix)
@@ -24,10 +24,24 @@ def _get_database_url() -> str:
 
 DATABASE_URL = _get_database_url()
 
+def _pool_kwargs() -> dict:
+    # 同步路由在线程池中并发执行，连接池大小可按 SERVER_THREADPOOL_SIZE 调整
+    kw: dict = {}
+    for env_name, key in (("DB_POOL_SIZE", "pool_size"), ("DB_MAX_OVERFLOW", "max_overflow")):
+        raw = os.getenv(env_name)
+        if raw:
+            try:
+                kw[key] = int(raw)
+            except Exception:
+                pass
+    return kw
+
+
 # Create engine (pooling suitable for sync SQLAlchemy)
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,
+    **_pool_kwargs(),
 )
 
 # Ensure SQLite enforces foreign key ONDELETE behaviors
@@ -53,6 +67,7 @@ def init_db():
     _ensure_user_profile_columns()
     _ensure_user_kyc_columns()
     _ensure_order_reference_email_columns()
+    _ensure_sync_cursor_columns()
     _seed_settings()
     _seed_i18n_catalog_from_files()
 
@@ -140,6 +155,26 @@ def _ensure_order_reference_email_columns():
             except Exception:
                 pass
 
+def _ensure_sync_cursor_columns():
+    try:
+        inspector = inspect(engine)
+        cols = {c["name"] for c in inspector.get_columns("sync_cursors")}
+    except Exception:
+        return
+    to_add: list[tuple[str, str]] = []
+    if "lease_owner" not in cols:
+        to_add.append(("lease_owner", "VARCHAR(64)"))
+    if "lease_until" not in cols:
+        to_add.append(("lease_until", "TIMESTAMP"))
+    if not to_add:
+        return
+    with engine.begin() as conn:
+        for name, type_sql in to_add:
+            try:
+                conn.execute(text(f"ALTER TABLE sync_cursors ADD COLUMN {name} {type_sql}"))
+            except Exception:
+                pass
+
 def _drop_operator_i18n_tables():
     try:
         with engine.begin() as conn:
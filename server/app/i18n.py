@@ -2,7 +2,12 @@ from __future__ import annotations
 from typing import Optional, List
 from .db import SessionLocal
 from .models.orm import I18nCountryName, I18nRegionName, I18nBundleName
+import hashlib
+import json
+import os
 import re
+import threading
+import time
 
 LANG_WHITELIST: set[str] = {
     "en","zh-Hans","zh-Hant","ja","ko","th","id","es","pt","ms","vi","ar"
@@ -152,66 +157,266 @@ _TERRITORY_ALIASES: dict[str, str] = {
     "gb": "United Kingdom",
 }
 
-def translate_country(code: str, name: Optional[str], lang: str) -> str:
-    c = (code or "").upper()
-    if not c:
-        return name or ""
-    # DB lookup first
-    try:
-        db = SessionLocal()
-        try:
-            rows = db.query(I18nCountryName).filter(I18nCountryName.lang_code == lang).filter((I18nCountryName.iso2_code == c) | (I18nCountryName.iso3_code == c)).all()
-            if rows:
-                row = next((r for r in rows if (r.iso2_code or "").upper() == c), rows[0])
-                val = row.name
-                try:
-                    if lang != "en" and val and re.fullmatch(r"[\w\s\-\(\)]+", val):
-                        from babel import Locale  # type: ignore
-                        loc = Locale.parse(lang.replace('-', '_'))
-                        iso2 = (row.iso2_code or row.iso3_code or "").upper()
-                        if len(iso2) == 3:
-                            iso2 = None
-                        t = loc.territories.get(iso2 or c)
-                        if t:
-                            return t
-                except Exception:
-                    pass
-                # Fallback to static mapping when DB contains non-localized value or Babel is unavailable
-                try:
-                    iso2 = (row.iso2_code or "").upper()
-                    iso3 = (row.iso3_code or "").upper()
-                    m = COUNTRY_NAMES.get(lang) or {}
-                    alt = m.get(c) or m.get(iso2) or m.get(iso3)
-                    if alt:
-                        return alt
-                except Exception:
-                    pass
-                return val
-        finally:
-            db.close()
-    except Exception:
-        pass
-    # Fallback via Babel CLDR when possible (iso2 only)
+
+# ===== Babel CLDR 地区名表（每语言预计算） =====
+# 正向 iso2 -> 本地化名称；反向 规范化名称 -> iso2。
+# 启动时为 LANG_WHITELIST 全量构建，其他语言首次访问时懒构建；Babel 不可用时为空表。
+def _territory_key(s: Optional[str]) -> str:
+    return str(s or "").replace("\u00a0", " ").strip().lower()
+
+
+class TerritoryTable:
+    __slots__ = ("lang", "names", "by_name")
+
+    def __init__(self, lang: str, names: Optional[dict[str, str]] = None) -> None:
+        self.lang = lang
+        self.names: dict[str, str] = dict(names or {})
+        self.by_name: dict[str, str] = {}
+        for iso2, name in self.names.items():
+            self.by_name.setdefault(_territory_key(name), iso2)
+
+
+_TERRITORY_TABLES: dict[str, TerritoryTable] = {}
+_TERRITORY_LOCK = threading.Lock()
+
+
+def _build_territory_table(lang: str) -> TerritoryTable:
     try:
         from babel import Locale  # type: ignore
         loc = Locale.parse(lang.replace('-', '_'))
-        iso2 = None
+        names = {str(k).upper(): str(v) for k, v in (loc.territories or {}).items()}
+    except Exception:
+        names = {}
+    return TerritoryTable(lang, names)
+
+
+def territory_table(lang: Optional[str]) -> TerritoryTable:
+    key = lang or "en"
+    tbl = _TERRITORY_TABLES.get(key)
+    if tbl is not None:
+        return tbl
+    with _TERRITORY_LOCK:
+        tbl = _TERRITORY_TABLES.get(key)
+        if tbl is None:
+            tbl = _build_territory_table(key)
+            _TERRITORY_TABLES[key] = tbl
+        return tbl
+
+
+def load_territory_tables() -> None:
+    for lang in LANG_WHITELIST:
+        territory_table(lang)
+
+
+def territory_name(code: Optional[str], lang: str) -> Optional[str]:
+    """ISO2 -> CLDR territory name in `lang`."""
+    return territory_table(lang).names.get(str(code or "").upper())
+
+
+def territory_code(name: Optional[str], lang: str = "en") -> Optional[str]:
+    """Localized territory name -> ISO2 (case-insensitive exact match)."""
+    return territory_table(lang).by_name.get(_territory_key(name))
+
+
+# ===== 翻译快照（内存只读，整体替换） =====
+# translate_* 在请求路径上只做字典查找；快照在启动时加载，
+# /i18n/*/upsert 提交后重建并原子替换引用，读侧无需加锁。
+class TranslationSnapshot:
+    __slots__ = ("version", "countries", "countries_iso3", "iso3_to_iso2", "regions", "bundles", "en_country_by_name", "digest")
+
+    def __init__(self, version: int = 0) -> None:
+        self.version = version
+        # 翻译内容摘要：与进程内版本号不同，跨 worker / 重启稳定（用于派生 ETag）
+        self.digest = ""
+        # lang -> ISO2 -> (iso2, iso3, name)
+        self.countries: dict[str, dict[str, tuple[str, str, str]]] = {}
+        # lang -> ISO3 -> (iso2, iso3, name)
+        self.countries_iso3: dict[str, dict[str, tuple[str, str, str]]] = {}
+        # ISO3 -> ISO2（跨语言）
+        self.iso3_to_iso2: dict[str, str] = {}
+        # lang -> region_code -> name
+        self.regions: dict[str, dict[str, str]] = {}
+        # lang -> bundle_code -> (marketing_name, name)
+        self.bundles: dict[str, dict[str, tuple[str, str]]] = {}
+        # 英文国家名 -> (iso2, iso3, name)
+        self.en_country_by_name: dict[str, tuple[str, str, str]] = {}
+
+
+_SNAPSHOT: Optional[TranslationSnapshot] = None
+_SNAPSHOT_LOCK = threading.Lock()
+_SNAPSHOT_VERSION = 0
+_SNAPSHOT_RETRY_AT = 0.0
+_SNAPSHOT_RETRY_SECONDS = 30.0
+
+
+def _build_snapshot(version: int) -> TranslationSnapshot:
+    snap = TranslationSnapshot(version)
+    db = SessionLocal()
+    try:
+        for iso2, iso3, lang, name in db.query(I18nCountryName.iso2_code, I18nCountryName.iso3_code, I18nCountryName.lang_code, I18nCountryName.name):
+            i2 = (iso2 or "").upper()
+            i3 = (iso3 or "").upper()
+            rec = (i2, i3, name or "")
+            if i2:
+                snap.countries.setdefault(lang, {}).setdefault(i2, rec)
+            if i3:
+                snap.countries_iso3.setdefault(lang, {}).setdefault(i3, rec)
+                if i2:
+                    snap.iso3_to_iso2.setdefault(i3, i2)
+            if lang == "en" and name:
+                snap.en_country_by_name.setdefault(name, rec)
+        for code, lang, name in db.query(I18nRegionName.region_code, I18nRegionName.lang_code, I18nRegionName.name):
+            snap.regions.setdefault(lang, {}).setdefault(code, name)
+        for code, lang, mkt, name in db.query(I18nBundleName.bundle_code, I18nBundleName.lang_code, I18nBundleName.marketing_name, I18nBundleName.name):
+            snap.bundles.setdefault(lang, {}).setdefault(code, (mkt or "", name or ""))
+    finally:
+        db.close()
+    raw = json.dumps([snap.countries, snap.regions, snap.bundles], ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    snap.digest = hashlib.md5(raw.encode("utf-8")).hexdigest()
+    return snap
+
+
+def reload_translations() -> TranslationSnapshot:
+    """Rebuild the translation snapshot from DB and swap it in atomically."""
+    global _SNAPSHOT, _SNAPSHOT_VERSION
+    with _SNAPSHOT_LOCK:
+        snap = _build_snapshot(_SNAPSHOT_VERSION + 1)
+        _SNAPSHOT_VERSION = snap.version
+        _SNAPSHOT = snap
+        return snap
+
+
+def translation_snapshot() -> TranslationSnapshot:
+    """Current snapshot; lazily loaded when startup did not run (scripts/tests)."""
+    global _SNAPSHOT_RETRY_AT
+    snap = _SNAPSHOT
+    if snap is not None:
+        return snap
+    now = time.time()
+    if now < _SNAPSHOT_RETRY_AT:
+        return TranslationSnapshot()
+    try:
+        return reload_translations()
+    except Exception:
+        # 表未初始化等情况：返回空快照，避免每个请求都重试打 DB
+        _SNAPSHOT_RETRY_AT = now + _SNAPSHOT_RETRY_SECONDS
+        return TranslationSnapshot()
+
+
+def translations_version() -> int:
+    return _SNAPSHOT_VERSION
+
+
+def translations_digest() -> str:
+    return translation_snapshot().digest
+
+
+# ===== 国家代码表：iso2 <-> iso3 <-> 各语言名称（内存查找，随翻译快照版本重建） =====
+_COUNTRIES_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "esim_data", "esim_countries.json")
+
+
+def _load_country_file() -> list[tuple[str, str, str]]:
+    try:
+        with open(_COUNTRIES_FILE, "r", encoding="utf-8") as f:
+            j = json.load(f)
+        items = ((j or {}).get("data") or {}).get("countries") or []
+    except Exception:
+        return []
+    out: list[tuple[str, str, str]] = []
+    for c in items:
+        iso2 = str(c.get("iso2_code") or "").upper()
+        iso3 = str(c.get("iso3_code") or "").upper()
+        if iso2 or iso3:
+            out.append((iso2, iso3, str(c.get("country_name") or "").strip()))
+    return out
+
+
+_COUNTRY_FILE_ROWS: Optional[list[tuple[str, str, str]]] = None
+
+
+class CountryCodeTable:
+    __slots__ = ("version", "iso2_to_iso3", "iso3_to_iso2", "by_name")
+
+    def __init__(self, version: int, snap: TranslationSnapshot, file_rows: list[tuple[str, str, str]]) -> None:
+        self.version = version
+        self.iso2_to_iso3: dict[str, str] = {}
+        self.iso3_to_iso2: dict[str, str] = {}
+        # 规范化名称（任意语言）-> iso2
+        self.by_name: dict[str, str] = {}
+        for iso2, iso3, name in file_rows:
+            self._add(iso2, iso3, name)
+        for lang_map in snap.countries.values():
+            for iso2, iso3, name in lang_map.values():
+                self._add(iso2, iso3, name)
+        for lang_map in snap.countries_iso3.values():
+            for iso2, iso3, name in lang_map.values():
+                self._add(iso2, iso3, name)
+
+    def _add(self, iso2: str, iso3: str, name: str) -> None:
+        if iso2 and iso3:
+            self.iso2_to_iso3.setdefault(iso2, iso3)
+            self.iso3_to_iso2.setdefault(iso3, iso2)
+        key = _territory_key(name)
+        code = iso2 or self.iso3_to_iso2.get(iso3, "")
+        if key and code:
+            self.by_name.setdefault(key, code)
+
+    def iso3(self, code: Optional[str]) -> Optional[str]:
+        c = str(code or "").upper()
+        if len(c) == 3:
+            return c if c in self.iso3_to_iso2 else None
+        return self.iso2_to_iso3.get(c)
+
+    def iso2(self, code: Optional[str]) -> Optional[str]:
+        c = str(code or "").upper()
         if len(c) == 2:
-            iso2 = c
-        elif len(c) == 3:
-            db2 = SessionLocal()
-            try:
-                r = db2.query(I18nCountryName).filter(I18nCountryName.iso3_code == c).first()
-                if r and r.iso2_code:
-                    iso2 = (r.iso2_code or "").upper()
-            finally:
-                db2.close()
-        if iso2:
-            t = loc.territories.get(iso2)
+            return c if c in self.iso2_to_iso3 else None
+        return self.iso3_to_iso2.get(c)
+
+    def code_for_name(self, name: Optional[str]) -> Optional[str]:
+        return self.by_name.get(_territory_key(name))
+
+
+_COUNTRY_CODES: Optional[CountryCodeTable] = None
+
+
+def country_code_table() -> CountryCodeTable:
+    """iso2/iso3/名称查找表；esim_countries.json 只读一次，i18n 表数据来自翻译快照。"""
+    global _COUNTRY_CODES, _COUNTRY_FILE_ROWS
+    snap = translation_snapshot()
+    table = _COUNTRY_CODES
+    if table is not None and table.version == snap.version:
+        return table
+    if _COUNTRY_FILE_ROWS is None:
+        _COUNTRY_FILE_ROWS = _load_country_file()
+    table = CountryCodeTable(snap.version, snap, _COUNTRY_FILE_ROWS)
+    _COUNTRY_CODES = table
+    return table
+
+def translate_country(code: str, name: Optional[str], lang: str) -> str:
+    c = (code or "").upper()
+    if not c:
+        return name or ""
+    snap = translation_snapshot()
+    row = (snap.countries.get(lang) or {}).get(c) or (snap.countries_iso3.get(lang) or {}).get(c)
+    if row:
+        iso2, iso3, val = row
+        if lang != "en" and val and re.fullmatch(r"[\w\s\-\(\)]+", val):
+            t = territory_name(iso2 or c, lang)
             if t:
                 return t
-    except Exception:
-        pass
+        # Fallback to static mapping when DB contains non-localized value or Babel is unavailable
+        m = COUNTRY_NAMES.get(lang) or {}
+        alt = m.get(c) or m.get(iso2) or m.get(iso3)
+        if alt:
+            return alt
+        return val
+    # Fallback via Babel CLDR when possible (iso2 only)
+    iso2 = c if len(c) == 2 else snap.iso3_to_iso2.get(c)
+    if iso2:
+        t = territory_name(iso2, lang)
+        if t:
+            return t
     # Fallback to static mapping then given name/code
     m = COUNTRY_NAMES.get(lang) or COUNTRY_NAMES.get("en", {})
     return m.get(c, name or c)
@@ -220,19 +425,10 @@ def translate_region(code: Optional[str], name: Optional[str], lang: str) -> str
     key = str(code or "").lower()
     if not key:
         return name or ""
-    try:
-        db = SessionLocal()
-        try:
-            row = db.query(I18nRegionName).filter(I18nRegionName.lang_code == lang, I18nRegionName.region_code == key).first()
-            if row:
-                return row.name
-            row2 = db.query(I18nRegionName).filter(I18nRegionName.lang_code == lang, I18nRegionName.region_code == "default").first()
-            if row2:
-                return row2.name
-        finally:
-            db.close()
-    except Exception:
-        pass
+    names = translation_snapshot().regions.get(lang) or {}
+    val = names.get(key) or names.get("default")
+    if val:
+        return val
     m = REGION_NAMES.get(lang) or REGION_NAMES.get("en", {})
     return m.get(key, name or key)
 
@@ -241,16 +437,9 @@ def translate_marketing(name: Optional[str], lang: str, bundle_code: Optional[st
     # Prefer DB by bundle_code when available
     code = (bundle_code or "").strip()
     if code:
-        try:
-            db = SessionLocal()
-            try:
-                row = db.query(I18nBundleName).filter(I18nBundleName.lang_code == lang, I18nBundleName.bundle_code == code).first()
-                if row and (row.marketing_name or row.name):
-                    return (row.marketing_name or row.name)
-            finally:
-                db.close()
-        except Exception:
-            pass
+        row = (translation_snapshot().bundles.get(lang) or {}).get(code)
+        if row and (row[0] or row[1]):
+            return (row[0] or row[1])
     # Attempt canonical mapping across all languages to derive the English key
     # Strip trailing data amount / days segments to isolate the place/region name
     import re as _re
@@ -274,46 +463,30 @@ def translate_marketing(name: Optional[str], lang: str, bundle_code: Optional[st
     val = m.get(lead) or m.get(base)
     if val:
         return val
-    try:
-        from babel import Locale  # type: ignore
-        loc_en = Locale.parse("en")
-        loc_t = Locale.parse(lang.replace('-', '_'))
-        base_norm = lead.strip().lower().replace("+", "").replace("plus", "").strip()
-        if base_norm in _REGION_ALIASES:
-            rc = _REGION_ALIASES[base_norm]
-            return translate_region(rc, base, lang)
-        ali = _TERRITORY_ALIASES.get(base_norm)
-        if ali:
-            base_norm = ali.strip().lower()
-        target = None
-        for iso2, en_name in (loc_en.territories or {}).items():
-            if str(en_name).strip().lower() == base_norm:
-                target = (loc_t.territories or {}).get(iso2)
-                break
-        if target:
-            if "+" in base:
-                return target + "+"
-            return target
-    except Exception:
-        pass
+    if base_norm in _REGION_ALIASES:
+        rc = _REGION_ALIASES[base_norm]
+        return translate_region(rc, base, lang)
+    ali = _TERRITORY_ALIASES.get(base_norm)
+    if ali:
+        base_norm = ali.strip().lower()
+    iso2 = territory_code(base_norm, "en")
+    target = territory_name(iso2, lang) if iso2 else None
+    if target:
+        if "+" in base:
+            return target + "+"
+        return target
     # Fallback via DB English name -> ISO code -> translate_country when Babel not available
     try:
         canon_en = (_TERRITORY_ALIASES.get(base_norm) or base_norm).strip()
-        from app.db import SessionLocal, I18nCountryName  # type: ignore
-        db = SessionLocal()
-        try:
-            row = db.query(I18nCountryName).filter(I18nCountryName.lang_code == "en", I18nCountryName.name == canon_en).first()
-            if not row:
-                row = db.query(I18nCountryName).filter(I18nCountryName.lang_code == "en", I18nCountryName.name == canon_en.title()).first()
-            if row:
-                code = (row.iso2_code or row.iso3_code or "")
-                t = translate_country(code, row.name, lang)
-                if t:
-                    if "+" in base:
-                        return t + "+"
-                    return t
-        finally:
-            db.close()
+        by_name = translation_snapshot().en_country_by_name
+        row = by_name.get(canon_en) or by_name.get(canon_en.title())
+        if row:
+            code = (row[0] or row[1] or "")
+            t = translate_country(code, row[2], lang)
+            if t:
+                if "+" in base:
+                    return t + "+"
+                return t
     except Exception:
         pass
     return base
@@ -421,16 +594,9 @@ def translate_bundle_name(
 ) -> str:
     code = (bundle_code or "").strip()
     if code:
-        try:
-            db = SessionLocal()
-            try:
-                row = db.query(I18nBundleName).filter(I18nBundleName.lang_code == lang, I18nBundleName.bundle_code == code).first()
-                if row and row.name:
-                    return row.name
-            finally:
-                db.close()
-        except Exception:
-            pass
+        row = (translation_snapshot().bundles.get(lang) or {}).get(code)
+        if row and row[1]:
+            return row[1]
     mkt = translate_marketing(marketing_name or name, lang, bundle_code)
     if unlimited and validity_days is not None:
         dword = DAYS_WORD.get(lang) or DAYS_WORD.get("en", "Days")
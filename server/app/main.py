@@ -7,9 +7,8 @@ from fastapi import Query
 from fastapi import FastAPI, HTTPException, Request, Response, Depends, Header
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
 import hashlib
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
 import httpx
 
@@ -61,16 +60,23 @@ from .models.dto import (
     I18nCountryUpsertBody,
     I18nRegionUpsertBody,
     I18nBundleUpsertBody,
+    AliasCountriesDTO,
+    AliasRegionsDTO,
 )
 from .services.order_service import OrderService
 from .services.auth_service import AuthService
 from .services.catalog_service import CatalogService
-from .i18n import resolve_language, translate_country, translate_region, translate_marketing, translate_bundle_name
+from .services.catalog_mirror import BundleCatalogMirror, mirror_enabled
+from .services.catalog_payloads import LocalizedPayloadCache, etag_matches, versioned_etag
+from .i18n import LANG_WHITELIST, resolve_language, translate_country, translate_region, translate_marketing, translate_bundle_name, reload_translations, load_territory_tables
 from .db import SessionLocal
 from .models.orm import I18nCountryName, I18nRegionName, I18nBundleName, RecentSearch
 from .services.agent_service import AgentService
+from .middleware.gzip import PathAwareGZipMiddleware
 from .middleware.request_id import RequestIdMiddleware
+from .responses import FastJSONResponse, dumps, envelope
 from .provider.errors import ProviderError
+from .provider.registry import get_provider_client, close_provider_clients, provider_metrics
 from dotenv import load_dotenv
 from .db import init_db, SessionLocal
 from .security.jwt import decode_token
@@ -89,7 +95,8 @@ try:
 except Exception:
     load_dotenv()
 
-app = FastAPI(title="eSIM Home Backend", version="0.1.0")
+# 默认响应类：orjson（未安装时回退标准库 json）直接序列化
+app = FastAPI(title="eSIM Home Backend", version="0.1.0", default_response_class=FastJSONResponse)
 SERVER_STARTED_AT = datetime.utcnow()
 
 # CORS for local development and iOS simulator
@@ -100,14 +107,21 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
-app.add_middleware(GZipMiddleware, minimum_size=500)
+# 逐行推送的 NDJSON 流式接口不压缩
+app.add_middleware(PathAwareGZipMiddleware, minimum_size=500, exclude_paths=("/orders/consumption/batch/stream",))
 
 app.add_middleware(RequestIdMiddleware)
 
-service = OrderService()
+# 进程级共享上游客户端：一个令牌、一个连接池、一套连接指标
+provider_client = get_provider_client()
+service = OrderService(provider=provider_client)
 auth_service = AuthService()
-catalog_service = CatalogService()
-agent_service = AgentService()
+# 本地套餐目录镜像：启动后后台全量同步，就绪前回退上游分页查询
+catalog_mirror = BundleCatalogMirror(provider=provider_client) if mirror_enabled() else None
+catalog_service = CatalogService(provider=provider_client, mirror=catalog_mirror)
+# 本地化 + 已序列化的目录响应体（按 endpoint / 语言 / 过滤条件 / 数据版本缓存）
+catalog_payloads = LocalizedPayloadCache()
+agent_service = AgentService(provider=provider_client)
 
 # ===== Unified envelope exception handlers (scoped to upstream-compatible alias routes) =====
 
@@ -156,7 +170,7 @@ def get_current_user(request: Request) -> ORMUser:
         db.close()
 
 @app.get("/config")
-async def get_client_config(request: Request):
+def get_client_config(request: Request):
     def read_env(names: list[str]) -> float | None:
         for n in names:
             v = os.getenv(n)
@@ -211,16 +225,16 @@ async def get_client_config(request: Request):
     rid = getattr(request.state, "request_id", None)
     if rid:
         headers["X-Request-Id"] = rid
-    return JSONResponse(status_code=200, content=cfg, headers=headers)
+    return FastJSONResponse(status_code=200, content=cfg, headers=headers)
 
-def _json_envelope(content: dict, request: Request | None = None) -> JSONResponse:
+def _json_envelope(content: dict, request: Request | None = None) -> FastJSONResponse:
     # Always HTTP 200; middleware will add X-Request-Id, but we attach if available
     headers = {}
     if request is not None:
         req_id = getattr(request.state, "request_id", None)
         if req_id:
             headers["X-Request-Id"] = req_id
-    return JSONResponse(status_code=200, content=content, headers=headers)
+    return FastJSONResponse(status_code=200, content=content, headers=headers)
 
 def _idem_get(request: Request, idem_key: str, body_hash: str):
     import json
@@ -401,28 +415,28 @@ def _is_alias_envelope(request: Request) -> bool:
 async def handle_validation_error(request: Request, exc: RequestValidationError):
     # For alias routes, wrap as envelope; otherwise use standard 422.
     if _is_alias_envelope(request):
-        return _json_envelope({"code": 422, "data": {}, "msg": "invalid request"}, request)
-    return JSONResponse(status_code=422, content={"detail": exc.errors()})
+        return _json_envelope(envelope({}, 422, "invalid request"), request)
+    return FastJSONResponse(status_code=422, content={"detail": exc.errors()})
 
 
 @app.exception_handler(ProviderError)
 async def handle_provider_error(request: Request, exc: ProviderError):
     # For alias routes, wrap as envelope; otherwise return mapped HTTP status.
     if _is_alias_envelope(request):
-        return _json_envelope({"code": 200, "data": {"err_code": exc.code, "err_msg": exc.msg}, "msg": ""}, request)
-    return JSONResponse(status_code=exc.http_status, content={"detail": exc.msg})
+        return _json_envelope(envelope({"err_code": exc.code, "err_msg": exc.msg}, 200, ""), request)
+    return FastJSONResponse(status_code=exc.http_status, content={"detail": exc.msg})
 
 
 @app.exception_handler(Exception)
 async def handle_generic_error(request: Request, exc: Exception):
     # For alias routes, wrap generics as envelope; otherwise 500.
     if _is_alias_envelope(request):
-        return _json_envelope({"code": 200, "data": {"err_code": 500, "err_msg": str(exc)}, "msg": ""}, request)
-    return JSONResponse(status_code=500, content={"detail": "Internal Server Error"})
+        return _json_envelope(envelope({"err_code": 500, "err_msg": str(exc)}, 200, ""), request)
+    return FastJSONResponse(status_code=500, content={"detail": "Internal Server Error"})
 
 
 @app.post("/orders", response_model=OrderDTO)
-async def create_order(body: CreateOrderBody, current_user: ORMUser = Depends(get_current_user)):
+def create_order(body: CreateOrderBody, current_user: ORMUser = Depends(get_current_user)):
     try:
         if getattr(current_user, "kyc_status", None) != "verified":
             raise HTTPException(status_code=403, detail="下单前需完成身份验证")
@@ -434,7 +448,7 @@ async def create_order(body: CreateOrderBody, current_user: ORMUser = Depends(ge
 
 
 @app.get("/orders", response_model=list[OrderDTO])
-async def list_orders(
+def list_orders(
     request: Request,
     response: Response,
     current_user: ORMUser = Depends(get_current_user),
@@ -461,7 +475,7 @@ async def list_orders(
 
 
 @app.get("/orders/{order_id}", response_model=OrderDTO)
-async def get_order(request: Request, order_id: str, current_user: ORMUser = Depends(get_current_user)):
+def get_order(request: Request, order_id: str, current_user: ORMUser = Depends(get_current_user)):
     req_id = getattr(request.state, "request_id", None)
     order = service.get_order(order_id, user_id=current_user.id, request_id=req_id)
     if not order:
@@ -470,7 +484,7 @@ async def get_order(request: Request, order_id: str, current_user: ORMUser = Dep
 
 
 @app.get("/orders/{order_id}/usage", response_model=UsageDTO)
-async def get_usage(request: Request, order_id: str, current_user: ORMUser = Depends(get_current_user)):
+def get_usage(request: Request, order_id: str, current_user: ORMUser = Depends(get_current_user)):
     req_id = getattr(request.state, "request_id", None)
     usage = service.get_usage(order_id, request_id=req_id)
     if not usage:
@@ -479,7 +493,7 @@ async def get_usage(request: Request, order_id: str, current_user: ORMUser = Dep
 
 
 @app.post("/orders/list")
-async def post_orders_list(request: Request, body: OrdersListQuery, current_user: ORMUser = Depends(get_current_user)):
+def post_orders_list(request: Request, body: OrdersListQuery, current_user: ORMUser = Depends(get_current_user)):
     req_id = getattr(request.state, "request_id", None)
     # Dev-only bypass for demo/testing: X-Dev-All=1 or env ORDERS_DEV_ALL=true
     dev_all = False
@@ -518,10 +532,10 @@ async def post_orders_list(request: Request, body: OrdersListQuery, current_user
         except Exception:
             pass
     data = {"orders": orders, "orders_count": int(data.get("orders_count") or len(orders))}
-    return _json_envelope({"code": 200, "data": jsonable_encoder(data), "msg": ""}, request)
+    return _json_envelope(envelope(data, 200, ""), request)
 
 @app.post("/orders/list-normalized", response_model=list[OrderDTO])
-async def post_orders_list_normalized(request: Request, body: OrdersListNormalizedQuery, current_user: ORMUser = Depends(get_current_user)):
+def post_orders_list_normalized(request: Request, body: OrdersListNormalizedQuery, current_user: ORMUser = Depends(get_current_user)):
     req_id = getattr(request.state, "request_id", None)
     dev_all = False
     try:
@@ -531,7 +545,7 @@ async def post_orders_list_normalized(request: Request, body: OrdersListNormaliz
     return service.orders_list_normalized(body, request_id=req_id, user_email=(current_user.email or ""), user_id=current_user.id, dev_all=dev_all)
 
 @app.post("/orders/list-with-usage")
-async def post_orders_list_with_usage(request: Request, body: OrdersListWithUsageQuery, current_user: ORMUser = Depends(get_current_user)):
+def post_orders_list_with_usage(request: Request, body: OrdersListWithUsageQuery, current_user: ORMUser = Depends(get_current_user)):
     req_id = getattr(request.state, "request_id", None)
     max_usage = None
     if request.headers.get("X-Fast-Orders", "0") == "1":
@@ -567,11 +581,11 @@ async def post_orders_list_with_usage(request: Request, body: OrdersListWithUsag
             data = {"items": items, "orders_count": data.get("orders_count")}
         except Exception:
             pass
-    return _json_envelope({"code": 200, "data": jsonable_encoder(data), "msg": ""}, request)
+    return _json_envelope(envelope(data, 200, ""), request)
 
 
 @app.post("/orders/detail")
-async def post_orders_detail(request: Request, body: OrdersDetailQuery, current_user: ORMUser = Depends(get_current_user)):
+def post_orders_detail(request: Request, body: OrdersDetailQuery, current_user: ORMUser = Depends(get_current_user)):
     """Upstream-compatible order detail: returns {code, data, msg} envelope.
 
     data includes: order_id, order_status, bundle_category, bundle_code, bundle_marketing_name,
@@ -606,10 +620,10 @@ async def post_orders_detail(request: Request, body: OrdersDetailQuery, current_
                 data["region_name"] = translate_region(rc, rn, l)
         except Exception:
             pass
-    return _json_envelope({"code": 200, "data": jsonable_encoder(data), "msg": ""}, request)
+    return _json_envelope(envelope(data, 200, ""), request)
 
 @app.post("/orders/detail-by-id")
-async def post_orders_detail_by_id(request: Request, body: OrdersDetailByIdQuery, current_user: ORMUser = Depends(get_current_user)):
+def post_orders_detail_by_id(request: Request, body: OrdersDetailByIdQuery, current_user: ORMUser = Depends(get_current_user)):
     req_id = getattr(request.state, "request_id", None)
     data = service.orders_detail_by_id_v2(order_id=body.order_id, request_id=req_id)
     l = resolve_language(None, request.headers.get("Accept-Language"), request.headers.get("X-Language"), getattr(current_user, "language", None))
@@ -638,21 +652,21 @@ async def post_orders_detail_by_id(request: Request, body: OrdersDetailByIdQuery
                 data["region_name"] = translate_region(rc, rn, l)
         except Exception:
             pass
-    return _json_envelope({"code": 200, "data": jsonable_encoder(data), "msg": ""}, request)
+    return _json_envelope(envelope(data, 200, ""), request)
 
 @app.post("/orders/detail-normalized")
-async def post_orders_detail_normalized(request: Request, body: OrdersDetailNormalizedQuery, current_user: ORMUser = Depends(get_current_user)):
+def post_orders_detail_normalized(request: Request, body: OrdersDetailNormalizedQuery, current_user: ORMUser = Depends(get_current_user)):
     req_id = getattr(request.state, "request_id", None)
     try:
         dto = service.orders_detail_normalized(body, request_id=req_id)
     except ValueError as e:
         # 包装为上游 envelope 风格错误
-        return _json_envelope({"code": 404, "data": None, "msg": str(e)}, request)
-    return _json_envelope({"code": 200, "data": jsonable_encoder(dto), "msg": ""}, request)
+        return _json_envelope(envelope(None, 404, str(e)), request)
+    return _json_envelope(envelope(dto, 200, ""), request)
 
 
 @app.post("/orders/consumption")
-async def post_orders_consumption(request: Request, body: OrdersConsumptionQuery, current_user: ORMUser = Depends(get_current_user)):
+def post_orders_consumption(request: Request, body: OrdersConsumptionQuery, current_user: ORMUser = Depends(get_current_user)):
     """Upstream-compatible order consumption: returns {code, data, msg} envelope.
 
     data.order includes usage fields like data_remaining, data_used, data_unit, minutes_*, sms_*, etc.
@@ -669,10 +683,10 @@ async def post_orders_consumption(request: Request, body: OrdersConsumptionQuery
         data = {"order": order}
     except Exception:
         pass
-    return _json_envelope({"code": 200, "data": jsonable_encoder(data), "msg": ""}, request)
+    return _json_envelope(envelope(data, 200, ""), request)
 
 @app.post("/orders/consumption-by-id")
-async def post_orders_consumption_by_id(request: Request, body: OrdersConsumptionByIdQuery, current_user: ORMUser = Depends(get_current_user)):
+def post_orders_consumption_by_id(request: Request, body: OrdersConsumptionByIdQuery, current_user: ORMUser = Depends(get_current_user)):
     req_id = getattr(request.state, "request_id", None)
     data = service.orders_consumption_by_id_v2(body, request_id=req_id)
     l = resolve_language(None, request.headers.get("Accept-Language"), request.headers.get("X-Language"), getattr(current_user, "language", None))
@@ -685,12 +699,12 @@ async def post_orders_consumption_by_id(request: Request, body: OrdersConsumptio
         data = {"order": order}
     except Exception:
         pass
-    return _json_envelope({"code": 200, "data": jsonable_encoder(data), "msg": ""}, request)
+    return _json_envelope(envelope(data, 200, ""), request)
 
 @app.post("/orders/consumption/batch")
-async def post_orders_consumption_batch(request: Request, body: OrdersConsumptionBatchQuery, current_user: ORMUser = Depends(get_current_user)):
+def post_orders_consumption_batch(request: Request, body: OrdersConsumptionBatchQuery, current_user: ORMUser = Depends(get_current_user)):
     req_id = getattr(request.state, "request_id", None)
-    data = service.orders_consumption_batch(body, request_id=req_id)
+    data = service.orders_consumption_batch(body, request_id=req_id, user_id=current_user.id)
     l = resolve_language(None, request.headers.get("Accept-Language"), request.headers.get("X-Language"), getattr(current_user, "language", None))
     try:
         items = list((data or {}).get("items") or [])
@@ -704,20 +718,45 @@ async def post_orders_consumption_batch(request: Request, body: OrdersConsumptio
         data = {"items": items}
     except Exception:
         pass
-    return _json_envelope({"code": 200, "data": jsonable_encoder(data), "msg": ""}, request)
+    return _json_envelope(envelope(data, 200, ""), request)
+
+
+@app.post("/orders/consumption/batch/stream")
+def post_orders_consumption_batch_stream(request: Request, body: OrdersConsumptionBatchQuery, current_user: ORMUser = Depends(get_current_user)):
+    """与 /orders/consumption/batch 相同的条目，以 NDJSON 逐行返回（每行 {order_reference, usage}，按完成先后）。"""
+    req_id = getattr(request.state, "request_id", None)
+    l = resolve_language(None, request.headers.get("Accept-Language"), request.headers.get("X-Language"), getattr(current_user, "language", None))
+    from .i18n import translate_plan_status
+
+    def lines():
+        for it in service.orders_consumption_stream(body, request_id=req_id, user_id=current_user.id):
+            usage = dict(it.get("usage") or {})
+            ps = usage.get("plan_status")
+            if ps is not None:
+                try:
+                    usage["plan_status_localized"] = translate_plan_status(ps, l)
+                except Exception:
+                    pass
+            yield dumps({"order_reference": it.get("order_reference"), "usage": usage}) + b"\n"
+
+    headers = {"Cache-Control": "no-store"}
+    if req_id:
+        headers["X-Request-Id"] = req_id
+    # 该路径不经过 GZip（见 PathAwareGZipMiddleware），每行完成即发送
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
 
 
 # ===== Init stable mappings for current user (order_reference/provider_order_id → user_id) =====
 @app.post("/orders/mappings/init")
-async def init_order_mappings(request: Request, current_user: ORMUser = Depends(get_current_user)):
+def init_order_mappings(request: Request, current_user: ORMUser = Depends(get_current_user)):
     req_id = getattr(request.state, "request_id", None)
     data = service.init_mappings_for_user(current_user.id, request_id=req_id)
-    return _json_envelope({"code": 200, "data": jsonable_encoder(data), "msg": ""}, request)
+    return _json_envelope(envelope(data, 200, ""), request)
 
 
 # ===== Auth =====
 @app.post("/auth/register", response_model=AuthResponseDTO)
-async def register(body: RegisterBody):
+def register(body: RegisterBody):
     try:
         return auth_service.register(body)
     except ValueError as e:
@@ -725,7 +764,7 @@ async def register(body: RegisterBody):
 
 
 @app.post("/auth/login", response_model=AuthResponseDTO)
-async def login(body: LoginBody):
+def login(body: LoginBody):
     result = auth_service.login(body)
     if not result:
         raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -733,17 +772,17 @@ async def login(body: LoginBody):
 
 
 @app.post("/auth/apple", response_model=AuthResponseDTO)
-async def login_apple(body: AppleLoginBody):
+def login_apple(body: AppleLoginBody):
     return auth_service.login_apple(body)
 
 
 @app.post("/auth/password-reset", response_model=ResetDTO)
-async def password_reset(body: PasswordResetBody):
+def password_reset(body: PasswordResetBody):
     return auth_service.password_reset(body.email)
 
 
 @app.post("/auth/password-reset/confirm", response_model=SuccessDTO)
-async def password_reset_confirm(body: PasswordResetConfirmBody):
+def password_reset_confirm(body: PasswordResetConfirmBody):
     try:
         return auth_service.confirm_password_reset(body.token, body.newPassword)
     except ValueError as e:
@@ -760,13 +799,13 @@ async def password_reset_confirm(body: PasswordResetConfirmBody):
 
 
 @app.post("/auth/email-code", response_model=EmailCodeDTO)
-async def request_email_code(body: EmailCodeRequestBody):
+def request_email_code(body: EmailCodeRequestBody):
     # 注册与改邮箱均可匿名请求验证码；后端不暴露邮箱有效性
     return auth_service.request_email_code(email=body.email, purpose=body.purpose)
 
 
 @app.post("/auth/refresh", response_model=AuthResponseDTO)
-async def refresh_tokens(body: RefreshBody):
+def refresh_tokens(body: RefreshBody):
     result = auth_service.refresh_tokens(body.refreshToken)
     if not result:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
@@ -774,65 +813,195 @@ async def refresh_tokens(body: RefreshBody):
 
 
 @app.post("/auth/logout")
-async def logout(body: LogoutBody):
+def logout(body: LogoutBody):
     ok = auth_service.revoke_refresh_token(body.refreshToken)
     return {"success": bool(ok)}
 
 
+# ===== Catalog payload builders =====
+# 以下函数只生成待序列化的内容（可含 DTO），结果由 catalog_payloads 按 (语言, 过滤条件, 数据版本) 缓存
+def _catalog_response(
+    request: Request,
+    endpoint: str,
+    l: str,
+    filter_key: str,
+    version: str,
+    build,
+    cache_control: str | None,
+    vary: bool = True,
+    conditional: bool = True,
+) -> Response:
+    """目录响应：先用派生 ETag 判断 304（不生成响应体），否则写出缓存的本地化字节。"""
+    headers: dict[str, str] = {}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    if vary:
+        headers["Vary"] = "Accept-Language, X-Language"
+    rid = getattr(request.state, "request_id", None)
+    if rid:
+        headers["X-Request-Id"] = rid
+    if conditional:
+        etag = versioned_etag(endpoint, l, filter_key, version)
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            catalog_payloads.not_modified += 1
+            return Response(status_code=304, headers=headers)
+    payload = catalog_payloads.get(endpoint, l, filter_key, version, build)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
+
+
+_CATALOG_CACHE_CONTROL = "public, max-age=3600, stale-while-revalidate=3600"
+
+
+def _body_key(body: BaseModel) -> str:
+    # POST 别名路由的过滤条件：请求体的规范 JSON
+    return body.model_dump_json()
+
+
+def _parse_data_amount(s: str | None) -> tuple[float | None, str | None]:
+    try:
+        import re as _re
+        m = _re.search(r"(?i)(\d+(?:\.\d+)?)\s*([kmgt]?b?)", str(s or ""))
+        if m:
+            a = float(m.group(1))
+            u = m.group(2).upper()
+            if u in ("G", "GB"):
+                return a, "GB"
+            if u in ("M", "MB"):
+                return a, "MB"
+            if u in ("K", "KB"):
+                return a, "KB"
+    except Exception:
+        pass
+    return None, None
+
+
+def _localized_countries(items: list[CountryDTO], l: str) -> list:
+    return [CountryDTO(code=c.code, name=translate_country(c.code, c.name, l)) for c in items]
+
+
+def _localized_regions(items: list[RegionDTO], l: str) -> list:
+    return [RegionDTO(code=r.code, name=translate_region(r.code, r.name, l)) for r in items]
+
+
+def _localized_alias_countries(data: AliasCountriesDTO, l: str) -> dict:
+    countries = [
+        {"iso2_code": c.iso2_code, "iso3_code": c.iso3_code, "country_name": translate_country(c.iso2_code, c.country_name, l)}
+        for c in data.countries
+    ]
+    return {"countries": countries, "countries_count": data.countries_count}
+
+
+def _localized_alias_regions(data: AliasRegionsDTO, l: str) -> dict:
+    regions = [{"region_code": r.region_code, "region_name": translate_region(r.region_code, r.region_name, l)} for r in data.regions]
+    return {"regions": regions, "regions_count": data.regions_count}
+
+
+def _localized_bundles(items: list[BundleDTO], l: str) -> list:
+    localized: list[BundleDTO] = []
+    for b in items:
+        amt, unit = _parse_data_amount(b.dataAmount)
+        localized.append(BundleDTO(
+            id=b.id,
+            name=translate_bundle_name(b.name, l, b.id, amt, unit, b.validityDays, b.name),
+            countryCode=b.countryCode,
+            price=b.price,
+            currency=b.currency,
+            dataAmount=b.dataAmount,
+            validityDays=b.validityDays,
+            description=(translate_marketing(b.description, l, b.id) if b.description else None),
+            supportedNetworks=b.supportedNetworks,
+            hotspotSupported=b.hotspotSupported,
+            coverageNote=b.coverageNote,
+            termsUrl=b.termsUrl,
+        ))
+    return localized
+
+
+def _localized_bundle_list(data: dict, l: str) -> dict:
+    # 逐项复制后再翻译：源数据来自缓存 / 镜像快照，不能原地修改
+    bundles = [dict(b) for b in (data.get("bundles") or [])]
+    for b in bundles:
+        cat = str(b.get("bundle_category") or "").strip().lower()
+        if cat == "country":
+            codes = b.get("country_code") or []
+            code = str(codes[0] if codes else "")
+            b["bundle_marketing_name"] = translate_country(code, b.get("bundle_marketing_name"), l)
+        else:
+            b["bundle_marketing_name"] = translate_marketing(b.get("bundle_marketing_name"), l, b.get("bundle_code"))
+        amt = b.get("gprs_limit")
+        unit = b.get("data_unit")
+        try:
+            val = int(float(str(b.get("validity") or 0)))
+        except Exception:
+            val = None
+        b["bundle_name"] = translate_bundle_name(
+            b.get("bundle_name"),
+            l,
+            b.get("bundle_code"),
+            amt,
+            unit,
+            val,
+            b.get("bundle_marketing_name"),
+            b.get("unlimited"),
+        )
+        rc = b.get("region_code")
+        b["region_name"] = translate_region(rc, b.get("region_name"), l)
+        codes = b.get("country_code") or []
+        names = []
+        cnames = b.get("country_name") or []
+        for idx, code in enumerate(codes):
+            name = cnames[idx] if idx < len(cnames) else None
+            names.append(translate_country(code, name, l))
+        b["country_name"] = names
+    return {"bundles": bundles, "bundles_count": data.get("bundles_count")}
+
+
+def _warm_catalog_payloads(key: str) -> None:
+    """目录条目刷新后为全部白名单语言预计算国家 / 地区列表 payload。"""
+    if key == "countries:v1":
+        items, version = catalog_service.get_countries_versioned()
+        catalog_payloads.warm("countries", LANG_WHITELIST, "-", version, lambda l: _localized_countries(items, l))
+    elif key == "regions:v1":
+        items, version = catalog_service.get_regions_versioned()
+        catalog_payloads.warm("regions", LANG_WHITELIST, "-", version, lambda l: _localized_regions(items, l))
+
+
+catalog_service.add_refresh_listener(_warm_catalog_payloads)
+
+
 # ===== Catalog =====
 @app.get("/catalog/countries", response_model=list[CountryDTO])
-async def get_countries(request: Request, response: Response, lang: str | None = None):
+def get_countries(request: Request, response: Response, lang: str | None = None):
     req_id = getattr(request.state, "request_id", None)
-    items = catalog_service.get_countries(request_id=req_id)
+    items, version = catalog_service.get_countries_versioned(request_id=req_id)
     l = resolve_language(lang, request.headers.get("Accept-Language"), request.headers.get("X-Language"), None)
-    result = [CountryDTO(code=c.code, name=translate_country(c.code, c.name, l)) for c in items]
-    payload = "|".join([f"{c.code}:{c.name}" for c in result])
-    etag = hashlib.md5(payload.encode("utf-8")).hexdigest()
-    inm = request.headers.get("If-None-Match")
-    response.headers["Cache-Control"] = "public, max-age=3600, stale-while-revalidate=3600"
-    response.headers["Vary"] = "Accept-Language, X-Language"
-    response.headers["ETag"] = etag
-    if inm == etag:
-        return Response(status_code=304)
-    return jsonable_encoder(result)
+    return _catalog_response(request, "countries", l, "-", version, lambda: _localized_countries(items, l), "public, max-age=3600, stale-while-revalidate=3600")
 
 @app.post("/bundle/countries")
-async def post_bundle_countries(request: Request, lang: str | None = None):
+def post_bundle_countries(request: Request, lang: str | None = None):
     req_id = getattr(request.state, "request_id", None)
-    data = catalog_service.get_countries_alias(request_id=req_id)
+    data, version = catalog_service.get_countries_alias_versioned(request_id=req_id)
     l = resolve_language(lang, request.headers.get("Accept-Language"), request.headers.get("X-Language"), None)
-    for c in data.countries:
-        c.country_name = translate_country(c.iso2_code, c.country_name, l)
-    return _json_envelope({"code": 200, "data": jsonable_encoder(data), "msg": ""}, request)
+    return _catalog_response(request, "bundle/countries", l, "-", version, lambda: envelope(_localized_alias_countries(data, l)), _CATALOG_CACHE_CONTROL)
 
 
 @app.get("/catalog/regions", response_model=list[RegionDTO])
-async def get_regions(request: Request, response: Response, lang: str | None = None):
+def get_regions(request: Request, response: Response, lang: str | None = None):
     req_id = getattr(request.state, "request_id", None)
-    items = catalog_service.get_regions(request_id=req_id)
+    items, version = catalog_service.get_regions_versioned(request_id=req_id)
     l = resolve_language(lang, request.headers.get("Accept-Language"), request.headers.get("X-Language"), None)
-    result = [RegionDTO(code=r.code, name=translate_region(r.code, r.name, l)) for r in items]
-    payload = "|".join([f"{r.code}:{r.name}" for r in result])
-    etag = hashlib.md5(payload.encode("utf-8")).hexdigest()
-    inm = request.headers.get("If-None-Match")
-    response.headers["Cache-Control"] = "public, max-age=3600, stale-while-revalidate=3600"
-    response.headers["Vary"] = "Accept-Language, X-Language"
-    response.headers["ETag"] = etag
-    if inm == etag:
-        return Response(status_code=304)
-    return jsonable_encoder(result)
+    return _catalog_response(request, "regions", l, "-", version, lambda: _localized_regions(items, l), "public, max-age=3600, stale-while-revalidate=3600")
 
 @app.post("/bundle/regions")
-async def post_bundle_regions(request: Request, lang: str | None = None):
+def post_bundle_regions(request: Request, lang: str | None = None):
     req_id = getattr(request.state, "request_id", None)
-    data = catalog_service.get_regions_alias(request_id=req_id)
+    data, version = catalog_service.get_regions_alias_versioned(request_id=req_id)
     l = resolve_language(lang, request.headers.get("Accept-Language"), request.headers.get("X-Language"), None)
-    for r in data.regions:
-        r.region_name = translate_region(r.region_code, r.region_name, l)
-    return _json_envelope({"code": 200, "data": jsonable_encoder(data), "msg": ""}, request)
+    return _catalog_response(request, "bundle/regions", l, "-", version, lambda: envelope(_localized_alias_regions(data, l)), _CATALOG_CACHE_CONTROL)
 
 @app.get("/search", response_model=list[SearchResultDTO])
-async def search(
+def search(
     request: Request,
     q: str,
     include: str | None = None,
@@ -858,71 +1027,15 @@ async def search(
     return localized
 
 @app.get("/catalog/bundles", response_model=list[BundleDTO])
-async def get_bundles(request: Request, response: Response, country: str | None = None, popular: bool = False, lang: str | None = None):
-    items = catalog_service.get_bundles(country=country, popular=popular)
+def get_bundles(request: Request, response: Response, country: str | None = None, popular: bool = False, lang: str | None = None):
+    items, version = catalog_service.get_bundles_versioned(country=country, popular=popular)
     l = resolve_language(lang, request.headers.get("Accept-Language"), request.headers.get("X-Language"), None)
-    localized: list[BundleDTO] = []
-    for b in items:
-        amt = None
-        unit = None
-        try:
-            s = str(b.dataAmount or "")
-            import re as _re
-            m = _re.search(r"(?i)(\d+(?:\.\d+)?)\s*([kmgt]?b?)", s)
-            if m:
-                a = float(m.group(1))
-                u = m.group(2).upper()
-                if u in ("G", "GB"):
-                    amt = a
-                    unit = "GB"
-                elif u in ("M", "MB"):
-                    amt = a
-                    unit = "MB"
-                elif u in ("K", "KB"):
-                    amt = a
-                    unit = "KB"
-        except Exception:
-            pass
-        localized.append(BundleDTO(
-            id=b.id,
-            name=translate_bundle_name(b.name, l, b.id, amt, unit, b.validityDays, b.name),
-            countryCode=b.countryCode,
-            price=b.price,
-            currency=b.currency,
-            dataAmount=b.dataAmount,
-            validityDays=b.validityDays,
-            description=(translate_marketing(b.description, l, b.id) if b.description else None),
-            supportedNetworks=b.supportedNetworks,
-            hotspotSupported=b.hotspotSupported,
-            coverageNote=b.coverageNote,
-            termsUrl=b.termsUrl,
-        ))
-    payload = "|".join([
-        ":".join([
-            str(x.id),
-            str(x.name),
-            str(x.countryCode),
-            str(x.price),
-            str(x.currency),
-            str(x.dataAmount),
-            str(x.validityDays),
-            str(x.hotspotSupported),
-            str(x.termsUrl),
-        ])
-        for x in localized
-    ])
-    etag = hashlib.md5(payload.encode("utf-8")).hexdigest()
-    inm = request.headers.get("If-None-Match")
-    response.headers["Cache-Control"] = "public, max-age=3600, stale-while-revalidate=3600"
-    response.headers["Vary"] = "Accept-Language, X-Language"
-    response.headers["ETag"] = etag
-    if inm == etag:
-        return Response(status_code=304)
-    return jsonable_encoder(localized)
+    filter_key = f"{(country or '-').upper()}|{int(popular)}"
+    return _catalog_response(request, "bundles", l, filter_key, version, lambda: _localized_bundles(items, l), "public, max-age=3600, stale-while-revalidate=3600")
 
 
 @app.get("/catalog/bundles/{bundle_id}", response_model=BundleDTO)
-async def get_bundle(request: Request, bundle_id: str, lang: str | None = None):
+def get_bundle(request: Request, bundle_id: str, lang: str | None = None):
     b = catalog_service.get_bundle(bundle_id)
     if not b:
         raise HTTPException(status_code=404, detail="Bundle not found")
@@ -963,7 +1076,7 @@ async def get_bundle(request: Request, bundle_id: str, lang: str | None = None):
     )
 
 @app.get("/catalog/bundle/{bundle_id}", response_model=BundleDTO)
-async def get_bundle_alias(request: Request, bundle_id: str, lang: str | None = None):
+def get_bundle_alias(request: Request, bundle_id: str, lang: str | None = None):
     b = catalog_service.get_bundle(bundle_id)
     if not b:
         raise HTTPException(status_code=404, detail="Bundle not found")
@@ -1005,31 +1118,24 @@ async def get_bundle_alias(request: Request, bundle_id: str, lang: str | None =
 
 
 @app.get("/catalog/bundles/{bundle_id}", response_model=BundleDTO)
-async def get_bundle(bundle_id: str):
+def get_bundle(bundle_id: str):
     b = catalog_service.get_bundle(bundle_id)
     if not b:
         raise HTTPException(status_code=404, detail="Bundle not found")
     return b
 
 @app.get("/catalog/bundles/{bundle_id}/networks", response_model=list[str])
-async def get_bundle_networks(bundle_id: str, request: Request, response: Response):
-    networks = catalog_service.get_bundle_networks(bundle_id)
+def get_bundle_networks(bundle_id: str, request: Request, response: Response):
+    networks, version = catalog_service.get_bundle_networks_versioned(bundle_id)
     if not networks:
         raise HTTPException(status_code=404, detail="Bundle networks not found")
-    payload = "|".join([str(x) for x in networks])
-    import hashlib as _hashlib
-    etag = _hashlib.md5(payload.encode("utf-8")).hexdigest()
-    inm = request.headers.get("If-None-Match")
-    response.headers["Cache-Control"] = "public, max-age=86400"
-    response.headers["ETag"] = etag
-    if inm == etag:
-        return Response(status_code=304)
-    return jsonable_encoder(networks)
+    # 网络列表不做本地化：语言固定为 "-"，不加 Vary
+    return _catalog_response(request, "networks", "-", str(bundle_id), version, lambda: networks, "public, max-age=86400", vary=False)
 
 @app.post("/bundle/list")
-async def post_bundle_list(request: Request, body: BundleListQuery, lang: str | None = None):
+def post_bundle_list(request: Request, body: BundleListQuery, lang: str | None = None):
     req_id = getattr(request.state, "request_id", None)
-    data = catalog_service.bundle_list(
+    data, version = catalog_service.bundle_list_versioned(
         page_number=body.page_number,
         page_size=body.page_size,
         country_code=body.country_code,
@@ -1041,44 +1147,14 @@ async def post_bundle_list(request: Request, body: BundleListQuery, lang: str |
         request_id=req_id,
     )
     l = resolve_language(lang, request.headers.get("Accept-Language"), request.headers.get("X-Language"), None)
-    bundles = data.get("bundles") or []
-    for b in bundles:
-        cat = str(b.get("bundle_category") or "").strip().lower()
-        if cat == "country":
-            codes = b.get("country_code") or []
-            code = str(codes[0] if codes else "")
-            b["bundle_marketing_name"] = translate_country(code, b.get("bundle_marketing_name"), l)
-        else:
-            b["bundle_marketing_name"] = translate_marketing(b.get("bundle_marketing_name"), l, b.get("bundle_code"))
-        amt = b.get("gprs_limit")
-        unit = b.get("data_unit")
-        try:
-            val = int(float(str(b.get("validity") or 0)))
-        except Exception:
-            val = None
-        b["bundle_name"] = translate_bundle_name(
-            b.get("bundle_name"),
-            l,
-            b.get("bundle_code"),
-            amt,
-            unit,
-            val,
-            b.get("bundle_marketing_name"),
-            b.get("unlimited"),
-        )
-        rc = b.get("region_code")
-        b["region_name"] = translate_region(rc, b.get("region_name"), l)
-        codes = b.get("country_code") or []
-        names = []
-        cnames = b.get("country_name") or []
-        for idx, code in enumerate(codes):
-            name = cnames[idx] if idx < len(cnames) else None
-            names.append(translate_country(code, name, l))
-        b["country_name"] = names
-    return _json_envelope({"code": 200, "data": jsonable_encoder({"bundles": bundles, "bundles_count": data.get("bundles_count")}), "msg": ""}, request)
+    return _catalog_response(
+        request, "bundle/list", l, _body_key(body), version,
+        lambda: envelope(_localized_bundle_list(data, l)),
+        _CATALOG_CACHE_CONTROL,
+    )
 
 @app.get("/search")
-async def get_search(
+def get_search(
     request: Request,
     q: str,
     include: str | None = None,
@@ -1099,10 +1175,24 @@ async def get_search(
         else:
             t = translate_marketing(r.title, l, r.bundleCode)
         localized.append(SearchResultDTO(kind=r.kind, id=r.id, title=t, subtitle=r.subtitle, countryCode=r.countryCode, regionCode=r.regionCode, bundleCode=r.bundleCode))
-    return _json_envelope({"code": 200, "data": jsonable_encoder(localized), "msg": ""}, request)
+    return _json_envelope(envelope(localized, 200, ""), request)
+
+@app.get("/search/suggest", response_model=list[SearchResultDTO])
+def search_suggest(
+    request: Request,
+    q: str,
+    include: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=20)] = 8,
+    lang: str | None = None,
+):
+    # 输入联想：内存前缀表直接返回已本地化的标题，不访问 DB / 上游
+    req_id = getattr(request.state, "request_id", None)
+    include_list = [s.strip().lower() for s in include.split(",") if s.strip()] if include else None
+    l = resolve_language(lang, request.headers.get("Accept-Language"), request.headers.get("X-Language"), None)
+    return catalog_service.suggest(q=q, include=include_list, limit=limit, lang=l, request_id=req_id)
 
 @app.post("/search/log", response_model=SuccessDTO)
-async def post_search_log(request: Request, body: SearchLogBody, current_user: ORMUser = Depends(get_current_user)):
+def post_search_log(request: Request, body: SearchLogBody, current_user: ORMUser = Depends(get_current_user)):
     db = _get_db()
     try:
         kind = (body.kind or "").strip()
@@ -1136,7 +1226,7 @@ async def post_search_log(request: Request, body: SearchLogBody, current_user: O
         db.close()
 
 @app.get("/search/recent", response_model=list[SearchResultDTO])
-async def get_search_recent(request: Request, limit: int = 10, sort: Literal["recent", "hits"] = "recent", lang: str | None = None, current_user: ORMUser = Depends(get_current_user)):
+def get_search_recent(request: Request, limit: int = 10, sort: Literal["recent", "hits"] = "recent", lang: str | None = None, current_user: ORMUser = Depends(get_current_user)):
     db = _get_db()
     try:
         limit = max(1, min(50, int(limit)))
@@ -1188,7 +1278,7 @@ async def get_search_recent(request: Request, limit: int = 10, sort: Literal["re
         db.close()
 
 @app.delete("/search/recent", response_model=SuccessDTO)
-async def delete_search_recent_all(current_user: ORMUser = Depends(get_current_user)):
+def delete_search_recent_all(current_user: ORMUser = Depends(get_current_user)):
     db = _get_db()
     try:
         db.query(RecentSearch).filter(RecentSearch.user_id == current_user.id).delete()
@@ -1198,7 +1288,7 @@ async def delete_search_recent_all(current_user: ORMUser = Depends(get_current_u
         db.close()
 
 @app.delete("/search/recent/{kind}/{entity_id}", response_model=SuccessDTO)
-async def delete_search_recent_item(kind: Literal["country", "region", "bundle"], entity_id: str, current_user: ORMUser = Depends(get_current_user)):
+def delete_search_recent_item(kind: Literal["country", "region", "bundle"], entity_id: str, current_user: ORMUser = Depends(get_current_user)):
     db = _get_db()
     try:
         db.query(RecentSearch).filter(RecentSearch.user_id == current_user.id, RecentSearch.kind == kind, RecentSearch.entity_id == entity_id).delete()
@@ -1208,12 +1298,16 @@ async def delete_search_recent_item(kind: Literal["country", "region", "bundle"]
         db.close()
 
 @app.post("/bundle/detail-by-code")
-async def post_bundle_detail_by_code(request: Request, body: BundleCodeQuery, lang: str | None = None):
+def post_bundle_detail_by_code(request: Request, body: BundleCodeQuery, lang: str | None = None):
     req_id = getattr(request.state, "request_id", None)
-    b = catalog_service.get_bundle_by_code(bundle_code=body.bundle_code, request_id=req_id)
+    b, version = catalog_service.get_bundle_by_code_versioned(bundle_code=body.bundle_code, request_id=req_id)
     if not b:
-        return _json_envelope({"code": 404, "data": jsonable_encoder({}), "msg": "Bundle not found"}, request)
+        return _json_envelope(envelope({}, 404, "Bundle not found"), request)
     l = resolve_language(lang, request.headers.get("Accept-Language"), request.headers.get("X-Language"), None)
+    return _catalog_response(request, "bundle/detail-by-code", l, _body_key(body), version, lambda: envelope(_localized_bundle_detail(b, l)), _CATALOG_CACHE_CONTROL)
+
+
+def _localized_bundle_detail(b: BundleDTO, l: str) -> BundleDTO:
     # Build localized name using bundle_code and structured fields when possible
     amt = None
     unit = None
@@ -1238,11 +1332,12 @@ async def post_bundle_detail_by_code(request: Request, body: BundleCodeQuery, la
         coverageNote=b.coverageNote,
         termsUrl=b.termsUrl,
     )
-    return _json_envelope({"code": 200, "data": jsonable_encoder(localized), "msg": ""}, request)
+    return localized
+
 
 # ===== i18n 管理接口 =====
 @app.post("/i18n/countries/upsert", response_model=SuccessDTO)
-async def i18n_countries_upsert(body: I18nCountryUpsertBody):
+def i18n_countries_upsert(body: I18nCountryUpsertBody):
     db = SessionLocal()
     try:
         for item in body.items:
@@ -1263,12 +1358,13 @@ async def i18n_countries_upsert(body: I18nCountryUpsertBody):
             else:
                 db.add(I18nCountryName(iso2_code=iso2, iso3_code=iso3, lang_code=lang, name=name, logo=logo))
         db.commit()
+        reload_translations()
         return SuccessDTO(success=True)
     finally:
         db.close()
 
 @app.post("/i18n/regions/upsert", response_model=SuccessDTO)
-async def i18n_regions_upsert(body: I18nRegionUpsertBody):
+def i18n_regions_upsert(body: I18nRegionUpsertBody):
     db = SessionLocal()
     try:
         for item in body.items:
@@ -1282,12 +1378,13 @@ async def i18n_regions_upsert(body: I18nRegionUpsertBody):
             else:
                 db.add(I18nRegionName(region_code=code, lang_code=lang, name=name))
         db.commit()
+        reload_translations()
         return SuccessDTO(success=True)
     finally:
         db.close()
 
 @app.post("/i18n/bundles/upsert", response_model=SuccessDTO)
-async def i18n_bundles_upsert(body: I18nBundleUpsertBody):
+def i18n_bundles_upsert(body: I18nBundleUpsertBody):
     db = SessionLocal()
     try:
         for item in body.items:
@@ -1305,31 +1402,32 @@ async def i18n_bundles_upsert(body: I18nBundleUpsertBody):
             else:
                 db.add(I18nBundleName(bundle_code=code, lang_code=lang, marketing_name=(item.marketing_name or ""), name=item.name, description=item.description))
         db.commit()
+        reload_translations()
         return SuccessDTO(success=True)
     finally:
         db.close()
 
 
 @app.post("/bundle/networks")
-async def post_bundle_networks(request: Request, body: BundleNetworksQuery):
+def post_bundle_networks(request: Request, body: BundleNetworksQuery):
     req_id = getattr(request.state, "request_id", None)
-    data = catalog_service.get_bundle_networks_v2(
+    data, version = catalog_service.get_bundle_networks_v2_versioned(
         bundle_code=body.bundle_code,
         country_code=body.country_code,
         request_id=req_id,
     )
-    return _json_envelope({"code": 200, "data": jsonable_encoder(data), "msg": ""}, request)
+    return _catalog_response(request, "bundle/networks", "-", _body_key(body), version, lambda: envelope(data), "public, max-age=86400", vary=False)
 
 @app.post("/bundle/networks/flat")
-async def post_bundle_networks_flat(request: Request, body: BundleNetworksFlatQuery):
+def post_bundle_networks_flat(request: Request, body: BundleNetworksFlatQuery):
     req_id = getattr(request.state, "request_id", None)
     data = catalog_service.get_bundle_operators_flat(bundle_code=body.bundle_code, country_code=body.country_code, request_id=req_id)
-    return _json_envelope({"code": 200, "data": jsonable_encoder(data), "msg": ""}, request)
+    return _json_envelope(envelope(data, 200, ""), request)
 
 
 # ===== Agent =====
 @app.get("/agent/account", response_model=AgentAccountDTO)
-async def get_agent_account(request: Request):
+def get_agent_account(request: Request):
     req_id = getattr(request.state, "request_id", None)
     acc = agent_service.get_account(request_id=req_id)
     if not acc:
@@ -1338,17 +1436,17 @@ async def get_agent_account(request: Request):
 
 
 @app.post("/agent/account")
-async def post_agent_account(request: Request):
+def post_agent_account(request: Request):
     # Upstream uses POST; provide POST alias for compatibility
     req_id = getattr(request.state, "request_id", None)
     acc = agent_service.get_account(request_id=req_id)
     if not acc:
         raise HTTPException(status_code=404, detail="Agent account not found")
-    return _json_envelope({"code": 200, "data": jsonable_encoder(acc), "msg": ""}, request)
+    return _json_envelope(envelope(acc, 200, ""), request)
 
 
 @app.get("/agent/bills", response_model=AgentBillsDTO)
-async def get_agent_bills(
+def get_agent_bills(
     request: Request,
     page: Annotated[int, Query(ge=1)] = 1,
     pageSize: Annotated[int, Query(ge=10, le=100)] = 10,
@@ -1368,7 +1466,7 @@ async def get_agent_bills(
 
 
 @app.post("/agent/bills")
-async def post_agent_bills(request: Request, body: AgentBillsQuery):
+def post_agent_bills(request: Request, body: AgentBillsQuery):
     req_id = getattr(request.state, "request_id", None)
     data = agent_service.list_bills(
         page_number=body.page_number,
@@ -1378,11 +1476,11 @@ async def post_agent_bills(request: Request, body: AgentBillsQuery):
         end_date=body.end_date,
         request_id=req_id,
     )
-    return _json_envelope({"code": 200, "data": jsonable_encoder(data), "msg": ""}, request)
+    return _json_envelope(envelope(data, 200, ""), request)
 
 
 @app.post("/bundle/assign")
-async def post_bundle_assign(request: Request, body: BundleAssignBody, current_user: ORMUser = Depends(get_current_user)):
+def post_bundle_assign(request: Request, body: BundleAssignBody, current_user: ORMUser = Depends(get_current_user)):
     req_id = getattr(request.state, "request_id", None)
     data = service.assign_bundle(
         bundle_code=body.bundle_code,
@@ -1394,13 +1492,13 @@ async def post_bundle_assign(request: Request, body: BundleAssignBody, current_u
     )
     # Align with upstream spec: data should include snake_case keys {order_id, iccid}
     result = {"order_id": getattr(data, "orderId", None), "iccid": getattr(data, "iccid", None)}
-    return _json_envelope({"code": 200, "data": jsonable_encoder(result), "msg": ""}, request)
+    return _json_envelope(envelope(result, 200, ""), request)
 
 class RefundBody(BaseModel):
     reason: str | None = None
 
 @app.post("/orders/{order_id}/refund", response_model=RefundDTO)
-async def refund_order(request: Request, order_id: str, body: RefundBody | None = None, current_user: ORMUser = Depends(get_current_user)):
+def refund_order(request: Request, order_id: str, body: RefundBody | None = None, current_user: ORMUser = Depends(get_current_user)):
     rid = getattr(request.state, "request_id", None)
     data = service.refund_order(order_id, reason=(body.reason if body else None), user_id=current_user.id, request_id=rid)
     return RefundDTO(**jsonable_encoder(data))
@@ -1411,10 +1509,10 @@ class RefundByIdBody(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
 
 @app.post("/orders/refund-by-id")
-async def post_orders_refund_by_id(request: Request, body: RefundByIdBody, current_user: ORMUser = Depends(get_current_user)):
+def post_orders_refund_by_id(request: Request, body: RefundByIdBody, current_user: ORMUser = Depends(get_current_user)):
     rid = getattr(request.state, "request_id", None)
     data = service.refund_order(order_id=body.order_id, reason=(body.reason or None), user_id=current_user.id, request_id=rid)
-    return _json_envelope({"code": 200, "data": jsonable_encoder(data), "msg": ""}, request)
+    return _json_envelope(envelope(data, 200, ""), request)
 class AlipayCreateBody(BaseModel):
     orderId: str
 
@@ -1422,7 +1520,7 @@ class AlipayCreateDTO(BaseModel):
     orderString: str
 
 @app.post("/payments/alipay/create", response_model=AlipayCreateDTO)
-async def payments_alipay_create(body: AlipayCreateBody, current_user: ORMUser = Depends(get_current_user)):
+def payments_alipay_create(body: AlipayCreateBody, current_user: ORMUser = Depends(get_current_user)):
     order_str = f"ALIPAY|{body.orderId}"
     return AlipayCreateDTO(orderString=order_str)
 
@@ -1439,7 +1537,7 @@ class GsalaryCreateDTO(BaseModel):
     paymentRequestId: str | None = None
 
 @app.post("/payments/gsalary/create", response_model=GsalaryCreateDTO)
-async def payments_gsalary_create(request: Request, body: GsalaryCreateBody, current_user: ORMUser = Depends(get_current_user)):
+def payments_gsalary_create(request: Request, body: GsalaryCreateBody, current_user: ORMUser = Depends(get_current_user)):
     import uuid, time, hashlib
     import re
     base_url = os.getenv("GSALARY_BASE_URL", "").rstrip("/")
@@ -1623,7 +1721,7 @@ def _verify_signature_rsa2(authorization: str | None, appid: str | None, method:
         return False
 
 @app.post("/webhooks/payments")
-async def payments_webhook(
+def payments_webhook(
     request: Request,
     body: PaymentWebhookBody,
     authorization: str | None = Header(default=None, alias="Authorization"),
@@ -1646,7 +1744,7 @@ async def payments_webhook(
         currency=body.currency,
         request_id=rid,
     )
-    return _json_envelope({"code": 200, "data": {"updated": updated}, "msg": ""}, request)
+    return _json_envelope(envelope({"updated": updated}, 200, ""), request)
 
 class GsalaryWebhookEnvelope(BaseModel):
     business_type: str
@@ -1655,7 +1753,7 @@ class GsalaryWebhookEnvelope(BaseModel):
     data: dict
 
 @app.post("/webhooks/gsalary")
-async def gsalary_webhook(
+def gsalary_webhook(
     request: Request,
     body: GsalaryWebhookEnvelope,
     authorization: str | None = Header(default=None, alias="Authorization"),
@@ -1748,13 +1846,32 @@ async def gsalary_webhook(
             updated = 1
         except Exception:
             updated = 0
-    return _json_envelope({"code": 200, "data": {"updated": updated}, "msg": ""}, request)
+    return _json_envelope(envelope({"updated": updated}, 200, ""), request)
 
 
 @app.on_event("startup")
 def on_startup():
     # Initialize database tables
     init_db()
+    # 加载翻译快照与 CLDR 地区名表，请求路径上的 translate_* 不再访问 DB / 解析 Babel
+    try:
+        reload_translations()
+    except Exception:
+        pass
+    load_territory_tables()
+    if catalog_mirror is not None:
+        try:
+            catalog_mirror.start()
+        except Exception:
+            pass
+    try:
+        service.reconciler.start()
+    except Exception:
+        pass
+    try:
+        service.usage.start()
+    except Exception:
+        pass
     try:
         app.state.payee_events
     except Exception:
@@ -1772,8 +1889,32 @@ def on_startup():
             pass
 
 
+@app.on_event("startup")
+async def configure_threadpool():
+    # 路由均为同步 def，由 Starlette/anyio 线程池执行，避免阻塞事件循环；
+    # 线程池大小可配置（默认 40，与 anyio 默认一致），应与 DB 连接池大小匹配
+    try:
+        size = int(os.getenv("SERVER_THREADPOOL_SIZE", "40"))
+    except Exception:
+        size = 40
+    try:
+        import anyio.to_thread
+        anyio.to_thread.current_default_thread_limiter().total_tokens = max(1, size)
+    except Exception:
+        pass
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if catalog_mirror is not None:
+        catalog_mirror.stop()
+    service.reconciler.stop()
+    service.usage.stop()
+    close_provider_clients()
+
+
 @app.get("/me", response_model=UserDTO)
-async def get_me(current_user: ORMUser = Depends(get_current_user)):
+def get_me(current_user: ORMUser = Depends(get_current_user)):
     return UserDTO(
         id=current_user.id,
         name=current_user.name,
@@ -1791,7 +1932,7 @@ async def get_me(current_user: ORMUser = Depends(get_current_user)):
 
 
 @app.put("/me", response_model=UserDTO)
-async def update_me(body: UpdateProfileBody, current_user: ORMUser = Depends(get_current_user)):
+def update_me(body: UpdateProfileBody, current_user: ORMUser = Depends(get_current_user)):
     db = _get_db()
     try:
         if body.name is not None:
@@ -1835,7 +1976,7 @@ async def update_me(body: UpdateProfileBody, current_user: ORMUser = Depends(get
 
 
 @app.put("/me/email", response_model=UserDTO)
-async def update_email(body: ChangeEmailBody, current_user: ORMUser = Depends(get_current_user)):
+def update_email(body: ChangeEmailBody, current_user: ORMUser = Depends(get_current_user)):
     try:
         return auth_service.change_email(user_id=current_user.id, new_email=body.email, password=body.password, verification_code=body.verificationCode)
     except ValueError as e:
@@ -1850,7 +1991,7 @@ async def update_email(body: ChangeEmailBody, current_user: ORMUser = Depends(ge
 
 
 @app.put("/me/password", response_model=SuccessDTO)
-async def update_password(body: UpdatePasswordBody, current_user: ORMUser = Depends(get_current_user)):
+def update_password(body: UpdatePasswordBody, current_user: ORMUser = Depends(get_current_user)):
     try:
         return auth_service.update_password(user_id=current_user.id, new_password=body.newPassword, current_password=body.currentPassword)
     except ValueError as e:
@@ -1863,7 +2004,7 @@ async def update_password(body: UpdatePasswordBody, current_user: ORMUser = Depe
 
 
 @app.delete("/me", response_model=SuccessDTO)
-async def delete_me(body: DeleteAccountBody, current_user: ORMUser = Depends(get_current_user)):
+def delete_me(body: DeleteAccountBody, current_user: ORMUser = Depends(get_current_user)):
     try:
         return auth_service.delete_account(
             user_id=current_user.id,
@@ -1880,7 +2021,7 @@ async def delete_me(body: DeleteAccountBody, current_user: ORMUser = Depends(get
 
 # ===== Settings =====
 @app.get("/settings/languages", response_model=list[LanguageOptionDTO])
-async def get_settings_languages():
+def get_settings_languages():
     db = _get_db()
     try:
         rows = db.query(LanguageOption).order_by(LanguageOption.code.asc()).all()
@@ -1890,7 +2031,7 @@ async def get_settings_languages():
 
 
 @app.get("/settings/currencies", response_model=list[CurrencyOptionDTO])
-async def get_settings_currencies():
+def get_settings_currencies():
     db = _get_db()
     try:
         import os
@@ -1918,7 +2059,7 @@ class GsalaryPayDTO(BaseModel):
     appIdentifier: str | None = None
 
 @app.post("/payments/gsalary/pay", response_model=GsalaryPayDTO)
-async def payments_gsalary_pay(request: Request, body: GsalaryPayBody, current_user: ORMUser = Depends(get_current_user)):
+def payments_gsalary_pay(request: Request, body: GsalaryPayBody, current_user: ORMUser = Depends(get_current_user)):
     import time, hashlib, base64, rsa, urllib.parse, json, datetime
     base_url = os.getenv("GSALARY_BASE_URL", "").rstrip("/")
     import re
@@ -2090,7 +2231,7 @@ class GsalaryConsultBody(BaseModel):
     envClientIp: str | None = None
 
 @app.post("/payments/gsalary/consult", response_model=GsalaryConsultDTO)
-async def payments_gsalary_consult(request: Request, body: GsalaryConsultBody, current_user: ORMUser = Depends(get_current_user)):
+def payments_gsalary_consult(request: Request, body: GsalaryConsultBody, current_user: ORMUser = Depends(get_current_user)):
     import json, hashlib, base64, re, os
     base_url = os.getenv("GSALARY_BASE_URL", "").rstrip("/")
     def _clean_path(p: str) -> str:
@@ -2192,7 +2333,7 @@ class GsalaryAuthRefreshDTO(BaseModel):
     user_login_id: str | None = None
 
 @app.post("/payments/gsalary/auth/refresh", response_model=GsalaryAuthRefreshDTO)
-async def payments_gsalary_auth_refresh(request: Request, body: GsalaryAuthRefreshBody, current_user: ORMUser = Depends(get_current_user)):
+def payments_gsalary_auth_refresh(request: Request, body: GsalaryAuthRefreshBody, current_user: ORMUser = Depends(get_current_user)):
     import time, hashlib, base64, rsa, urllib.parse, json
     base_url = os.getenv("GSALARY_BASE_URL", "").rstrip("/")
     path = os.getenv("GSALARY_AUTH_REFRESH_PATH", "/v1/gateway/v1/acquiring/auth_refresh_token")
@@ -2267,7 +2408,7 @@ class GsalaryAuthRevokeBody(BaseModel):
     access_token: str
 
 @app.post("/payments/gsalary/auth/revoke")
-async def payments_gsalary_auth_revoke(request: Request, body: GsalaryAuthRevokeBody, current_user: ORMUser = Depends(get_current_user)):
+def payments_gsalary_auth_revoke(request: Request, body: GsalaryAuthRevokeBody, current_user: ORMUser = Depends(get_current_user)):
     import time, hashlib, base64, rsa, urllib.parse, json
     base_url = os.getenv("GSALARY_BASE_URL", "").rstrip("/")
     path = os.getenv("GSALARY_AUTH_REVOKE_PATH", "/v1/gateway/v1/acquiring/auth_revoke_token")
@@ -2333,7 +2474,7 @@ class GsalaryCancelDTO(BaseModel):
     cancelTime: str
 
 @app.post("/payments/gsalary/cancel", response_model=GsalaryCancelDTO)
-async def payments_gsalary_cancel(request: Request, body: GsalaryCancelBody, current_user: ORMUser = Depends(get_current_user)):
+def payments_gsalary_cancel(request: Request, body: GsalaryCancelBody, current_user: ORMUser = Depends(get_current_user)):
     import time, hashlib, base64, rsa, urllib.parse, json, datetime, re
     base_url = os.getenv("GSALARY_BASE_URL", "").rstrip("/")
     def _clean_path(p: str) -> str:
@@ -2438,7 +2579,7 @@ class GsalaryQueryDTO(BaseModel):
     
 
 @app.post("/payments/gsalary/query", response_model=GsalaryQueryDTO)
-async def payments_gsalary_query(request: Request, body: GsalaryQueryBody, current_user: ORMUser = Depends(get_current_user)):
+def payments_gsalary_query(request: Request, body: GsalaryQueryBody, current_user: ORMUser = Depends(get_current_user)):
     import time, hashlib, base64, rsa, urllib.parse, json, re, os
     if os.getenv("ENABLE_TEST_ENDPOINTS", "0") == "1":
         return GsalaryQueryDTO(
@@ -2546,7 +2687,7 @@ class GsalaryRefundDTO(BaseModel):
     refund_create_time: str | None = None
 
 @app.post("/payments/gsalary/refund", response_model=GsalaryRefundDTO)
-async def payments_gsalary_refund(request: Request, body: GsalaryRefundBody, current_user: ORMUser = Depends(get_current_user)):
+def payments_gsalary_refund(request: Request, body: GsalaryRefundBody, current_user: ORMUser = Depends(get_current_user)):
     import time, hashlib, base64, rsa, urllib.parse, json, datetime, re
     base_url = os.getenv("GSALARY_BASE_URL", "").rstrip("/")
     def _clean_path(p: str) -> str:
@@ -2684,7 +2825,7 @@ class GsalaryRefundQueryDTO(BaseModel):
     refund_result_message: str | None = None
 
 @app.post("/payments/gsalary/refund/query", response_model=GsalaryRefundQueryDTO)
-async def payments_gsalary_refund_query(request: Request, body: GsalaryRefundQueryBody, current_user: ORMUser = Depends(get_current_user)):
+def payments_gsalary_refund_query(request: Request, body: GsalaryRefundQueryBody, current_user: ORMUser = Depends(get_current_user)):
     import time, hashlib, base64, rsa, urllib.parse, json, re
     base_url = os.getenv("GSALARY_BASE_URL", "").rstrip("/")
     def _clean_path(p: str) -> str:
@@ -2755,7 +2896,7 @@ class GsalaryAuthTokenDTO(BaseModel):
     refresh_token_expiry_time: str | None = None
 
 @app.get("/payments/gsalary/auth/token", response_model=GsalaryAuthTokenDTO)
-async def payments_gsalary_auth_token(current_user: ORMUser = Depends(get_current_user)):
+def payments_gsalary_auth_token(current_user: ORMUser = Depends(get_current_user)):
     db = _get_db()
     try:
         rec = db.query(GSalaryAuthToken).filter(GSalaryAuthToken.user_id == current_user.id).first()
@@ -2784,7 +2925,7 @@ class KycCompleteBody(BaseModel):
     reference: str | None = None
 
 @app.post("/kyc/start", response_model=KycStartDTO)
-async def kyc_start(current_user: ORMUser = Depends(get_current_user)):
+def kyc_start(current_user: ORMUser = Depends(get_current_user)):
     db = _get_db()
     try:
         provider = os.getenv("KYC_PROVIDER", "veriff").strip().lower()
@@ -2798,7 +2939,7 @@ async def kyc_start(current_user: ORMUser = Depends(get_current_user)):
         db.close()
 
 @app.post("/kyc/complete", response_model=SuccessDTO)
-async def kyc_complete(body: KycCompleteBody, current_user: ORMUser = Depends(get_current_user)):
+def kyc_complete(body: KycCompleteBody, current_user: ORMUser = Depends(get_current_user)):
     db = _get_db()
     try:
         from datetime import datetime
@@ -2820,7 +2961,7 @@ class VeriffWebhookBody(BaseModel):
     verification: dict | None = None
 
 @app.post("/webhooks/kyc/veriff")
-async def kyc_webhook_veriff(body: VeriffWebhookBody):
+def kyc_webhook_veriff(body: VeriffWebhookBody):
     db = _get_db()
     try:
         uid = body.vendorData
@@ -2852,49 +2993,48 @@ async def kyc_webhook_veriff(body: VeriffWebhookBody):
         db.close()
 # ===== Health & Status =====
 @app.get("/health")
-async def health(response: Response):
+def health(response: Response):
     return Response(status_code=204, headers={"Cache-Control": "no-store"})
 
 
 @app.head("/health")
-async def health_head(response: Response):
+def health_head(response: Response):
     return Response(status_code=204, headers={"Cache-Control": "no-store"})
 
 
 @app.get("/status")
-async def status():
+def status():
     now = datetime.utcnow()
     uptime = int((now - SERVER_STARTED_AT).total_seconds())
-    def _safe_len(x):
-        try:
-            return len(x) if x is not None else 0
-        except Exception:
-            return 0
     data = {
         "status": "ok",
         "version": app.version,
         "time": now.isoformat() + "Z",
         "uptimeSeconds": uptime,
-        "caches": {
-            "countries": _safe_len(getattr(catalog_service, "_countries_cache", None)),
-            "regions": _safe_len(getattr(catalog_service, "_regions_cache", None)),
-            "bundleListKeys": _safe_len(getattr(catalog_service, "_bundle_list_cache", {})),
-            "bundleNetworksV2Keys": _safe_len(getattr(catalog_service, "_bundle_networks_v2_cache", {})),
-            "ttlSeconds": int(getattr(catalog_service, "_list_ttl_seconds", 0)),
-        },
+        "caches": catalog_service.cache_stats(),
+        "orderCaches": service.cache_stats(),
+        "catalogMirror": catalog_mirror.stats() if catalog_mirror is not None else None,
+        "search": catalog_service.search_stats(),
+        "catalogPayloads": catalog_payloads.stats(),
+        "orderIndex": service.index.stats(),
+        "orderReconciler": service.reconciler.stats(),
+        "usageRefresher": service.usage.stats(),
+        "provider": provider_metrics(),
     }
-    return JSONResponse(content=jsonable_encoder(data))
+    return FastJSONResponse(content=data)
 
 
 @app.get("/status.html")
-async def status_html():
+def status_html():
     now = datetime.utcnow().isoformat() + "Z"
     uptime = int((datetime.utcnow() - SERVER_STARTED_AT).total_seconds())
-    countries = len(getattr(catalog_service, "_countries_cache", []) or [])
-    regions = len(getattr(catalog_service, "_regions_cache", []) or [])
-    bundle_keys = len(getattr(catalog_service, "_bundle_list_cache", {}) or {})
-    net_keys = len(getattr(catalog_service, "_bundle_networks_v2_cache", {}) or {})
-    ttl = int(getattr(catalog_service, "_list_ttl_seconds", 0))
+    caches = catalog_service.cache_stats()
+    countries = caches.get("countries", 0)
+    regions = caches.get("regions", 0)
+    bundle_keys = caches.get("bundleListKeys", 0)
+    net_keys = caches.get("bundleNetworksV2Keys", 0)
+    ttl = caches.get("ttlSeconds", 0)
+    stale_served = caches.get("staleServed", 0)
     html = f"""
     <!doctype html>
     <html>
@@ -2922,6 +3062,7 @@ async def status_html():
           <div class='key'>bundleListKeys</div><div class='val'>{bundle_keys}</div>
           <div class='key'>bundleNetworksV2Keys</div><div class='val'>{net_keys}</div>
           <div class='key'>ttlSeconds</div><div class='val'>{ttl}</div>
+          <div class='key'>staleServed</div><div class='val'>{stale_served}</div>
         </div>
       </body>
     </html>
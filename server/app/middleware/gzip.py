@@ -0,0 +1,23 @@
+from __future__ import annotations
+from typing import Iterable
+
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class PathAwareGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that passes excluded paths through uncompressed.
+
+    Streaming endpoints (NDJSON) should send each line as soon as it is ready; gzip would
+    buffer output until a compressed block fills up.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, compresslevel: int = 9, exclude_paths: Iterable[str] = ()) -> None:
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope.get("path") in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
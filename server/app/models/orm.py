@@ -11,7 +11,9 @@ from sqlalchemy import (
     Boolean,
     Float,
     ForeignKey,
+    Index,
     Integer,
+    Text,
     UniqueConstraint,
 )
 from sqlalchemy.orm import relationship, Mapped, mapped_column
@@ -279,3 +281,74 @@ class IdempotencyRecord(Base):
     response_json: Mapped[str] = mapped_column(String(10000))
     expires_at: Mapped[datetime] = mapped_column(DateTime)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class CatalogBundle(Base):
+    """上游 /bundle/list 全量镜像（后台定时同步）；payload 为上游原始套餐 JSON。"""
+    __tablename__ = "catalog_bundles"
+
+    bundle_code: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # 上游默认顺序（未指定 sort_by 时按此顺序返回）
+    position: Mapped[int] = mapped_column(Integer, default=0)
+    payload: Mapped[str] = mapped_column(Text)
+    synced_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class UserOrder(Base):
+    """按用户索引的上游订单（order_reference 为主键）。
+
+    来源：assign_bundle、支付回调与后台对账扫描上游 /orders/list；
+    用户订单列表直接按 (user_id, created_at) 分页，仅对页内缺少 payload 的引用回查上游。
+    """
+    __tablename__ = "user_orders"
+    __table_args__ = (
+        Index("ix_user_orders_user_created", "user_id", "created_at"),
+    )
+
+    order_reference: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # 账户删除时一并删除（含邮箱 / ICCID 等个人数据）
+    user_id: Mapped[str] = mapped_column(String(32), ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    provider_order_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, index=True)
+    email: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    bundle_code: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    iccid: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
+    status: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
+    # 上游下单时间（未知时为指派时间）
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # 上游 /orders/list 原始条目 JSON（对账扫描或回查后写入）
+    payload: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class SyncCursor(Base):
+    """后台同步任务的持久化游标（例如订单对账扫描到的上游 created_at 位置）。"""
+    __tablename__ = "sync_cursors"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    cursor: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    # 跨进程租约：持有者推进游标，过期后其他进程可接管
+    lease_owner: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    lease_until: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class OrderUsage(Base):
+    """订单用量（上游 /orders/consumption）本地存储，由后台按优先级刷新。"""
+    __tablename__ = "order_usages"
+    __table_args__ = (
+        Index("ix_order_usages_due", "priority", "next_refresh_at"),
+    )
+
+    order_reference: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # 上游 consumption 原始 JSON；尚未拉取时为空
+    payload: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    plan_status: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    data_allocated: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    data_remaining: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    fetched_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    last_viewed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    # 0 最近查看 / 1 即将到期或余量低 / 2 使用中 / 3 未激活；已结束的套餐 next_refresh_at 为空
+    priority: Mapped[int] = mapped_column(Integer, default=2)
+    next_refresh_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    errors: Mapped[int] = mapped_column(Integer, default=0)
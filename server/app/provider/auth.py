@@ -1,13 +1,27 @@
 from __future__ import annotations
 import os
+import random
+import threading
 import time
 import uuid
 from typing import Optional, Dict, Any
 import httpx
 
 
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
 class TokenManager:
-    """简单的令牌管理器：使用内存存储，并支持可选的假数据模式。"""
+    """简单的令牌管理器：使用内存存储，并支持可选的假数据模式。
+
+    刷新为 single-flight：同一时刻只有一个线程访问上游登录/刷新接口，其余线程等待其结果。
+    令牌在 _expires_at 之前（提前量 + 随机抖动）由后台定时器主动续期；
+    进入续期窗口但尚未过期时，请求线程继续使用旧令牌并触发一次后台刷新，不会阻塞。
+    """
 
     def __init__(self):
         self._token: Optional[str] = os.getenv("PROVIDER_ACCESS_TOKEN")
@@ -15,6 +29,24 @@ class TokenManager:
         self._expires_at: float = time.time() + 86400 if self._token else 0
         self._refresh_token: Optional[str] = None
         self._refresh_expires_at: float = 0
+        self._lock = threading.Lock()
+        self._renew_at: float = self._compute_renew_at()
+        self._timer: Optional[threading.Timer] = None
+        self._bg_pending = False
+        # 每次成功刷新 +1（仅在持锁时读写）
+        self._generation = 0
+
+    def _compute_renew_at(self) -> float:
+        # 提前续期：过期前 PROVIDER_TOKEN_REFRESH_SKEW_SECONDS 秒，再叠加 0~JITTER 秒随机抖动，
+        # 避免多个 worker 在同一时刻集中登录
+        if not self._expires_at:
+            return 0
+        skew = max(0.0, _env_float("PROVIDER_TOKEN_REFRESH_SKEW_SECONDS", 300.0))
+        jitter = max(0.0, _env_float("PROVIDER_TOKEN_REFRESH_JITTER_SECONDS", 60.0))
+        lifetime = max(0.0, self._expires_at - time.time())
+        # 令牌有效期很短时，至多提前一半有效期
+        early = min(skew + random.uniform(0, jitter), lifetime / 2)
+        return self._expires_at - early
 
     @property
     def fake(self) -> bool:
@@ -24,15 +56,36 @@ class TokenManager:
     def get_token(self) -> str:
         if self.fake:
             return self._token or "fake-access-token"
-        if not self._token or time.time() > self._expires_at:
-            self.refresh()
+        now = time.time()
+        if not self._token or now > self._expires_at:
+            self.refresh(stale_token=self._token)
+        elif now >= self._renew_at:
+            # 处于提前续期窗口：旧令牌仍有效，交给后台刷新
+            self._refresh_in_background()
+        else:
+            self._ensure_timer()
         return self._token or ""
 
-    def refresh(self):
+    def refresh(self, stale_token: Optional[str] = None) -> bool:
         """
-        通过调用上游的登录/刷新接口来刷新令牌。
+        通过调用上游的登录/刷新接口来刷新令牌（single-flight）。
         在假数据模式下，仅设置一个新的本地令牌即可。
+
+        stale_token 为调用方失效的令牌（如收到 401/411 时使用的令牌；此前没有令牌时为 None）。
+        持锁后若当前令牌有效且已不是 stale_token，说明其他线程已完成刷新，直接复用，不再重复登录。
+        返回是否真正执行了刷新。
         """
+        with self._lock:
+            fresh = bool(self._token) and time.time() < self._expires_at
+            if fresh and self._token != stale_token:
+                return False
+            self._do_refresh()
+            self._generation += 1
+            self._renew_at = self._compute_renew_at()
+        self._schedule_timer()
+        return True
+
+    def _do_refresh(self):
         if self.fake:
             self._token = "fake-access-token"
             # 假数据模式下的默认过期时间：24 小时
@@ -59,6 +112,49 @@ class TokenManager:
                 else:
                     raise
 
+    # ===== 后台主动续期 =====
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._bg_pending:
+                return
+            self._bg_pending = True
+        t = threading.Thread(target=self._background_refresh, name="provider-token-refresh", daemon=True)
+        t.start()
+
+    def _background_refresh(self) -> None:
+        try:
+            if self.fake:
+                return
+            if self._token and time.time() < self._renew_at:
+                # 其他线程已经续期
+                self._schedule_timer()
+                return
+            self.refresh(stale_token=self._token)
+        except Exception:
+            # 后台续期失败：旧令牌过期后由请求线程同步刷新；稍后重试
+            self._schedule_timer(retry=True)
+        finally:
+            self._bg_pending = False
+
+    def _ensure_timer(self) -> None:
+        if self._timer is None and self._token:
+            self._schedule_timer()
+
+    def _schedule_timer(self, retry: bool = False) -> None:
+        if self.fake:
+            return
+        if retry:
+            delay = max(1.0, _env_float("PROVIDER_TOKEN_RETRY_SECONDS", 30.0))
+        else:
+            delay = max(1.0, self._renew_at - time.time())
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            timer = threading.Timer(delay, self._refresh_in_background)
+            timer.daemon = True
+            self._timer = timer
+        timer.start()
+
     def _agent_login(self):
         base_url = os.getenv("PROVIDER_BASE_URL", "").rstrip("/")
         username = os.getenv("PROVIDER_AGENT_USERNAME")
@@ -2,12 +2,68 @@ from __future__ import annotations
 from datetime import datetime, timedelta, timezone
 import os
 import uuid
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from .auth import TokenManager
 from .http import ProviderHTTP
 
 
+def bundle_data_mb(b: Dict[str, Any]) -> float:
+    """套餐数据量归一化为 MB，用于跨单位排序；不限量套餐视为极大值（升序排在最后）。"""
+    try:
+        val = float(b.get("gprs_limit", 0.0) or 0.0)
+    except Exception:
+        val = 0.0
+    unit = str(b.get("data_unit") or "").strip().upper()
+    if bool(b.get("unlimited")):
+        return 9e12
+    if unit in ("GB", "G", "GIB"):
+        return val * 1024.0
+    if unit in ("MB", "M", "MIB"):
+        return val
+    if unit in ("KB", "K", "KIB"):
+        return val / 1024.0
+    if unit in ("TB", "T", "TIB"):
+        return val * 1024.0 * 1024.0
+    if unit in ("B", "BYTE", "BYTES"):
+        return val / (1024.0 * 1024.0)
+    # Fallback: assume MB
+    return val
+
+
+def _bundle_num(field: str) -> Callable[[Dict[str, Any]], float]:
+    def key(b: Dict[str, Any]) -> float:
+        try:
+            return float(b.get(field, 0.0) or 0.0)
+        except Exception:
+            return 0.0
+    return key
+
+
+# sort_by → (排序键, 是否降序)；假数据模式与本地目录镜像共用
+BUNDLE_SORTS: Dict[str, tuple[Callable[[Dict[str, Any]], Any], bool]] = {
+    "price_asc": (_bundle_num("bundle_price_final"), False),
+    "price_dsc": (_bundle_num("bundle_price_final"), True),
+    "bundle_name": (lambda b: str(b.get("bundle_name", "")), False),
+    # 使用单位归一化后的数据量（MB）进行排序，避免 GB/MB 混排导致错误
+    "data_asc": (bundle_data_mb, False),
+    "data_dsc": (bundle_data_mb, True),
+    "sms_asc": (_bundle_num("sms_amount"), False),
+    "sms_dsc": (_bundle_num("sms_amount"), True),
+    "voice_asc": (_bundle_num("voice_amount"), False),
+    "voice_dsc": (_bundle_num("voice_amount"), True),
+}
+
+
+def sort_bundles(bundles: List[Dict[str, Any]], sort_by: Optional[str]) -> List[Dict[str, Any]]:
+    """按 sort_by 排序（稳定排序）；未知或为空时保持原顺序。"""
+    spec = BUNDLE_SORTS.get(sort_by or "")
+    if spec is None:
+        return list(bundles)
+    key, reverse = spec
+    return sorted(bundles, key=key, reverse=reverse)
+
+
 class ProviderClient:
     """
     上游代理接口整合客户端。
@@ -650,49 +706,8 @@ class ProviderClient:
                 filtered = [b for b in filtered if str(b.get("region_code") or "").lower() == rc]
             if bundle_code:
                 filtered = [b for b in filtered if str(b.get("bundle_code") or "") == str(bundle_code)]
-            # Helper: normalize data amount to MB for correct sorting across units
-            def _data_in_mb(b: Dict[str, Any]) -> float:
-                try:
-                    val = float(b.get("gprs_limit", 0.0) or 0.0)
-                except Exception:
-                    val = 0.0
-                unit = str(b.get("data_unit") or "").strip().upper()
-                # Unlimited plans should be treated as very large for ascending (push to end)
-                if bool(b.get("unlimited")):
-                    return 9e12
-                if unit in ("GB", "G", "GIB"):
-                    return val * 1024.0
-                if unit in ("MB", "M", "MIB"):
-                    return val
-                if unit in ("KB", "K", "KIB"):
-                    return val / 1024.0
-                if unit in ("TB", "T", "TIB"):
-                    return val * 1024.0 * 1024.0
-                if unit in ("B", "BYTE", "BYTES"):
-                    return val / (1024.0 * 1024.0)
-                # Fallback: assume MB
-                return val
-
             # Sorting
-            if sort_by == "price_asc":
-                filtered.sort(key=lambda b: float(b.get("bundle_price_final", 0.0)))
-            elif sort_by == "price_dsc":
-                filtered.sort(key=lambda b: float(b.get("bundle_price_final", 0.0)), reverse=True)
-            elif sort_by == "bundle_name":
-                filtered.sort(key=lambda b: str(b.get("bundle_name", "")))
-            elif sort_by == "data_asc":
-                # 使用单位归一化后的数据量（MB）进行排序，避免 GB/MB 混排导致错误
-                filtered.sort(key=lambda b: _data_in_mb(b))
-            elif sort_by == "data_dsc":
-                filtered.sort(key=lambda b: _data_in_mb(b), reverse=True)
-            elif sort_by == "sms_asc":
-                filtered.sort(key=lambda b: float(b.get("sms_amount", 0.0)))
-            elif sort_by == "sms_dsc":
-                filtered.sort(key=lambda b: float(b.get("sms_amount", 0.0)), reverse=True)
-            elif sort_by == "voice_asc":
-                filtered.sort(key=lambda b: float(b.get("voice_amount", 0.0)))
-            elif sort_by == "voice_dsc":
-                filtered.sort(key=lambda b: float(b.get("voice_amount", 0.0)), reverse=True)
+            filtered = sort_bundles(filtered, sort_by)
             start = max(0, (page_number - 1) * page_size)
             end = start + page_size
             page_items = filtered[start:end]
@@ -717,27 +732,7 @@ class ProviderClient:
         data = envelope.get("data") or {}
         bundles = data.get("bundles") or []
         if sort_by in ("data_asc", "data_dsc"):
-            reverse = (sort_by == "data_dsc")
-            def _data_in_mb_upstream(b: Dict[str, Any]) -> float:
-                try:
-                    val = float(b.get("gprs_limit", 0.0) or 0.0)
-                except Exception:
-                    val = 0.0
-                unit = str(b.get("data_unit") or "").strip().upper()
-                if bool(b.get("unlimited")):
-                    return 9e12
-                if unit in ("GB", "G", "GIB"):
-                    return val * 1024.0
-                if unit in ("MB", "M", "MIB"):
-                    return val
-                if unit in ("KB", "K", "KIB"):
-                    return val / 1024.0
-                if unit in ("TB", "T", "TIB"):
-                    return val * 1024.0 * 1024.0
-                if unit in ("B", "BYTE", "BYTES"):
-                    return val / (1024.0 * 1024.0)
-                return val
-            bundles = sorted(bundles, key=_data_in_mb_upstream, reverse=reverse)
+            bundles = sorted(bundles, key=bundle_data_mb, reverse=(sort_by == "data_dsc"))
         upstream_count = data.get("bundles_count") or data.get("total") or data.get("count")
         try:
             bundles_count = int(float(str(upstream_count))) if upstream_count is not None else len(bundles)
@@ -876,4 +871,4 @@ class ProviderClient:
             include_token=True,
         )
         data = envelope.get("data") or {}
-        return data
\ No newline at end of file
+        return data
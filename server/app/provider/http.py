@@ -4,13 +4,64 @@ from typing import Any, Dict
 import httpx
 import time
 import random
+import threading
 
 from .auth import TokenManager
-from .errors import raise_for_provider
+from .errors import ProviderError, raise_for_provider
+from .limiter import UpstreamLimiter, get_upstream_limiter
+
+
+def _backoff_delay(backoff_ms: float, attempt: int) -> float:
+    return (backoff_ms / 1000.0) * (2 ** attempt) + (random.random() * 0.05)
+
+
+def _envelope_error(envelope: Dict[str, Any]) -> tuple[bool, Any, Any]:
+    """解析统一响应 {code, data, msg}，返回 (success, err_code, err_msg)。"""
+    code = envelope.get("code")
+    msg = envelope.get("msg", "")
+    data = envelope.get("data") or {}
+    success = (code in (None, 0, 200)) and not (
+        isinstance(data, dict) and data.get("err_code")
+    )
+    if success:
+        return True, None, None
+    err_code = None
+    err_msg = None
+    if isinstance(data, dict):
+        err_code = data.get("err_code")
+        err_msg = data.get("err_msg", msg)
+    if err_code is None:
+        err_code = code if code not in (0, 200) else None
+        err_msg = msg
+    return False, err_code, err_msg
+
+
+class _HTTPStats:
+    """上游连接指标（请求数、重试、失败、令牌刷新、累计耗时）。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts: Dict[str, float] = {"requests": 0, "retries": 0, "errors": 0, "tokenRefreshes": 0, "totalMs": 0.0}
+
+    def add(self, key: str, n: float = 1) -> None:
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + n
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self._counts)
+        reqs = int(c.get("requests", 0))
+        return {
+            "requests": reqs,
+            "retries": int(c.get("retries", 0)),
+            "errors": int(c.get("errors", 0)),
+            "tokenRefreshes": int(c.get("tokenRefreshes", 0)),
+            "avgMs": round(c.get("totalMs", 0.0) / reqs, 2) if reqs else 0.0,
+        }
 
 
 class ProviderHTTP:
-    def __init__(self, token_mgr: TokenManager):
+    def __init__(self, token_mgr: TokenManager, limiter: UpstreamLimiter | None = None):
         self.token_mgr = token_mgr
         self.base_url = os.getenv("PROVIDER_BASE_URL", "")
         try:
@@ -52,12 +103,43 @@ class ProviderHTTP:
             max_keepalive = 20
         limits = httpx.Limits(max_connections=max_conns, max_keepalive_connections=max_keepalive)
         self._client = httpx.Client(timeout=timeout, limits=limits)
+        self._stats = _HTTPStats()
+        # 进程级上游并发限制（全局 + 按接口预算）；只在真正发出请求时占用名额，退避等待不占用
+        self.limiter = limiter or get_upstream_limiter()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._stats.snapshot()
+
+    def close(self) -> None:
+        self._client.close()
+
+    def _send(self, client: httpx.Client, path: str, url: str, json: Dict[str, Any], headers: Dict[str, str]) -> httpx.Response:
+        with self.limiter.slot(path):
+            t0 = time.perf_counter()
+            try:
+                return client.post(url, json=json, headers=headers)
+            finally:
+                self._stats.add("requests")
+                self._stats.add("totalMs", (time.perf_counter() - t0) * 1000.0)
+
+    def _refresh_token(self, stale_token: str | None) -> str:
+        # 多个并发请求同时收到 401/411 时，仅第一个真正刷新，其余复用新令牌
+        if self.token_mgr.refresh(stale_token=stale_token):
+            self._stats.add("tokenRefreshes")
+        return self.token_mgr.get_token()
 
     def post(self, path: str, json: Dict[str, Any], extra_headers: Dict[str, str] | None = None, include_token: bool = True) -> Dict[str, Any]:
         """
         Calls upstream POST and handles unified response: {code, data, msg}
         In fake mode or missing base_url, returns an empty success envelope.
         """
+        try:
+            return self._post(path, json, extra_headers, include_token)
+        except ProviderError:
+            self._stats.add("errors")
+            raise
+
+    def _post(self, path: str, json: Dict[str, Any], extra_headers: Dict[str, str] | None, include_token: bool) -> Dict[str, Any]:
         headers = {
             "Content-Type": "application/json",
         }
@@ -84,29 +166,28 @@ class ProviderHTTP:
         attempt = 0
         while True:
             try:
-                resp = client.post(url, json=json, headers=headers)
+                resp = self._send(client, path, url, json, headers)
                 resp.raise_for_status()
             except httpx.HTTPStatusError as e:
                 status_code = e.response.status_code if e.response is not None else None
                 if status_code == 401 and include_token:
                     try:
-                        self.token_mgr.refresh()
-                        headers["Access-Token"] = self.token_mgr.get_token()
-                        resp = client.post(url, json=json, headers=headers)
+                        headers["Access-Token"] = self._refresh_token(headers.get("Access-Token"))
+                        resp = self._send(client, path, url, json, headers)
                         resp.raise_for_status()
                     except Exception:
                         pass
                 else:
                     if status_code and status_code >= 500 and attempt < retries:
-                        delay = (backoff_ms / 1000.0) * (2 ** attempt) + (random.random() * 0.05)
-                        time.sleep(delay)
+                        time.sleep(_backoff_delay(backoff_ms, attempt))
+                        self._stats.add("retries")
                         attempt += 1
                         continue
                     raise_for_provider(-1, "upstream http error")
             except httpx.RequestError:
                 if attempt < retries:
-                    delay = (backoff_ms / 1000.0) * (2 ** attempt) + (random.random() * 0.05)
-                    time.sleep(delay)
+                    time.sleep(_backoff_delay(backoff_ms, attempt))
+                    self._stats.add("retries")
                     attempt += 1
                     continue
                 raise_for_provider(-1, "network error")
@@ -114,48 +195,22 @@ class ProviderHTTP:
                 envelope = resp.json()
             except Exception:
                 if attempt < retries:
-                    delay = (backoff_ms / 1000.0) * (2 ** attempt) + (random.random() * 0.05)
-                    time.sleep(delay)
+                    time.sleep(_backoff_delay(backoff_ms, attempt))
+                    self._stats.add("retries")
                     attempt += 1
                     continue
                 raise_for_provider(-1, "invalid response")
             break
-        code = envelope.get("code")
-        msg = envelope.get("msg", "")
-        data = envelope.get("data") or {}
-        success = (code in (None, 0, 200)) and not (
-            isinstance(data, dict) and data.get("err_code")
-        )
+        success, err_code, err_msg = _envelope_error(envelope)
         if success:
             return envelope
-        err_code = None
-        err_msg = None
-        if isinstance(data, dict):
-            err_code = data.get("err_code")
-            err_msg = data.get("err_msg", msg)
-        if err_code is None:
-            err_code = code if code not in (0, 200) else None
-            err_msg = msg
-            # Try refresh on 411
-            if err_code == 411 and include_token:
-                self.token_mgr.refresh()
-                headers["Access-Token"] = self.token_mgr.get_token()
-                resp = client.post(url, json=json, headers=headers)
-                resp.raise_for_status()
-                envelope = resp.json()
-                code = envelope.get("code")
-                msg = envelope.get("msg", "")
-                data = envelope.get("data") or {}
-                success = (code in (None, 0, 200)) and not (
-                    isinstance(data, dict) and data.get("err_code")
-                )
-                if success:
-                    return envelope
-                # Fall through to raise with new error info
-                if isinstance(data, dict):
-                    err_code = data.get("err_code")
-                    err_msg = data.get("err_msg", msg)
-                else:
-                    err_code = code
-                    err_msg = msg
-            raise_for_provider(err_code or -1, err_msg or "provider error")
\ No newline at end of file
+        # Try refresh on 411
+        if err_code == 411 and include_token:
+            headers["Access-Token"] = self._refresh_token(headers.get("Access-Token"))
+            resp = self._send(client, path, url, json, headers)
+            resp.raise_for_status()
+            envelope = resp.json()
+            success, err_code, err_msg = _envelope_error(envelope)
+            if success:
+                return envelope
+        raise_for_provider(err_code or -1, err_msg or "provider error")
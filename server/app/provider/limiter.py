@@ -0,0 +1,300 @@
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from .errors import ProviderError
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+# 默认按接口的并发预算（未列出的接口使用 UPSTREAM_DEFAULT_BUDGET）
+_DEFAULT_BUDGETS: Dict[str, int] = {
+    "/orders/consumption": 8,
+    "/orders/detail": 8,
+    "/orders/list": 6,
+    "/bundle/list": 4,
+    "/bundle/assign": 4,
+}
+
+
+def _parse_budgets(raw: Optional[str]) -> Dict[str, int]:
+    """UPSTREAM_BUDGETS="/orders/consumption=8,/bundle/list=4"，覆盖默认预算。"""
+    budgets = dict(_DEFAULT_BUDGETS)
+    for part in (raw or "").split(","):
+        if "=" not in part:
+            continue
+        path, _, n = part.partition("=")
+        try:
+            budgets[path.strip()] = max(1, int(n))
+        except Exception:
+            continue
+    return budgets
+
+
+# 当前任务的截止时间（monotonic）：由 UpstreamExecutor 在任务开始时设置，排队等待名额不超过它
+_task_deadline: ContextVar[Optional[float]] = ContextVar("upstream_task_deadline", default=None)
+
+
+class UpstreamBusy(ProviderError):
+    """排队超过截止时间仍未拿到上游并发名额。"""
+
+    def __init__(self, path: str):
+        super().__init__(code=-1, msg=f"upstream busy: {path}", http_status=503)
+        self.path = path
+
+
+class _Budget:
+    __slots__ = ("limit", "sem", "in_flight", "queued", "max_queued", "acquired", "timeouts", "wait_ms")
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.sem = threading.BoundedSemaphore(limit)
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait_ms = 0.0
+
+
+class UpstreamLimiter:
+    """进程级上游并发限制：全局上限 + 按接口预算，排队带截止时间。
+
+    先占接口名额再占全局名额（等待接口名额时不占用全局名额）；超过截止时间抛出 UpstreamBusy。
+    """
+
+    def __init__(
+        self,
+        total: Optional[int] = None,
+        budgets: Optional[Dict[str, int]] = None,
+        default_budget: Optional[int] = None,
+        queue_timeout_ms: Optional[int] = None,
+    ) -> None:
+        self.total = max(1, total if total is not None else _env_int("UPSTREAM_MAX_CONCURRENCY", 32))
+        self.budgets = budgets if budgets is not None else _parse_budgets(os.getenv("UPSTREAM_BUDGETS"))
+        self.default_budget = max(1, default_budget if default_budget is not None else _env_int("UPSTREAM_DEFAULT_BUDGET", 8))
+        self.queue_timeout = max(0, queue_timeout_ms if queue_timeout_ms is not None else _env_int("UPSTREAM_QUEUE_TIMEOUT_MS", 5000)) / 1000.0
+        self._lock = threading.Lock()
+        self._global = _Budget(self.total)
+        self._by_path: Dict[str, _Budget] = {}
+
+    def _budget(self, path: str) -> _Budget:
+        b = self._by_path.get(path)
+        if b is None:
+            with self._lock:
+                b = self._by_path.get(path)
+                if b is None:
+                    b = _Budget(min(self.total, self.budgets.get(path, self.default_budget)))
+                    self._by_path[path] = b
+        return b
+
+    def _enter_queue(self, b: _Budget) -> None:
+        with self._lock:
+            b.queued += 1
+            b.max_queued = max(b.max_queued, b.queued)
+
+    def _leave_queue(self, b: _Budget, ok: bool, waited: float) -> None:
+        with self._lock:
+            b.queued -= 1
+            b.wait_ms += waited * 1000.0
+            if ok:
+                b.acquired += 1
+                b.in_flight += 1
+            else:
+                b.timeouts += 1
+
+    def _leave_queue_fast(self, b: _Budget) -> None:
+        with self._lock:
+            b.acquired += 1
+            b.in_flight += 1
+
+    def _release(self, b: _Budget) -> None:
+        with self._lock:
+            b.in_flight -= 1
+        b.sem.release()
+
+    def _acquire_one(self, b: _Budget, deadline: float) -> bool:
+        t0 = time.monotonic()
+        if b.sem.acquire(blocking=False):
+            self._leave_queue_fast(b)
+            return True
+        self._enter_queue(b)
+        ok = b.sem.acquire(timeout=max(0.0, deadline - t0))
+        self._leave_queue(b, ok, time.monotonic() - t0)
+        return ok
+
+    def _deadline(self, timeout: Optional[float]) -> float:
+        deadline = time.monotonic() + (self.queue_timeout if timeout is None else max(0.0, timeout))
+        outer = _task_deadline.get()
+        return deadline if outer is None else min(deadline, outer)
+
+    def acquire(self, path: str, timeout: Optional[float] = None) -> None:
+        """占用 path 与全局名额；超时（或超过所在任务的截止时间）抛出 UpstreamBusy。须与 release(path) 成对调用。"""
+        deadline = self._deadline(timeout)
+        b = self._budget(path)
+        if not self._acquire_one(b, deadline):
+            raise UpstreamBusy(path)
+        if not self._acquire_one(self._global, deadline):
+            self._release(b)
+            raise UpstreamBusy(path)
+
+    def release(self, path: str) -> None:
+        self._release(self._global)
+        self._release(self._budget(path))
+
+    @contextmanager
+    def slot(self, path: str, timeout: Optional[float] = None) -> Iterator[None]:
+        self.acquire(path, timeout)
+        try:
+            yield
+        finally:
+            self.release(path)
+
+    @staticmethod
+    def _snapshot(b: _Budget) -> Dict[str, Any]:
+        waits = b.acquired + b.timeouts
+        return {
+            "limit": b.limit,
+            "inFlight": b.in_flight,
+            "queued": b.queued,
+            "maxQueued": b.max_queued,
+            "acquired": b.acquired,
+            "timeouts": b.timeouts,
+            "avgWaitMs": round(b.wait_ms / waits, 2) if waits else 0.0,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "global": self._snapshot(self._global),
+                "endpoints": {p: self._snapshot(b) for p, b in sorted(self._by_path.items())},
+                "queueTimeoutMs": int(self.queue_timeout * 1000),
+            }
+
+
+class UpstreamExecutor:
+    """进程共享的上游调用线程池。
+
+    - 请求路径提交的任务带截止时间（从提交时起算）：到期仍未开始的任务被取消，已开始的任务
+      等待名额时只用剩余时间，避免排在线程池队列里无限等待；
+    - 后台任务（background=True）同时最多占用 UPSTREAM_BACKGROUND_WORKERS 个线程（提交方阻塞等待），
+      不会把请求流量挤在队列后面。
+    """
+
+    def __init__(self, workers: Optional[int] = None, background_workers: Optional[int] = None, limiter: Optional[UpstreamLimiter] = None) -> None:
+        self.workers = max(1, workers if workers is not None else _env_int("UPSTREAM_EXECUTOR_WORKERS", 32))
+        bg = background_workers if background_workers is not None else _env_int("UPSTREAM_BACKGROUND_WORKERS", max(1, self.workers // 4))
+        self.background_workers = max(1, min(self.workers, bg))
+        self._limiter = limiter
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="upstream")
+        self._background = threading.BoundedSemaphore(self.background_workers)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.background_submitted = 0
+        self.expired = 0
+        self.cancelled = 0
+
+    def deadline(self, timeout: Optional[float] = None) -> float:
+        """从现在起算的截止时间；默认使用限流器的排队超时（UPSTREAM_QUEUE_TIMEOUT_MS）。"""
+        if timeout is None:
+            timeout = (self._limiter or get_upstream_limiter()).queue_timeout
+        return time.monotonic() + max(0.0, timeout)
+
+    def submit(self, fn: Callable[..., Any], *args: Any, deadline: Optional[float] = None, background: bool = False) -> Future:
+        if background:
+            self._background.acquire()
+
+        def run() -> Any:
+            if deadline is not None and time.monotonic() >= deadline:
+                with self._lock:
+                    self.expired += 1
+                raise UpstreamBusy("executor")
+            token = _task_deadline.set(deadline)
+            try:
+                return fn(*args)
+            finally:
+                _task_deadline.reset(token)
+
+        try:
+            fut = self._pool.submit(run)
+        except BaseException:
+            if background:
+                self._background.release()
+            raise
+        with self._lock:
+            self.submitted += 1
+            if background:
+                self.background_submitted += 1
+        if background:
+            fut.add_done_callback(lambda _f: self._background.release())
+        return fut
+
+    def as_completed(self, futs: Iterable[Future], deadline: float) -> Iterator[Future]:
+        """按完成先后产出；截止时仍未开始的任务被取消（同样产出，result() 抛 CancelledError）。"""
+        pending = set(futs)
+        try:
+            for f in as_completed(pending, timeout=max(0.0, deadline - time.monotonic())):
+                pending.discard(f)
+                yield f
+        except FuturesTimeout:
+            # 已取消的 future 要等工作线程取出后才会通知等待者，这里直接产出
+            cancelled = [f for f in pending if f.cancel()]
+            if cancelled:
+                with self._lock:
+                    self.cancelled += len(cancelled)
+            yield from cancelled
+            yield from as_completed(pending.difference(cancelled))
+
+    def wait(self, futs: Iterable[Future], deadline: float) -> None:
+        for _ in self.as_completed(futs, deadline):
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "backgroundWorkers": self.background_workers,
+                "queued": self._pool._work_queue.qsize(),
+                "submitted": self.submitted,
+                "backgroundSubmitted": self.background_submitted,
+                "expired": self.expired,
+                "cancelled": self.cancelled,
+            }
+
+
+_lock = threading.Lock()
+_limiter: Optional[UpstreamLimiter] = None
+_executor: Optional[UpstreamExecutor] = None
+
+
+def get_upstream_limiter() -> UpstreamLimiter:
+    global _limiter
+    limiter = _limiter
+    if limiter is not None:
+        return limiter
+    with _lock:
+        if _limiter is None:
+            _limiter = UpstreamLimiter()
+        return _limiter
+
+
+def upstream_executor() -> UpstreamExecutor:
+    """进程共享的上游调用线程池（替代每个请求临时创建的线程池）；实际并发由 UpstreamLimiter 约束。"""
+    global _executor
+    ex = _executor
+    if ex is not None:
+        return ex
+    with _lock:
+        if _executor is None:
+            _executor = UpstreamExecutor()
+        return _executor
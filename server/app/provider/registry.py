@@ -0,0 +1,47 @@
+from __future__ import annotations
+import threading
+from typing import Any, Dict, Optional
+
+from .client import ProviderClient
+from .limiter import get_upstream_limiter, upstream_executor
+
+
+# 进程级上游客户端注册表：所有服务共享同一个 TokenManager、同一个连接池与一套连接指标，
+# 避免每个服务各自登录上游、各自维护 keep-alive 连接。
+_lock = threading.Lock()
+_client: Optional[ProviderClient] = None
+
+
+def get_provider_client() -> ProviderClient:
+    """服务构造时未注入上游客户端则使用此进程级共享实例（共享令牌与连接池）。"""
+    global _client
+    client = _client
+    if client is not None:
+        return client
+    with _lock:
+        if _client is None:
+            _client = ProviderClient()
+        return _client
+
+
+def close_provider_clients() -> None:
+    """关闭共享客户端并清空注册表；之后的 get_provider_client() 会重新创建。"""
+    global _client
+    with _lock:
+        client = _client
+        _client = None
+    if client is not None:
+        try:
+            client.http.close()
+        except Exception:
+            pass
+
+
+def provider_metrics() -> Dict[str, Any]:
+    client = _client
+    if client is None:
+        return {}
+    stats = client.http.stats()
+    stats["limiter"] = get_upstream_limiter().stats()
+    stats["executor"] = upstream_executor().stats()
+    return stats
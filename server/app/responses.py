@@ -0,0 +1,79 @@
+from __future__ import annotations
+import dataclasses
+import datetime
+import decimal
+import enum
+import json
+import uuid
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# orjson 为可选依赖：未安装时回退标准库 json（输出格式一致，仅速度不同）
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover - 取决于部署环境
+    orjson = None  # type: ignore
+
+
+def _default(obj: Any) -> Any:
+    """orjson / json 无法直接序列化的类型：与 jsonable_encoder 的输出保持一致。"""
+    if isinstance(obj, BaseModel):
+        # pydantic 直接输出 JSON 兼容结构（datetime → ISO 字符串等），不经过 jsonable_encoder 的逐字段遍历
+        return obj.model_dump(mode="json", by_alias=True)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", errors="replace")
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    # 与 jsonable_encoder 相同的兜底：dict(obj)，再尝试 vars(obj)
+    try:
+        return dict(obj)
+    except Exception:
+        pass
+    try:
+        return vars(obj)
+    except Exception:
+        pass
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def dumps(content: Any) -> bytes:
+    """紧凑 UTF-8 JSON（与 Starlette JSONResponse 输出一致）；安装 orjson 时走 orjson。"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            # 超出 orjson 支持范围（如 64 位以上整数）：回退标准库
+            pass
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def json_backend() -> str:
+    return "orjson" if orjson is not None else "json"
+
+
+class FastJSONResponse(JSONResponse):
+    """直接序列化 DTO / dict 的 JSONResponse：路由无需先调用 jsonable_encoder。"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def envelope(data: Any = None, code: int = 200, msg: Optional[str] = "") -> dict:
+    """上游兼容信封 { code, data, msg }；data 可包含 pydantic DTO，由 FastJSONResponse 负责序列化。"""
+    return {"code": code, "data": data, "msg": msg}
@@ -4,6 +4,7 @@ from datetime import datetime, timezone
 
 from ..models.dto import AgentAccountDTO, AgentBillsDTO, AgentBillDTO
 from ..provider.client import ProviderClient
+from ..provider.registry import get_provider_client
 
 
 def _to_float(val, default=0.0) -> float:
@@ -63,8 +64,8 @@ def _to_epoch(val) -> int:
 
 
 class AgentService:
-    def __init__(self):
-        self.provider = ProviderClient()
+    def __init__(self, provider: Optional[ProviderClient] = None):
+        self.provider = provider or get_provider_client()
 
         
     def get_account(self, request_id: Optional[str] = None) -> Optional[AgentAccountDTO]:
@@ -378,6 +378,9 @@ class AuthService:
             # 解除订单关联，保留订单记录
             from ..models.orm import Order
             db.query(Order).filter(Order.user_id == user.id).update({Order.user_id: None})
+            # 订单索引含邮箱 / ICCID，随账户删除（旧库的 user_orders 表没有外键级联）
+            from ..models.orm import UserOrder
+            db.query(UserOrder).filter(UserOrder.user_id == user.id).delete(synchronize_session=False)
             # Delete sessions first for safety; cascades may handle this but be explicit
             db.query(UserSession).filter(UserSession.user_id == user.id).delete()
             db.delete(user)
@@ -0,0 +1,139 @@
+from __future__ import annotations
+from array import array
+from typing import Any, Dict, List, Optional, Sequence
+
+from ..provider.client import bundle_data_mb
+
+
+def _num(b: Dict[str, Any], field: str) -> float:
+    try:
+        return float(b.get(field, 0.0) or 0.0)
+    except Exception:
+        return 0.0
+
+
+def _int(b: Dict[str, Any], field: str) -> int:
+    try:
+        return int(float(str(b.get(field) or 0)))
+    except Exception:
+        return 0
+
+
+def _search_text(b: Dict[str, Any]) -> str:
+    # 与 CatalogService.bundle_list 的 q 匹配字段一致：名称、描述、首个国家码、数据量；
+    # 以 \x00 分隔，避免跨字段拼接产生误匹配
+    name = str(b.get("bundle_name") or b.get("bundle_marketing_name") or "")
+    desc = str(b.get("description") or "")
+    cc = str((b.get("country_code") or [""])[0])
+    data_amt = str(b.get("gprs_limit") or "") + " " + str(b.get("data_unit") or "")
+    return "\x00".join((name, desc, cc, data_amt)).lower()
+
+
+class BundleColumns:
+    """套餐目录的列式索引（stdlib array，不依赖 NumPy）。
+
+    - 数值列：price / data_mb / validity / sms / voice；分类列：category / region（整数编码）；
+    - 每个 sort_by 预先计算排列（perm）与其逆（rank）：无过滤时分页即切片，有过滤时按 rank 排序候选；
+    - 倒排：bundle_code → 行号，country_code → 行号列表。
+    """
+
+    def __init__(self, bundles: Sequence[Dict[str, Any]]) -> None:
+        n = len(bundles)
+        self.size = n
+        self.price = array("d", (_num(b, "bundle_price_final") for b in bundles))
+        self.data_mb = array("d", (bundle_data_mb(b) for b in bundles))
+        self.validity = array("l", (_int(b, "validity") for b in bundles))
+        self.sms = array("d", (_num(b, "sms_amount") for b in bundles))
+        self.voice = array("d", (_num(b, "voice_amount") for b in bundles))
+        self.categories: List[str] = []
+        self.regions: List[str] = []
+        cat_ids: Dict[str, int] = {}
+        region_ids: Dict[str, int] = {}
+        self.category = array("l", (self._code(cat_ids, self.categories, str(b.get("bundle_category") or "").lower()) for b in bundles))
+        self.region = array("l", (self._code(region_ids, self.regions, str(b.get("region_code") or "").lower()) for b in bundles))
+        self._category_ids = cat_ids
+        self._region_ids = region_ids
+        self.text: List[str] = [_search_text(b) for b in bundles]
+        self.by_code: Dict[str, int] = {}
+        self.by_country: Dict[str, array] = {}
+        for i, b in enumerate(bundles):
+            self.by_code[str(b.get("bundle_code") or "")] = i
+            for cc in (b.get("country_code") or []):
+                self.by_country.setdefault(str(cc).upper(), array("l")).append(i)
+        # 预排序：sorted() 稳定，与按 dict 排序的结果一致
+        names = [str(b.get("bundle_name", "")) for b in bundles]
+        keyed: Dict[str, Sequence[Any]] = {
+            "price": self.price,
+            "data_mb": self.data_mb,
+            "sms": self.sms,
+            "voice": self.voice,
+            "name": names,
+        }
+        sort_cols = {
+            "price_asc": ("price", False), "price_dsc": ("price", True),
+            "data_asc": ("data_mb", False), "data_dsc": ("data_mb", True),
+            "sms_asc": ("sms", False), "sms_dsc": ("sms", True),
+            "voice_asc": ("voice", False), "voice_dsc": ("voice", True),
+            "bundle_name": ("name", False),
+        }
+        self.perm: Dict[str, array] = {}
+        self.rank: Dict[str, array] = {}
+        for sort_by, (col_name, reverse) in sort_cols.items():
+            col = keyed[col_name]
+            perm = array("l", sorted(range(n), key=col.__getitem__, reverse=reverse))
+            rank = array("l", bytes(perm.itemsize * n))
+            for r, i in enumerate(perm):
+                rank[i] = r
+            self.perm[sort_by] = perm
+            self.rank[sort_by] = rank
+
+    @staticmethod
+    def _code(ids: Dict[str, int], names: List[str], value: str) -> int:
+        code = ids.get(value)
+        if code is None:
+            code = len(names)
+            ids[value] = code
+            names.append(value)
+        return code
+
+    def select(
+        self,
+        country_code: Optional[str] = None,
+        region_code: Optional[str] = None,
+        bundle_category: Optional[str] = None,
+        bundle_code: Optional[str] = None,
+        sort_by: Optional[str] = None,
+    ) -> Sequence[int]:
+        """返回满足过滤条件、按 sort_by 排好序的行号序列。"""
+        perm = self.perm.get(sort_by or "")
+        region_id = self._region_ids.get(str(region_code).lower(), -1) if region_code else None
+        category_id = self._category_ids.get(str(bundle_category).lower(), -1) if bundle_category else None
+        if bundle_code:
+            i = self.by_code.get(str(bundle_code))
+            base: Optional[Sequence[int]] = [i] if i is not None else []
+        elif country_code:
+            base = self.by_country.get(str(country_code).upper(), ())
+        else:
+            base = None
+        if base is None and region_id is None and category_id is None:
+            # 无过滤：直接使用预排序排列（或原始顺序）
+            return perm if perm is not None else range(self.size)
+        rows: Sequence[int] = base if base is not None else (perm if perm is not None else range(self.size))
+        region_col, category_col = self.region, self.category
+        country_rows = None
+        if bundle_code and country_code:
+            country_rows = set(self.by_country.get(str(country_code).upper(), ()))
+        out = [
+            i for i in rows
+            if (region_id is None or region_col[i] == region_id)
+            and (category_id is None or category_col[i] == category_id)
+            and (country_rows is None or i in country_rows)
+        ]
+        if base is not None and perm is not None and len(out) > 1:
+            out.sort(key=self.rank[sort_by or ""].__getitem__)
+        return out
+
+    def match_text(self, rows: Sequence[int], q: str) -> List[int]:
+        ql = str(q).strip().lower()
+        text = self.text
+        return [i for i in rows if ql in text[i]]
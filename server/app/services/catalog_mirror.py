@@ -0,0 +1,275 @@
+from __future__ import annotations
+from datetime import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from ..db import SessionLocal
+from ..models.orm import CatalogBundle
+from ..provider.client import ProviderClient
+from ..provider.registry import get_provider_client
+from .bundle_index import BundleColumns
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def mirror_enabled() -> bool:
+    # 默认关闭：每个 worker 都会各自全量拉取目录，多 worker 部署时只在一个进程（或单独任务）中开启
+    return os.getenv("CATALOG_MIRROR_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+class _MirrorSnapshot:
+    """不可变的目录快照 + 列式索引；同步完成后整体替换。"""
+
+    __slots__ = ("version", "synced_at", "bundles", "payloads", "columns", "digest")
+
+    def __init__(self, bundles: List[Dict[str, Any]], version: int, synced_at: float, payloads: Optional[Dict[str, str]] = None) -> None:
+        self.version = version
+        self.synced_at = synced_at
+        self.bundles = bundles
+        # bundle_code -> 序列化后的 payload（增量同步时用于比对是否变化）
+        self.payloads: Dict[str, str] = payloads if payloads is not None else {
+            str(b.get("bundle_code")): json.dumps(b, ensure_ascii=False, sort_keys=True) for b in bundles
+        }
+        self.columns = BundleColumns(bundles)
+        # 内容摘要（含顺序）：跨 worker / 重启稳定，用于派生 ETag 与本地化 payload 缓存 key
+        h = hashlib.md5()
+        for b in bundles:
+            h.update(self.payloads.get(str(b.get("bundle_code")), "").encode("utf-8"))
+            h.update(b"\n")
+        self.digest = h.hexdigest()
+
+
+class BundleCatalogMirror:
+    """上游套餐目录的本地镜像。
+
+    - 后台线程每 CATALOG_MIRROR_SYNC_SECONDS 秒分页拉取完整 /bundle/list，增量写入 catalog_bundles 表；
+    - 启动时先从表中加载上次同步结果，重启后无需等待上游即可提供服务；
+    - 过滤（country/region/category/bundle_code）、排序与分页均在本地索引上完成。
+    """
+
+    def __init__(self, provider: Optional[ProviderClient] = None) -> None:
+        self.provider = provider or get_provider_client()
+        self.page_size = max(1, _env_int("CATALOG_MIRROR_PAGE_SIZE", 200))
+        self.max_pages = max(1, _env_int("CATALOG_MIRROR_MAX_PAGES", 500))
+        self.interval = max(10, _env_int("CATALOG_MIRROR_SYNC_SECONDS", 900))
+        self._snapshot: Optional[_MirrorSnapshot] = None
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.syncs = 0
+        self.sync_errors = 0
+        self.last_error: Optional[str] = None
+        self.last_sync_ms = 0
+        self.last_changes: Dict[str, int] = {"added": 0, "updated": 0, "removed": 0}
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def version(self) -> int:
+        snap = self._snapshot
+        return snap.version if snap is not None else 0
+
+    @property
+    def digest(self) -> Optional[str]:
+        snap = self._snapshot
+        return snap.digest if snap is not None else None
+
+    # ===== 查询 =====
+    def get(self, bundle_code: str) -> Optional[Dict[str, Any]]:
+        snap = self._snapshot
+        if snap is None:
+            return None
+        i = snap.columns.by_code.get(str(bundle_code))
+        return snap.bundles[i] if i is not None else None
+
+    def all(self) -> List[Dict[str, Any]]:
+        snap = self._snapshot
+        return list(snap.bundles) if snap is not None else []
+
+    def query(
+        self,
+        page_number: int,
+        page_size: int,
+        country_code: Optional[str] = None,
+        region_code: Optional[str] = None,
+        bundle_category: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        bundle_code: Optional[str] = None,
+        q: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """与上游 /bundle/list 相同语义的本地查询；镜像尚未就绪时返回 None（调用方回退上游）。
+
+        q 与 CatalogService.bundle_list 原有语义一致：仅过滤当前页，bundles_count 为过滤 q 之前的总数。
+        """
+        snap = self._snapshot
+        if snap is None:
+            return None
+        cols = snap.columns
+        rows = cols.select(
+            country_code=country_code,
+            region_code=region_code,
+            bundle_category=bundle_category,
+            bundle_code=bundle_code,
+            sort_by=sort_by,
+        )
+        start = max(0, (page_number - 1) * page_size)
+        page = rows[start:start + page_size]
+        if q:
+            page = cols.match_text(page, q)
+        return {"bundles": [snap.bundles[i] for i in page], "bundles_count": len(rows)}
+
+    # ===== 同步 =====
+    def _fetch_all(self) -> List[Dict[str, Any]]:
+        bundles: List[Dict[str, Any]] = []
+        seen: set[str] = set()
+        for page in range(1, self.max_pages + 1):
+            data = self.provider.get_bundle_list(page_number=page, page_size=self.page_size)
+            items = data.get("bundles") or []
+            for b in items:
+                code = str(b.get("bundle_code") or "")
+                if code and code not in seen:
+                    seen.add(code)
+                    bundles.append(b)
+            total = int(data.get("bundles_count") or 0)
+            if len(items) < self.page_size or (total and len(seen) >= total):
+                break
+        return bundles
+
+    def _persist(self, bundles: List[Dict[str, Any]], payloads: Dict[str, str]) -> Dict[str, int]:
+        """按 bundle_code 增量写入 catalog_bundles：现有行一次查询载入，只写新增 / 变化 / 删除的行。"""
+        db = SessionLocal()
+        try:
+            rows = {r.bundle_code: r for r in db.query(CatalogBundle)}
+            now = datetime.utcnow()
+            added = updated = 0
+            for pos, b in enumerate(bundles):
+                code = str(b.get("bundle_code"))
+                payload = payloads[code]
+                row = rows.get(code)
+                if row is None:
+                    db.add(CatalogBundle(bundle_code=code, position=pos, payload=payload, synced_at=now))
+                    added += 1
+                elif row.payload != payload or row.position != pos:
+                    row.payload = payload
+                    row.position = pos
+                    row.synced_at = now
+                    updated += 1
+            removed_codes = [c for c in rows if c not in payloads]
+            if removed_codes:
+                db.query(CatalogBundle).filter(CatalogBundle.bundle_code.in_(removed_codes)).delete(synchronize_session=False)
+            db.commit()
+            return {"added": added, "updated": updated, "removed": len(removed_codes)}
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def sync(self) -> int:
+        """拉取完整目录并替换快照；返回套餐数量。并发调用只执行一次。"""
+        if not self._sync_lock.acquire(blocking=False):
+            with self._sync_lock:
+                return len(self._snapshot.bundles) if self._snapshot is not None else 0
+        t0 = time.perf_counter()
+        try:
+            bundles = self._fetch_all()
+            if not bundles:
+                # 上游返回空目录时保留旧快照，避免瞬时异常清空本地镜像
+                raise RuntimeError("upstream catalog is empty")
+            payloads = {str(b.get("bundle_code")): json.dumps(b, ensure_ascii=False, sort_keys=True) for b in bundles}
+            previous = self._snapshot
+            try:
+                self.last_changes = self._persist(bundles, payloads)
+            except Exception:
+                # 持久化失败不影响内存快照
+                pass
+            self._snapshot = _MirrorSnapshot(bundles, (previous.version if previous else 0) + 1, time.time(), payloads)
+            self.syncs += 1
+            self.last_error = None
+            return len(bundles)
+        except Exception as e:
+            self.sync_errors += 1
+            self.last_error = str(e)
+            raise
+        finally:
+            self.last_sync_ms = int((time.perf_counter() - t0) * 1000)
+            self._sync_lock.release()
+
+    def load_from_db(self) -> bool:
+        """从 catalog_bundles 表恢复上次同步的快照。"""
+        try:
+            db = SessionLocal()
+            try:
+                rows = db.query(CatalogBundle).order_by(CatalogBundle.position).all()
+            finally:
+                db.close()
+        except Exception:
+            return False
+        if not rows:
+            return False
+        bundles: List[Dict[str, Any]] = []
+        payloads: Dict[str, str] = {}
+        synced_at = 0.0
+        for r in rows:
+            try:
+                bundles.append(json.loads(r.payload))
+            except Exception:
+                continue
+            payloads[r.bundle_code] = r.payload
+            try:
+                synced_at = max(synced_at, r.synced_at.timestamp())
+            except Exception:
+                pass
+        if not bundles:
+            return False
+        self._snapshot = _MirrorSnapshot(bundles, 1, synced_at or time.time(), payloads)
+        return True
+
+    def _run(self) -> None:
+        snap = self._snapshot
+        delay = 0.0
+        if snap is not None:
+            delay = max(0.0, snap.synced_at + self.interval - time.time())
+        while not self._stop.wait(delay):
+            try:
+                self.sync()
+                delay = self.interval
+            except Exception:
+                # 失败后较快重试（不超过同步间隔）
+                delay = min(self.interval, 60)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.load_from_db()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="catalog-mirror", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        snap = self._snapshot
+        return {
+            "ready": snap is not None,
+            "version": snap.version if snap is not None else 0,
+            "bundles": len(snap.bundles) if snap is not None else 0,
+            "ageSeconds": int(time.time() - snap.synced_at) if snap is not None else None,
+            "syncs": self.syncs,
+            "syncErrors": self.sync_errors,
+            "lastError": self.last_error,
+            "lastSyncMs": self.last_sync_ms,
+            "lastChanges": dict(self.last_changes),
+        }
@@ -0,0 +1,117 @@
+from __future__ import annotations
+import hashlib
+import os
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from ..cache import BoundedCache, SingleFlight
+from ..i18n import translations_digest, translations_version
+from ..responses import dumps
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def versioned_etag(endpoint: str, lang: str, filter_key: str, version: str) -> str:
+    """由 (endpoint, 语言, 过滤条件, 目录内容摘要, 翻译内容摘要) 派生 ETag，无需生成响应体即可比较。"""
+    raw = "|".join((endpoint, lang, filter_key, version, translations_digest()))
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 比较（弱比较）：支持 *、逗号分隔列表、W/ 前缀与带引号的值。"""
+    if not if_none_match:
+        return False
+    for part in if_none_match.split(","):
+        tag = part.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"') == etag:
+            return True
+    return False
+
+
+class LocalizedPayload:
+    """已本地化、已序列化的响应体及其 ETag（与 versioned_etag 一致）。"""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes, etag: str) -> None:
+        self.body = body
+        self.etag = etag
+
+
+class LocalizedPayloadCache:
+    """按 (endpoint, lang, filter, 数据版本, 翻译版本) 缓存本地化后的 JSON 字节。
+
+    - 数据版本为目录内容摘要：目录刷新或翻译重载后 key 改变，旧条目不再命中并由 LRU 淘汰；
+    - 同一 key 的并发构建经 single-flight 合并；
+    - warm() 供目录刷新回调为全部白名单语言预计算，请求路径只剩头部比较与字节写出。
+    """
+
+    def __init__(self) -> None:
+        self._cache = BoundedCache(
+            "payloads",
+            max_entries=_env_int("CATALOG_PAYLOAD_MAX_ENTRIES", 2000),
+            max_bytes=_env_int("CATALOG_PAYLOAD_MAX_BYTES", 64 * 1024 * 1024),
+            sizeof=lambda p: len(p.body) + 128,
+        )
+        self._flight = SingleFlight()
+        self.builds = 0
+        self.warmed = 0
+        self.build_errors = 0
+        # 由派生 ETag 直接返回的 304 次数（未触及响应体）
+        self.not_modified = 0
+
+    @staticmethod
+    def key(endpoint: str, lang: str, filter_key: str, version: str) -> str:
+        return "|".join((endpoint, lang, filter_key, version, str(translations_version())))
+
+    def get(self, endpoint: str, lang: str, filter_key: str, version: str, build: Callable[[], Any]) -> LocalizedPayload:
+        """返回已缓存的 payload；未命中时调用 build() 生成可 JSON 序列化的内容。"""
+        key = self.key(endpoint, lang, filter_key, version)
+        hit = self._cache.get(key)
+        if hit is not None:
+            return hit
+        etag = versioned_etag(endpoint, lang, filter_key, version)
+        return self._flight.do(key, lambda: self._build(key, build, etag))
+
+    def _build(self, key: str, build: Callable[[], Any], etag: str) -> LocalizedPayload:
+        hit = self._cache.peek(key)
+        if hit is not None:
+            return hit
+        try:
+            body = dumps(build())
+        except Exception:
+            self.build_errors += 1
+            raise
+        payload = LocalizedPayload(body, etag)
+        self._cache.set(key, payload)
+        self.builds += 1
+        return payload
+
+    def warm(self, endpoint: str, langs: Iterable[str], filter_key: str, version: str, build: Callable[[str], Any]) -> int:
+        """为多个语言预计算 payload；单个语言失败不影响其他语言。返回新构建数量。"""
+        built = 0
+        for lang in langs:
+            key = self.key(endpoint, lang, filter_key, version)
+            if self._cache.peek(key) is not None:
+                continue
+            etag = versioned_etag(endpoint, lang, filter_key, version)
+            try:
+                self._flight.do(key, lambda lang=lang, key=key, etag=etag: self._build(key, lambda: build(lang), etag))
+                built += 1
+            except Exception:
+                pass
+        self.warmed += built
+        return built
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        stats.update({"builds": self.builds, "warmed": self.warmed, "buildErrors": self.build_errors, "notModified": self.not_modified})
+        return stats
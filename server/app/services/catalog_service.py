@@ -1,6 +1,10 @@
 from __future__ import annotations
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+import hashlib
+import json
 import os
+import threading
 import time
 
 from ..models.dto import (
@@ -14,140 +18,367 @@ from ..models.dto import (
     AliasRegionsDTO,
 )
 from ..provider.client import ProviderClient
+from ..provider.registry import get_provider_client
+from ..cache import BoundedCache, RedisL2, SingleFlight, redis_l2_from_env
+from .catalog_mirror import BundleCatalogMirror
+from .search_index import SearchIndex, SuggestTable, build_suggest_table, bundle_docs, country_docs, expand_query, normalize, region_docs
+from ..i18n import translate_country, translate_marketing, translate_region, translation_snapshot, translations_version
 from ..db import SessionLocal
 from ..models.orm import I18nCountryName, I18nRegionName
 
 
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _plain(o: Any) -> Any:
+    dump = getattr(o, "model_dump", None)
+    return dump() if dump is not None else str(o)
+
+
+def content_digest(value: Any) -> str:
+    """目录数据的内容摘要（与 worker / 拉取时间无关），作为派生 ETag 与 payload 缓存的版本。"""
+    try:
+        raw = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=_plain)
+    except Exception:
+        raw = repr(value)
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+class _CacheEntry:
+    __slots__ = ("value", "fetched_at", "expires_at", "digest")
+
+    def __init__(self, value: Any, fetched_at: float, expires_at: float) -> None:
+        self.value = value
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+        # 写入时计算一次（仅刷新时发生），请求路径上直接读取
+        self.digest = content_digest(value)
+
+
+# L2（Redis）序列化：(encode, decode)。dict 直接存 JSON；DTO 列表存为字段值数组（省去重复字段名）
+Codec = Tuple[Callable[[Any], Any], Callable[[Any], Any]]
+_JSON_CODEC: Codec = (lambda v: v, lambda p: p)
+
+
+def _rows_codec(cls: Any) -> Codec:
+    fields = list(cls.model_fields)
+    return (
+        lambda items: [[getattr(m, f) for f in fields] for m in items],
+        lambda rows: [cls(**dict(zip(fields, r))) for r in rows],
+    )
+
+
+def _model_codec(cls: Any) -> Codec:
+    return (lambda m: m.model_dump(), lambda p: cls.model_validate(p))
+
+
+_COUNTRIES_CODEC = _rows_codec(CountryDTO)
+_REGIONS_CODEC = _rows_codec(RegionDTO)
+_ALIAS_COUNTRIES_CODEC = _model_codec(AliasCountriesDTO)
+_ALIAS_REGIONS_CODEC = _model_codec(AliasRegionsDTO)
+_BUNDLES_CODEC = _rows_codec(BundleDTO)
+
+
+# 镜像未就绪时 bundle segment 索引的首屏（bundle_list 第 1 页、100 条、按名称排序）的缓存 key
+_SEARCH_BUNDLE_PAGE_KEY = "bundles:list:v1|1|100|-|-|-|bundle_name|-|-"
+
+
 class CatalogService:
-    def __init__(self):
-        self.provider = ProviderClient()
+    def __init__(self, provider: Optional[ProviderClient] = None, l2: Optional[RedisL2] = None, mirror: Optional[BundleCatalogMirror] = None):
+        self.provider = provider or get_provider_client()
         # 列表缓存 TTL（秒），默认 3600，可通过环境变量覆盖
-        self._list_ttl_seconds: int = int(os.getenv("CATALOG_LIST_TTL_SECONDS", "3600"))
-        # 国家列表缓存
-        self._countries_cache: Optional[List[CountryDTO]] = None
-        self._countries_expires_at: Optional[float] = None
-        # 上游 alias 风格国家列表缓存
-        self._countries_alias_cache: Optional[AliasCountriesDTO] = None
-        self._countries_alias_expires_at: Optional[float] = None
-        # 地区列表缓存
-        self._regions_cache: Optional[List[RegionDTO]] = None
-        self._regions_expires_at: Optional[float] = None
-        self._regions_alias_cache: Optional[AliasRegionsDTO] = None
-        self._regions_alias_expires_at: Optional[float] = None
-        # 套餐列表缓存（按筛选参数维度），减少上游压力
-        self._bundle_list_cache: dict[str, dict] = {}
-        self._bundle_list_expires_at: dict[str, float] = {}
-        # 套餐网络缓存（v2 聚合）
-        self._bundle_networks_v2_cache: dict[str, dict] = {}
-        self._bundle_networks_v2_expires_at: dict[str, float] = {}
+        self._list_ttl_seconds: int = _env_int("CATALOG_LIST_TTL_SECONDS", 3600)
+        # 过期后仍可返回旧值的最长时间（秒）：期间先返回旧值，同时后台刷新（stale-while-revalidate）
+        self._max_stale_seconds: int = _env_int("CATALOG_MAX_STALE_SECONDS", 86400)
+        # 上游失败时返回旧值（不受 max-stale 限制）
+        self._stale_if_error: bool = os.getenv("CATALOG_STALE_IF_ERROR", "true").lower() in ("1", "true", "yes")
+        # 缓存条目：countries:v1 / countries:alias:v1 / regions:v1 / regions:alias:v1 /
+        # bundles:list:v1|... / bundle:networks:v2|...
+        # 有界 LRU：条目数与近似字节数上限；关闭 stale-if-error 时硬 TTL = ttl + max-stale，超过后直接淘汰，
+        # 开启时不设硬 TTL（最后一次成功的值只受容量约束），max-stale 在读取时判断
+        self._entries = BoundedCache(
+            "catalog",
+            max_entries=_env_int("CATALOG_CACHE_MAX_ENTRIES", 2000),
+            max_bytes=_env_int("CATALOG_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+        )
+        # 缓存未命中时按缓存 key 合并并发的上游请求
+        self._flight = SingleFlight()
+        # 后台刷新线程池（有界）
+        self._refresher = ThreadPoolExecutor(max_workers=max(1, _env_int("CATALOG_REFRESH_WORKERS", 4)), thread_name_prefix="catalog-refresh")
+        # 可选 Redis 二级缓存（CATALOG_REDIS_URL / REDIS_URL），跨 worker 共享命中
+        self._l2: Optional[RedisL2] = l2 if l2 is not None else redis_l2_from_env()
+        # 本地目录镜像（就绪后 bundle_list / get_bundle_by_code / search 不再访问上游）
+        self.mirror = mirror
+        # /search 倒排索引（country / region / bundle 各一个 segment，按版本增量重建）
+        self._search_index = SearchIndex()
+        # /search 结果缓存：key = (规范化 q, include, limit, dedupe, lang, segment 版本)；
+        # 目录或翻译变化后 segment 版本改变，旧条目不再命中，由 LRU / TTL 自然淘汰
+        self._search_cache = BoundedCache(
+            "search",
+            max_entries=_env_int("SEARCH_CACHE_MAX_ENTRIES", 5000),
+            ttl=_env_int("SEARCH_CACHE_TTL_SECONDS", 600),
+        )
+        # /search/suggest 每语言一张排序数组前缀表
+        self._suggest_tables: dict[str, SuggestTable] = {}
+        self._suggest_lock = threading.Lock()
+        # 搜索 segment 新鲜度：数据源条目内容变化时由刷新回调标记并在后台重建；
+        # 请求路径只做廉价检查（标记 / 翻译版本 / 镜像版本），另外每 SEARCH_SEGMENT_CHECK_SECONDS 秒按摘要核对一次
+        self._search_dirty: set[str] = set()
+        self._search_checked_at: dict[str, float] = {}
+        self._search_check_seconds = max(1, _env_int("SEARCH_SEGMENT_CHECK_SECONDS", 30))
+        # 条目内容变化（刷新后摘要不同）时的回调：fn(key)，在后台刷新线程池中执行
+        self._refresh_listeners: List[Callable[[str], None]] = [self._on_search_source_changed]
+        self._stale_served = 0
+        self._stale_on_error = 0
+        self._revalidations = 0
 
     def _now(self) -> float:
         return time.time()
 
-    def get_countries(self, request_id: Optional[str] = None) -> List[CountryDTO]:
-        # 命中缓存且未过期则直接返回
-        if (
-            self._countries_cache is not None
-            and self._countries_expires_at is not None
-            and self._now() < self._countries_expires_at
-        ):
-            return self._countries_cache
-
-        # 拉取上游并转换为 DTO
-        items: List[CountryDTO] = []
+    def _store(self, key: str, value: Any, fetched_at: Optional[float] = None) -> _CacheEntry:
+        now = self._now()
+        fetched = now if fetched_at is None else fetched_at
+        entry = _CacheEntry(value, fetched, fetched + self._list_ttl_seconds)
+        hard_ttl = None if self._stale_if_error else max(1.0, entry.expires_at + self._max_stale_seconds - now)
+        previous = self._entries.peek(key)
+        self._entries.set(key, entry, ttl=hard_ttl)
+        if self._refresh_listeners and (previous is None or previous.digest != entry.digest):
+            for fn in list(self._refresh_listeners):
+                try:
+                    self._refresher.submit(fn, key)
+                except Exception:
+                    pass
+        return entry
+
+    def add_refresh_listener(self, fn: Callable[[str], None]) -> None:
+        """注册条目内容变化回调（例如按语言预计算本地化 payload）。"""
+        self._refresh_listeners.append(fn)
+
+    def _version_of(self, key: str, value: Any) -> str:
+        # 当前缓存条目即该值时直接复用写入时的摘要；否则（DB 回退等）现算
+        entry = self._entries.peek(key)
+        if entry is not None and entry.value is value:
+            return entry.digest
+        return content_digest(value)
+
+    def _l2_get(self, key: str, codec: Codec) -> Optional[_CacheEntry]:
+        if self._l2 is None:
+            return None
+        hit = self._l2.get(key)
+        if hit is None:
+            return None
+        fetched_at, payload = hit
+        try:
+            return self._store(key, codec[1](payload), fetched_at=fetched_at)
+        except Exception:
+            return None
+
+    def _load(self, key: str, loader: Callable[[], Any], codec: Codec = _JSON_CODEC, allow_stale: bool = False) -> Any:
+        # 等待期间其他请求可能已完成刷新
+        entry = self._entries.get(key)
+        now = self._now()
+        if entry is not None and now < entry.expires_at:
+            return entry.value
+        # L1 未命中：先查 L2（其他 worker 可能已拉取过）
+        shared = self._l2_get(key, codec)
+        if shared is not None:
+            if now < shared.expires_at:
+                return shared.value
+            if allow_stale and now < shared.expires_at + self._max_stale_seconds:
+                # 冷启动 worker：先返回共享旧值，刷新由 _cached 在 single-flight 结束后触发
+                self._stale_served += 1
+                return shared.value
+        try:
+            value = loader()
+        except Exception:
+            if shared is not None and self._stale_if_error:
+                self._stale_on_error += 1
+                return shared.value
+            raise
+        fresh = self._store(key, value)
+        if self._l2 is not None:
+            try:
+                l2_ttl = None if self._stale_if_error else self._list_ttl_seconds + self._max_stale_seconds
+                self._l2.set(key, fresh.fetched_at, codec[0](value), l2_ttl)
+            except Exception:
+                pass
+        return value
+
+    def _revalidate(self, key: str, loader: Callable[[], Any], codec: Codec = _JSON_CODEC) -> None:
+        if self._flight.in_flight(key):
+            return
+
+        def run() -> None:
+            try:
+                self._flight.do(key, lambda: self._load(key, loader, codec))
+            except Exception:
+                # 刷新失败保留旧值，下次请求再尝试
+                pass
+
+        self._revalidations += 1
+        try:
+            self._refresher.submit(run)
+        except Exception:
+            pass
+
+    def _cached(self, key: str, loader: Callable[[], Any], codec: Codec = _JSON_CODEC) -> Any:
+        entry = self._entries.get(key)
+        now = self._now()
+        if entry is not None:
+            if now < entry.expires_at:
+                return entry.value
+            if now < entry.expires_at + self._max_stale_seconds:
+                self._stale_served += 1
+                self._revalidate(key, loader, codec)
+                return entry.value
         try:
+            value = self._flight.do(key, lambda: self._load(key, loader, codec, allow_stale=entry is None))
+        except Exception:
+            if entry is not None and self._stale_if_error:
+                self._stale_on_error += 1
+                return entry.value
+            raise
+        # 从 L2 取到的是旧值：后台刷新
+        current = self._entries.peek(key)
+        if current is not None and self._now() >= current.expires_at:
+            self._revalidate(key, loader, codec)
+        return value
+
+    def cache_stats(self) -> dict:
+        keys = self._entries.keys()
+
+        def _size(key: str) -> int:
+            e = self._entries.peek(key)
+            try:
+                return len(e.value) if e is not None else 0
+            except Exception:
+                return 0
+
+        return {
+            "countries": _size("countries:v1"),
+            "regions": _size("regions:v1"),
+            "bundleListKeys": sum(1 for k in keys if k.startswith("bundles:list:")),
+            "bundleNetworksV2Keys": sum(1 for k in keys if k.startswith("bundle:networks:")),
+            "ttlSeconds": int(self._list_ttl_seconds),
+            "maxStaleSeconds": int(self._max_stale_seconds),
+            "staleServed": self._stale_served,
+            "staleOnError": self._stale_on_error,
+            "revalidations": self._revalidations,
+            "singleFlight": self._flight.stats(),
+            "l1": self._entries.stats(),
+            "l2": self._l2.stats() if self._l2 is not None else None,
+        }
+
+    def get_countries(self, request_id: Optional[str] = None) -> List[CountryDTO]:
+        return self.get_countries_versioned(request_id=request_id)[0]
+
+    def get_countries_versioned(self, request_id: Optional[str] = None) -> Tuple[List[CountryDTO], str]:
+        """返回 (国家列表, 内容版本)。"""
+        def load() -> List[CountryDTO]:
+            # 拉取上游并转换为 DTO；上游为空时回退 DB 英文名
             countries = self.provider.get_countries(request_id=request_id)
             items = [CountryDTO(code=c.get("code") or str(c.get("iso2_code")), name=c.get("name") or str(c.get("country_name"))) for c in countries if (c.get("code") or c.get("iso2_code")) and (c.get("name") or c.get("country_name"))]
+            return items or self._countries_from_db()
+
+        try:
+            items = self._cached("countries:v1", load, _COUNTRIES_CODEC)
         except Exception:
-            items = []
-        if not items:
+            # 上游失败且无旧值可用：回退 DB（不写缓存，下次请求重试上游）
+            items = self._countries_from_db()
+        return items, self._version_of("countries:v1", items)
+
+    def _countries_from_db(self) -> List[CountryDTO]:
+        try:
+            db = SessionLocal()
             try:
-                db = SessionLocal()
                 rows = db.query(I18nCountryName).filter(I18nCountryName.lang_code == "en").all()
-                items = [CountryDTO(code=row.country_code, name=row.name) for row in rows]
-            except Exception:
-                items = []
-        # 写入缓存
-        self._countries_cache = items
-        self._countries_expires_at = self._now() + self._list_ttl_seconds
-        return items
+                return [CountryDTO(code=str(row.iso2_code or row.iso3_code), name=row.name) for row in rows if (row.iso2_code or row.iso3_code)]
+            finally:
+                db.close()
+        except Exception:
+            return []
 
     def get_countries_alias(self, request_id: Optional[str] = None) -> AliasCountriesDTO:
-        # 命中缓存且未过期则直接返回
-        if (
-            self._countries_alias_cache is not None
-            and self._countries_alias_expires_at is not None
-            and self._now() < self._countries_alias_expires_at
-        ):
-            return self._countries_alias_cache
-
-        # 拉取上游并转换为 alias 风格 DTO
-        countries = self.provider.get_countries(request_id=request_id)
-        alias_items: List[AliasCountryDTO] = []
-        for c in countries:
-            iso2 = c.get("iso2_code") or c.get("code")
-            iso3 = c.get("iso3_code")
-            name = c.get("country_name") or c.get("name")
-            if not (iso2 and iso3 and name):
-                # 严格按文档要求，缺失任一字段则跳过
-                continue
-            alias_items.append(AliasCountryDTO(iso2_code=str(iso2), iso3_code=str(iso3), country_name=str(name)))
-        result = AliasCountriesDTO(countries=alias_items, countries_count=len(alias_items))
-        # 写入缓存
-        self._countries_alias_cache = result
-        self._countries_alias_expires_at = self._now() + self._list_ttl_seconds
-        return result
+        return self.get_countries_alias_versioned(request_id=request_id)[0]
+
+    def get_countries_alias_versioned(self, request_id: Optional[str] = None) -> Tuple[AliasCountriesDTO, str]:
+        def load() -> AliasCountriesDTO:
+            # 拉取上游并转换为 alias 风格 DTO
+            countries = self.provider.get_countries(request_id=request_id)
+            alias_items: List[AliasCountryDTO] = []
+            for c in countries:
+                iso2 = c.get("iso2_code") or c.get("code")
+                iso3 = c.get("iso3_code")
+                name = c.get("country_name") or c.get("name")
+                if not (iso2 and iso3 and name):
+                    # 严格按文档要求，缺失任一字段则跳过
+                    continue
+                alias_items.append(AliasCountryDTO(iso2_code=str(iso2), iso3_code=str(iso3), country_name=str(name)))
+            return AliasCountriesDTO(countries=alias_items, countries_count=len(alias_items))
+
+        data = self._cached("countries:alias:v1", load, _ALIAS_COUNTRIES_CODEC)
+        return data, self._version_of("countries:alias:v1", data)
 
     def get_regions(self, request_id: Optional[str] = None) -> List[RegionDTO]:
-        # 命中缓存且未过期则直接返回
-        if (
-            self._regions_cache is not None
-            and self._regions_expires_at is not None
-            and self._now() < self._regions_expires_at
-        ):
-            return self._regions_cache
-
-        # 拉取上游并转换为 DTO
-        items: List[RegionDTO] = []
-        try:
+        return self.get_regions_versioned(request_id=request_id)[0]
+
+    def get_regions_versioned(self, request_id: Optional[str] = None) -> Tuple[List[RegionDTO], str]:
+        """返回 (地区列表, 内容版本)。"""
+        def load() -> List[RegionDTO]:
+            # 拉取上游并转换为 DTO；上游为空时回退 DB 英文名
             regions = self.provider.get_regions(request_id=request_id)
             items = [RegionDTO(code=str(r.get("code") or r.get("region_code")), name=str(r.get("name") or r.get("region_name"))) for r in regions if (r.get("code") or r.get("region_code")) and (r.get("name") or r.get("region_name"))]
+            return items or self._regions_from_db()
+
+        try:
+            items = self._cached("regions:v1", load, _REGIONS_CODEC)
         except Exception:
-            items = []
-        if not items:
+            items = self._regions_from_db()
+        return items, self._version_of("regions:v1", items)
+
+    def _regions_from_db(self) -> List[RegionDTO]:
+        try:
+            db = SessionLocal()
             try:
-                db = SessionLocal()
                 rows = db.query(I18nRegionName).filter(I18nRegionName.lang_code == "en").all()
-                items = [RegionDTO(code=row.region_code, name=row.name) for row in rows]
-            except Exception:
-                items = []
-        # 写入缓存
-        self._regions_cache = items
-        self._regions_expires_at = self._now() + self._list_ttl_seconds
-        return items
+                return [RegionDTO(code=row.region_code, name=row.name) for row in rows]
+            finally:
+                db.close()
+        except Exception:
+            return []
 
     def get_regions_alias(self, request_id: Optional[str] = None) -> AliasRegionsDTO:
-        if (
-            self._regions_alias_cache is not None
-            and self._regions_alias_expires_at is not None
-            and self._now() < self._regions_alias_expires_at
-        ):
-            return self._regions_alias_cache
-
-        regions = self.provider.get_regions(request_id=request_id)
-        alias_items: List[AliasRegionDTO] = []
-        for r in regions:
-            code = r.get("region_code") or r.get("code")
-            name = r.get("region_name") or r.get("name")
-            if not (code and name):
-                continue
-            alias_items.append(AliasRegionDTO(region_code=str(code), region_name=str(name)))
-        result = AliasRegionsDTO(regions=alias_items, regions_count=len(alias_items))
-        self._regions_alias_cache = result
-        self._regions_alias_expires_at = self._now() + self._list_ttl_seconds
-        return result
+        return self.get_regions_alias_versioned(request_id=request_id)[0]
+
+    def get_regions_alias_versioned(self, request_id: Optional[str] = None) -> Tuple[AliasRegionsDTO, str]:
+        def load() -> AliasRegionsDTO:
+            regions = self.provider.get_regions(request_id=request_id)
+            alias_items: List[AliasRegionDTO] = []
+            for r in regions:
+                code = r.get("region_code") or r.get("code")
+                name = r.get("region_name") or r.get("name")
+                if not (code and name):
+                    continue
+                alias_items.append(AliasRegionDTO(region_code=str(code), region_name=str(name)))
+            return AliasRegionsDTO(regions=alias_items, regions_count=len(alias_items))
+
+        data = self._cached("regions:alias:v1", load, _ALIAS_REGIONS_CODEC)
+        return data, self._version_of("regions:alias:v1", data)
 
     def get_bundles(self, country: Optional[str] = None, popular: bool = False) -> List[BundleDTO]:
+        return self.get_bundles_versioned(country=country, popular=popular)[0]
+
+    def get_bundles_versioned(self, country: Optional[str] = None, popular: bool = False) -> Tuple[List[BundleDTO], str]:
+        """返回 (套餐列表, 内容版本)；与其他目录列表共用缓存与 stale-while-revalidate。"""
+        key = "|".join(["bundles:v1", str(country or "-").upper(), "1" if popular else "0"])
+        items = self._cached(key, lambda: self._load_bundles(country, popular), _BUNDLES_CODEC)
+        return items, self._version_of(key, items)
+
+    def _load_bundles(self, country: Optional[str], popular: bool) -> List[BundleDTO]:
         bundles = self.provider.get_bundles(country_code=country, popular=popular)
         return [
             BundleDTO(
@@ -187,7 +418,23 @@ class CatalogService:
         )
 
     def get_bundle_networks(self, bundle_id: str) -> List[str]:
-        return self.provider.get_bundle_networks(bundle_id)
+        return self.get_bundle_networks_versioned(bundle_id)[0]
+
+    def get_bundle_networks_versioned(self, bundle_id: str) -> Tuple[List[str], str]:
+        """返回 (网络列表, 内容版本)。空结果不写缓存，下次请求重试上游。"""
+        key = "bundle:networks:v1|" + str(bundle_id)
+
+        def load() -> List[str]:
+            networks = list(self.provider.get_bundle_networks(bundle_id) or [])
+            if not networks:
+                raise LookupError(bundle_id)
+            return networks
+
+        try:
+            networks = self._cached(key, load)
+        except LookupError:
+            return [], ""
+        return networks, self._version_of(key, networks)
 
     def get_bundle_networks_v2(
         self,
@@ -195,29 +442,31 @@ class CatalogService:
         country_code: Optional[str] = None,
         request_id: Optional[str] = None,
     ) -> dict:
+        return self.get_bundle_networks_v2_versioned(bundle_code=bundle_code, country_code=country_code, request_id=request_id)[0]
+
+    def get_bundle_networks_v2_versioned(
+        self,
+        bundle_code: str,
+        country_code: Optional[str] = None,
+        request_id: Optional[str] = None,
+    ) -> Tuple[dict, str]:
         key = "|".join([
             "bundle:networks:v2",
             str(bundle_code),
             str(country_code or "-")
         ])
-        now = self._now()
-        if key in self._bundle_networks_v2_cache and (self._bundle_networks_v2_expires_at.get(key) or 0) > now:
-            data = self._bundle_networks_v2_cache[key]
-        else:
-            data = self.provider.get_bundle_networks_v2(
-                bundle_code=bundle_code,
-                country_code=country_code,
-                request_id=request_id,
-            )
-            self._bundle_networks_v2_cache[key] = data
-            self._bundle_networks_v2_expires_at[key] = now + self._list_ttl_seconds
+        data = self._cached(key, lambda: self.provider.get_bundle_networks_v2(
+            bundle_code=bundle_code,
+            country_code=country_code,
+            request_id=request_id,
+        ))
         networks = data.get("networks") or []
         count = data.get("networks_count")
         try:
             networks_count = int(float(str(count))) if count is not None else len(networks)
         except Exception:
             networks_count = len(networks)
-        return {"networks": networks, "networks_count": int(networks_count)}
+        return {"networks": networks, "networks_count": int(networks_count)}, self._version_of(key, data)
 
     def get_bundle_operators_flat(
         self,
@@ -253,6 +502,34 @@ class CatalogService:
         q: Optional[str] = None,
         request_id: Optional[str] = None,
     ) -> dict:
+        return self.bundle_list_versioned(
+            page_number=page_number,
+            page_size=page_size,
+            country_code=country_code,
+            region_code=region_code,
+            bundle_category=bundle_category,
+            sort_by=sort_by,
+            bundle_code=bundle_code,
+            q=q,
+            request_id=request_id,
+        )[0]
+
+    def bundle_list_versioned(
+        self,
+        page_number: int,
+        page_size: int,
+        country_code: Optional[str] = None,
+        region_code: Optional[str] = None,
+        bundle_category: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        bundle_code: Optional[str] = None,
+        q: Optional[str] = None,
+        request_id: Optional[str] = None,
+    ) -> Tuple[dict, str]:
+        """返回 (bundle_list 结果, 内容版本)：镜像就绪时为镜像快照摘要，否则为该页缓存条目摘要。
+
+        版本只覆盖数据源；过滤条件由调用方并入 key。
+        """
         # 构造缓存 key（空值统一为 "-"，避免 None/"" 混用）
         def _n(x):
             return str(x).strip() if (x is not None and str(x).strip() != "") else "-"
@@ -267,22 +544,31 @@ class CatalogService:
             _n(bundle_code),
             _n(q),
         ])
-        now = self._now()
-        if key in self._bundle_list_cache and (self._bundle_list_expires_at.get(key) or 0) > now:
-            bundles_data = self._bundle_list_cache[key]
-        else:
-            bundles_data = self.provider.get_bundle_list(
-                page_number=page_number,
-                page_size=page_size,
-                country_code=country_code,
-                region_code=region_code,
-                bundle_category=bundle_category,
-                sort_by=sort_by,
-                bundle_code=bundle_code,
-                request_id=request_id,
-            )
-            self._bundle_list_cache[key] = bundles_data
-            self._bundle_list_expires_at[key] = now + self._list_ttl_seconds
+        # 先取摘要再查询：与并发同步交错时只会把较新的数据记到旧版本下（下次请求即按新版本重建）
+        mirror_digest = self.mirror.digest if self.mirror is not None else None
+        bundles_data = self.mirror.query(
+            page_number=page_number,
+            page_size=page_size,
+            country_code=country_code,
+            region_code=region_code,
+            bundle_category=bundle_category,
+            sort_by=sort_by,
+            bundle_code=bundle_code,
+            q=q,
+        ) if self.mirror is not None else None
+        if bundles_data is not None:
+            # 镜像已按列式索引完成过滤 / 排序 / 分页与 q 匹配
+            return bundles_data, "m" + str(mirror_digest)
+        bundles_data = self._cached(key, lambda: self.provider.get_bundle_list(
+            page_number=page_number,
+            page_size=page_size,
+            country_code=country_code,
+            region_code=region_code,
+            bundle_category=bundle_category,
+            sort_by=sort_by,
+            bundle_code=bundle_code,
+            request_id=request_id,
+        ))
         bundles = bundles_data.get("bundles") or []
         if q:
             ql = str(q).strip().lower()
@@ -300,23 +586,29 @@ class CatalogService:
                 if _match(name, desc, cc, data_amt):
                     filtered.append(b)
             bundles = filtered
-        return {"bundles": bundles, "bundles_count": int(bundles_data.get("bundles_count", 0))}
+        return {"bundles": bundles, "bundles_count": int(bundles_data.get("bundles_count", 0))}, self._version_of(key, bundles_data)
 
     def get_bundle_by_code(self, bundle_code: str, request_id: Optional[str] = None) -> Optional[BundleDTO]:
-        data = self.provider.get_bundle_list(
-            page_number=1,
-            page_size=100,
-            country_code=None,
-            region_code=None,
-            bundle_category=None,
-            sort_by=None,
-            bundle_code=bundle_code,
-            request_id=request_id,
-        )
-        bundles = data.get("bundles") or []
-        if not bundles:
-            return None
-        b = bundles[0]
+        return self.get_bundle_by_code_versioned(bundle_code=bundle_code, request_id=request_id)[0]
+
+    def get_bundle_by_code_versioned(self, bundle_code: str, request_id: Optional[str] = None) -> Tuple[Optional[BundleDTO], str]:
+        """返回 (套餐, 内容版本)：版本为该套餐原始数据的摘要（镜像命中时无需访问上游）。"""
+        b = self.mirror.get(bundle_code) if (self.mirror is not None and self.mirror.ready) else None
+        if b is None:
+            data = self.provider.get_bundle_list(
+                page_number=1,
+                page_size=100,
+                country_code=None,
+                region_code=None,
+                bundle_category=None,
+                sort_by=None,
+                bundle_code=bundle_code,
+                request_id=request_id,
+            )
+            bundles = data.get("bundles") or []
+            if not bundles:
+                return None, ""
+            b = bundles[0]
         try:
             price = float(b.get("bundle_price_final", b.get("reseller_retail_price", 0.0)))
         except Exception:
@@ -325,7 +617,7 @@ class CatalogService:
             validity = int(float(str(b.get("validity", 0))))
         except Exception:
             validity = 0
-        return BundleDTO(
+        dto = BundleDTO(
             id=str(b.get("bundle_code")),
             name=str(b.get("bundle_name") or b.get("bundle_marketing_name") or ""),
             countryCode=(b.get("country_code") or [""])[0] if (b.get("country_code") or []) else "",
@@ -339,6 +631,7 @@ class CatalogService:
             coverageNote=None,
             termsUrl=None,
         )
+        return dto, content_digest(b)
 
     # ===== 搜索聚合 =====
     def search(
@@ -353,144 +646,18 @@ class CatalogService:
         term = (q or "").strip()
         if not term:
             return []
-        q_lower = term.lower()
         kinds = [k.strip().lower() for k in (include or ["country", "region", "bundle"])]
-
-        results: List[SearchResultDTO] = []
-
-        def _norm(s: Optional[str]) -> str:
-            x = str(s or "").strip().lower()
-            x = x.replace("＋", "+")
-            x = x.replace("plus", "+")
-            x = x.replace(" ", " ")
-            x = x.replace("+", "")
-            return x
-
-        def build_tokens(term: str) -> List[str]:
-            base = _norm(term)
-            toks: List[str] = [base]
-            try:
-                from app.i18n import MARKETING_CANONICAL_MAP, _REGION_ALIASES, _TERRITORY_ALIASES  # type: ignore
-                canon = MARKETING_CANONICAL_MAP.get(base)
-                if canon:
-                    toks.append(_norm(canon))
-                    rc = _REGION_ALIASES.get(_norm(canon))
-                    if rc:
-                        toks.append(_norm(rc))
-                ali = _TERRITORY_ALIASES.get(base)
-                if ali:
-                    toks.append(_norm(ali))
-                if lang:
-                    try:
-                        from babel import Locale  # type: ignore
-                        loc = Locale.parse(lang.replace('-', '_'))
-                        for iso2, name in (loc.territories or {}).items():
-                            if _norm(name) == base:
-                                toks.append(_norm(iso2))
-                                break
-                    except Exception:
-                        pass
-                add_iso3: List[str] = []
-                try:
-                    from app.db import SessionLocal, I18nCountryName  # type: ignore
-                    db = SessionLocal()
-                    try:
-                        for t in toks:
-                            if len(t) == 2:
-                                r = db.query(I18nCountryName).filter(I18nCountryName.iso2_code == t.upper()).first()
-                                if r and r.iso3_code:
-                                    add_iso3.append(_norm(r.iso3_code))
-                    finally:
-                        db.close()
-                except Exception:
-                    pass
-                toks.extend(add_iso3)
-            except Exception:
-                pass
-            return list(dict.fromkeys(toks))
-
-        tokens = build_tokens(term)
-
-        def match_tokens(*texts: Optional[str]) -> bool:
-            for t in texts:
-                s = _norm(t)
-                for tok in tokens:
-                    if tok and tok in s:
-                        return True
-            return False
-
-        # Countries
-        if "country" in kinds:
-            for c in self.get_countries(request_id=request_id):
-                if match_tokens(c.name, c.code):
-                    results.append(
-                        SearchResultDTO(
-                            kind="country",
-                            id=c.code,
-                            title=c.name,
-                            subtitle=None,
-                            countryCode=c.code,
-                        )
-                    )
-                    if len(results) >= limit:
-                        return results[:limit]
-
-        # Regions
-        if "region" in kinds:
-            for r in self.get_regions(request_id=request_id):
-                if match_tokens(r.name, r.code):
-                    results.append(
-                        SearchResultDTO(
-                            kind="region",
-                            id=r.code,
-                            title=r.name,
-                            subtitle=None,
-                            regionCode=r.code,
-                        )
-                    )
-                    if len(results) >= limit:
-                        return results[:limit]
-
-        # Bundles（轻量搜索：首屏分页 + 本地筛选，使用上游 alias 字段）
-        if "bundle" in kinds:
-            try:
-                page_size = max(10, min(100, limit * 2))
-                bundles_page = self.provider.get_bundle_list(
-                    page_number=1,
-                    page_size=page_size,
-                    country_code=None,
-                    region_code=None,
-                    bundle_category=None,
-                    sort_by="bundle_name",
-                    request_id=request_id,
-                )
-                for b in (bundles_page.get("bundles") or []):
-                    name = str(b.get("bundle_name") or b.get("bundle_marketing_name") or "")
-                    desc = str(b.get("bundle_marketing_name") or "")
-                    cc_list = list(b.get("country_code") or [])
-                    cc = str(cc_list[0]) if cc_list else ""
-                    data_amt = (str(b.get("gprs_limit") or "") + " " + str(b.get("data_unit") or "")).strip()
-                    valid = 0
-                    try:
-                        valid = int(float(str(b.get("validity") or 0)))
-                    except Exception:
-                        valid = 0
-                    cnames = " ".join([str(x) for x in (b.get("country_name") or [])])
-                    if match_tokens(name, desc, cc, cnames, data_amt):
-                        results.append(
-                            SearchResultDTO(
-                                kind="bundle",
-                                id=str(b.get("bundle_code") or name),
-                                title=name,
-                                subtitle=f"{data_amt} · {valid}d",
-                                bundleCode=str(b.get("bundle_code") or ""),
-                                countryCode=str(cc),
-                            )
-                        )
-                        if len(results) >= limit:
-                            return results[:limit]
-            except Exception:
-                pass
+        sources = [k for k in dict.fromkeys(kinds) if k in ("country", "region", "bundle")]
+        # 只重建已过期的 segment（请求路径上是廉价检查，不读取 / 哈希数据源），再按 segment 版本查结果缓存
+        self._refresh_stale_segments(sources, request_id)
+        version = tuple(self._search_index.version(s) for s in sources)
+        cache_key = "|".join([
+            normalize(term), ",".join(sources), str(limit), "1" if dedupe else "0", lang or "-", "%x" % (hash(version) & 0xFFFFFFFFFFFF),
+        ])
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        results = self._search_index.search(expand_query(term, lang), sources, limit=limit, lang=lang)
 
         if dedupe:
             seen: set[tuple[str, str]] = set()
@@ -502,4 +669,125 @@ class CatalogService:
                 seen.add(key)
                 deduped.append(r)
             results = deduped
-        return results[:limit]
+        results = results[:limit]
+        if all(v is not None for v in version):
+            self._search_cache.set(cache_key, tuple(results))
+        return results
+
+    def _on_search_source_changed(self, key: str) -> None:
+        """刷新回调：数据源条目内容变化时重建对应 segment（在后台刷新线程池中执行）。"""
+        if key == "countries:v1":
+            source = "country"
+        elif key == "regions:v1":
+            source = "region"
+        elif key == _SEARCH_BUNDLE_PAGE_KEY:
+            source = "bundle"
+        else:
+            return
+        self._search_dirty.add(source)
+        try:
+            self._refresh_search_segment(source)
+        except Exception:
+            pass
+
+    def _segment_stale(self, source: str, now: float) -> bool:
+        v = self._search_index.version(source)
+        if v is None or source in self._search_dirty or v[0] != translations_version():
+            return True
+        if source == "bundle":
+            mirror = self.mirror
+            ready = mirror is not None and mirror.ready
+            if ready != (v[1] == "mirror") or (ready and v[2] != mirror.version):
+                return True
+        return now - self._search_checked_at.get(source, 0.0) >= self._search_check_seconds
+
+    def _refresh_stale_segments(self, sources, request_id: Optional[str] = None) -> None:
+        now = self._now()
+        for source in sources:
+            if not self._segment_stale(source, now):
+                continue
+            try:
+                self._refresh_search_segment(source, request_id)
+            except Exception:
+                # 数据源不可用：该类别无结果（旧 segment 继续可用）
+                pass
+
+    def _refresh_search_segment(self, source: str, request_id: Optional[str] = None) -> None:
+        """按数据源版本（缓存条目摘要 / 镜像版本 + 翻译版本）增量重建搜索 segment。"""
+        self._search_checked_at[source] = self._now()
+        self._rebuild_search_segment(source, request_id)
+        self._search_dirty.discard(source)
+
+    def _rebuild_search_segment(self, source: str, request_id: Optional[str] = None) -> None:
+        tv = translations_version()
+        if source == "country":
+            countries, digest = self.get_countries_versioned(request_id=request_id)
+            version: Any = (tv, digest)
+            self._search_index.refresh(source, version, lambda: country_docs(countries, translation_snapshot()))
+        elif source == "region":
+            regions, digest = self.get_regions_versioned(request_id=request_id)
+            version = (tv, digest)
+            self._search_index.refresh(source, version, lambda: region_docs(regions, translation_snapshot()))
+        elif source == "bundle":
+            mirror = self.mirror
+            if mirror is not None and mirror.ready:
+                version = (tv, "mirror", mirror.version)
+                self._search_index.refresh(source, version, lambda: bundle_docs(mirror.all(), translation_snapshot()))
+                return
+            # 镜像未就绪：仅索引首屏（与原行为一致），镜像就绪后自动切换为全量
+            page, digest = self.bundle_list_versioned(page_number=1, page_size=100, sort_by="bundle_name", request_id=request_id)
+            bundles = page.get("bundles") or []
+            version = (tv, "page", digest)
+            self._search_index.refresh(source, version, lambda: bundle_docs(bundles, translation_snapshot()))
+
+    def suggest(
+        self,
+        q: str,
+        include: Optional[List[str]] = None,
+        limit: int = 8,
+        lang: Optional[str] = None,
+        request_id: Optional[str] = None,
+    ) -> List[SearchResultDTO]:
+        """输入联想：返回已本地化标题的前 limit 条（国家 / 地区 / 套餐）。"""
+        term = (q or "").strip()
+        if not term:
+            return []
+        l = lang or "en"
+        sources = ("country", "region", "bundle")
+        self._refresh_stale_segments(sources, request_id)
+        version = tuple(self._search_index.version(s) for s in sources)
+        table = self._suggest_tables.get(l)
+        if table is None or table.version != version:
+            if self._suggest_lock.acquire(blocking=table is None):
+                try:
+                    table = self._suggest_tables.get(l)
+                    if table is None or table.version != version:
+                        table = self._build_suggest_table(l, version, sources)
+                        self._suggest_tables[l] = table
+                finally:
+                    self._suggest_lock.release()
+        if table is None:
+            return []
+        kinds = [k.strip().lower() for k in include] if include else None
+        return table.lookup(term, kinds, limit)
+
+    def _build_suggest_table(self, lang: str, version: tuple, sources: tuple) -> SuggestTable:
+        def localize(d) -> str:
+            r = d.result
+            if d.kind == "country":
+                return translate_country(r.id, r.title, lang)
+            if d.kind == "region":
+                return translate_region(r.id, r.title, lang)
+            return translate_marketing(r.title, lang, r.bundleCode)
+
+        docs = [d for s in sources for d in self._search_index.docs(s)]
+        return build_suggest_table(lang, version, docs, localize)
+
+    def search_stats(self) -> dict:
+        stats = self._search_index.stats()
+        stats["suggestLanguages"] = sorted(self._suggest_tables)
+        cache = self._search_cache.stats()
+        lookups = cache["hits"] + cache["misses"]
+        cache["hitRate"] = round(cache["hits"] / lookups, 4) if lookups else None
+        stats["resultCache"] = cache
+        return stats
@@ -0,0 +1,328 @@
+from __future__ import annotations
+from datetime import datetime
+import json
+import os
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func, or_
+
+from ..cache import BoundedCache
+from ..db import SessionLocal
+from ..models.orm import Order, OrderReferenceEmail, User, UserOrder
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def parse_upstream_time(v: Any) -> Optional[datetime]:
+    """上游 created_at：Unix 秒 / "Mar 01, 2024 at 10:00:00" / "YYYY-MM-DD HH:MM:SS[.f]"。"""
+    if v is None:
+        return None
+    s = str(v).strip()
+    if not s:
+        return None
+    if s.isdigit():
+        try:
+            return datetime.utcfromtimestamp(int(float(s)))
+        except Exception:
+            return None
+    for fmt in ("%b %d, %Y at %H:%M:%S", "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.strptime(s.replace("T", " "), fmt)
+        except Exception:
+            continue
+    return None
+
+
+def parse_filter_time(v: Optional[str]) -> Optional[datetime]:
+    """列表过滤条件 start_date / end_date（上游格式 YYYY/MM/DD HH:MM:SS，兼容 ISO 日期）。"""
+    if not v:
+        return None
+    s = str(v).strip()
+    for fmt in ("%Y/%m/%d %H:%M:%S", "%Y/%m/%d", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(s, fmt)
+        except Exception:
+            continue
+    return None
+
+
+class IndexedOrder(NamedTuple):
+    order_reference: str
+    # 上游 /orders/list 条目；尚未同步时为 None（调用方按引用回查上游）
+    item: Optional[Dict[str, Any]]
+    # 仅由本地字段拼出的最小条目（上游也查不到时使用）
+    stub: Dict[str, Any]
+
+
+class UserOrderIndex:
+    """用户订单本地索引（user_orders 表）。
+
+    - 写入：assign_bundle、支付回调、列表回查结果，以及后台订单对账（OrderReconciler）扫描到的上游订单；
+    - 首次访问某用户时从 order_reference_emails 映射补齐其全部订单引用；
+    - 读取：按 (user_id, created_at desc) 分页，total 为过滤后的真实总数。
+    """
+
+    def __init__(self) -> None:
+        # 已从映射表补齐过的用户（进程内，有界）
+        self._seeded = BoundedCache("order_index_seeded", max_entries=_env_int("ORDER_CACHE_MAX_ENTRIES", 10000))
+        self.recorded = 0
+        self.ingested = 0
+        self.seeded_rows = 0
+        self.pages_served = 0
+
+    # ===== 写入 =====
+    @staticmethod
+    def _apply(row: UserOrder, fields: Dict[str, Any]) -> None:
+        for name, value in fields.items():
+            if value is None or value == "":
+                continue
+            setattr(row, name, value)
+        row.updated_at = datetime.utcnow()
+
+    def _upsert(self, db, order_reference: str, user_id: str, fields: Dict[str, Any]) -> None:
+        row = db.get(UserOrder, order_reference)
+        if row is None:
+            created = fields.pop("created_at", None) or datetime.utcnow()
+            row = UserOrder(order_reference=order_reference, user_id=user_id, created_at=created)
+            db.add(row)
+        elif user_id:
+            row.user_id = user_id
+        self._apply(row, fields)
+
+    def record(
+        self,
+        order_reference: str,
+        user_id: Optional[str],
+        email: Optional[str] = None,
+        provider_order_id: Optional[str] = None,
+        bundle_code: Optional[str] = None,
+        status: Optional[str] = None,
+        created_at: Optional[datetime] = None,
+        item: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """写入 / 更新单个订单（best-effort，失败不影响主流程）。"""
+        ref = str(order_reference or "").strip()
+        uid = str(user_id or "").strip()
+        if not ref:
+            return False
+        db = SessionLocal()
+        try:
+            if not uid and db.get(UserOrder, ref) is None:
+                # 新条目必须归属用户
+                return False
+            fields: Dict[str, Any] = {
+                "email": (email or "").strip().lower() or None,
+                "provider_order_id": provider_order_id,
+                "bundle_code": bundle_code,
+                "status": status,
+                "created_at": created_at,
+            }
+            if item:
+                fields.update(self._item_fields(item))
+            self._upsert(db, ref, uid, fields)
+            db.commit()
+            self.recorded += 1
+            return True
+        except Exception:
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    @staticmethod
+    def _item_fields(item: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "provider_order_id": str(item.get("order_id")) if item.get("order_id") else None,
+            "bundle_code": item.get("bundle_code"),
+            "iccid": item.get("iccid"),
+            "status": item.get("order_status"),
+            "created_at": parse_upstream_time(item.get("created_at")),
+            "payload": json.dumps(item, ensure_ascii=False, default=str),
+        }
+
+    def ingest(self, orders: Iterable[Dict[str, Any]], user_id: Optional[str] = None) -> int:
+        """写入上游 /orders/list 条目；按映射表 / 已有索引 / client_email 解析归属用户。
+
+        user_id 用于调用方已确认归属的条目（例如已按用户过滤的列表）。返回写入条数。
+        """
+        items = [o for o in orders if o and o.get("order_reference")]
+        if not items:
+            return 0
+        refs = [str(o.get("order_reference")) for o in items]
+        oids = [str(o.get("order_id")) for o in items if o.get("order_id")]
+        emails = list({str(o.get("client_email") or "").strip().lower() for o in items} - {""})
+        db = SessionLocal()
+        try:
+            uid_by_ref: Dict[str, str] = {}
+            uid_by_oid: Dict[str, str] = {}
+            for r in db.query(UserOrder.order_reference, UserOrder.user_id).filter(UserOrder.order_reference.in_(refs)):
+                uid_by_ref[r[0]] = r[1]
+            for m in db.query(OrderReferenceEmail).filter(
+                or_(OrderReferenceEmail.order_reference.in_(refs), OrderReferenceEmail.provider_order_id.in_(oids or [""]))
+            ):
+                if m.user_id:
+                    uid_by_ref.setdefault(m.order_reference, m.user_id)
+                    if m.provider_order_id:
+                        uid_by_oid.setdefault(m.provider_order_id, m.user_id)
+            uid_by_email: Dict[str, str] = {}
+            if emails:
+                for u in db.query(User.id, User.email).filter(func.lower(User.email).in_(emails)):
+                    uid_by_email[(u[1] or "").lower()] = u[0]
+            written = 0
+            for o in items:
+                ref = str(o.get("order_reference"))
+                uid = (
+                    uid_by_ref.get(ref)
+                    or uid_by_oid.get(str(o.get("order_id") or ""))
+                    or uid_by_email.get(str(o.get("client_email") or "").strip().lower())
+                    or (user_id or "")
+                )
+                if not uid:
+                    continue
+                fields = self._item_fields(o)
+                fields["email"] = str(o.get("client_email") or "").strip().lower() or None
+                self._upsert(db, ref, uid, fields)
+                written += 1
+            db.commit()
+            self.ingested += written
+            return written
+        except Exception:
+            db.rollback()
+            return 0
+        finally:
+            db.close()
+
+    def ensure_user(self, user_id: str, email: Optional[str] = None) -> int:
+        """首次访问用户时，把 order_reference_emails 中属于该用户的引用补入索引。"""
+        uid = (user_id or "").strip()
+        if not uid or self._seeded.get(uid):
+            return 0
+        ue = (email or "").strip().lower()
+        db = SessionLocal()
+        try:
+            cond = OrderReferenceEmail.user_id == uid
+            if ue:
+                cond = or_(cond, OrderReferenceEmail.email == ue)
+            mappings = db.query(OrderReferenceEmail).filter(cond).all()
+            refs = [m.order_reference for m in mappings]
+            known = {r[0] for r in db.query(UserOrder.order_reference).filter(UserOrder.order_reference.in_(refs or [""]))}
+            # 本地下单记录补齐 bundle_code（按套餐过滤时不漏掉刚补入的引用）；ICCID 由调用方回查上游补齐
+            oids = [m.provider_order_id for m in mappings if m.provider_order_id and m.order_reference not in known]
+            bundle_by_oid: Dict[str, str] = {}
+            if oids:
+                for r in db.query(Order.provider_order_id, Order.bundle_id).filter(Order.provider_order_id.in_(oids)):
+                    if r[1]:
+                        bundle_by_oid[r[0]] = r[1]
+            added = 0
+            for m in mappings:
+                if m.order_reference in known:
+                    continue
+                known.add(m.order_reference)
+                db.add(UserOrder(
+                    order_reference=m.order_reference,
+                    user_id=uid,
+                    provider_order_id=m.provider_order_id,
+                    bundle_code=bundle_by_oid.get(m.provider_order_id or ""),
+                    email=m.email,
+                    created_at=m.assigned_at or m.created_at or datetime.utcnow(),
+                    updated_at=datetime.utcnow(),
+                ))
+                added += 1
+            db.commit()
+            self._seeded.set(uid, True)
+            self.seeded_rows += added
+            return added
+        except Exception:
+            db.rollback()
+            return 0
+        finally:
+            db.close()
+
+    def unsynced(self, user_id: str, limit: int) -> List[str]:
+        """用户索引中尚无上游条目（payload）的引用，按时间倒序，最多 limit 个。"""
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(UserOrder.order_reference)
+                .filter(UserOrder.user_id == user_id, UserOrder.payload.is_(None))
+                .order_by(UserOrder.created_at.desc())
+                .limit(max(0, int(limit)))
+                .all()
+            )
+            return [r[0] for r in rows]
+        finally:
+            db.close()
+
+    # ===== 读取 =====
+    def page(
+        self,
+        user_id: str,
+        page_number: int,
+        page_size: int,
+        bundle_code: Optional[str] = None,
+        order_id: Optional[str] = None,
+        order_reference: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        iccid: Optional[str] = None,
+    ) -> Optional[Tuple[List[IndexedOrder], int]]:
+        """按用户分页；用户在索引中没有任何订单时返回 None（调用方回退上游过滤）。"""
+        db = SessionLocal()
+        try:
+            q = db.query(UserOrder).filter(UserOrder.user_id == user_id)
+            if bundle_code:
+                q = q.filter(UserOrder.bundle_code == bundle_code)
+            if order_id:
+                q = q.filter(UserOrder.provider_order_id == str(order_id))
+            if order_reference:
+                q = q.filter(UserOrder.order_reference == str(order_reference))
+            if iccid:
+                q = q.filter(UserOrder.iccid == str(iccid))
+            start = parse_filter_time(start_date)
+            end = parse_filter_time(end_date)
+            if start is not None:
+                q = q.filter(UserOrder.created_at >= start)
+            if end is not None:
+                q = q.filter(UserOrder.created_at <= end)
+            total = q.count()
+            if total == 0:
+                has_any = db.query(UserOrder.order_reference).filter(UserOrder.user_id == user_id).first() is not None
+                if not has_any:
+                    return None
+            offset = max(0, (int(page_number) - 1) * int(page_size))
+            rows = q.order_by(UserOrder.created_at.desc(), UserOrder.order_reference).offset(offset).limit(int(page_size)).all()
+            out: List[IndexedOrder] = []
+            for r in rows:
+                item = None
+                if r.payload:
+                    try:
+                        item = json.loads(r.payload)
+                    except Exception:
+                        item = None
+                stub = {
+                    "order_id": r.provider_order_id or "",
+                    "order_reference": r.order_reference,
+                    "client_email": r.email or "",
+                    "bundle_code": r.bundle_code or "",
+                    "iccid": r.iccid,
+                    "order_status": r.status or "",
+                    "created_at": int((r.created_at - datetime(1970, 1, 1)).total_seconds()) if r.created_at else None,
+                }
+                out.append(IndexedOrder(r.order_reference, item, stub))
+            self.pages_served += 1
+            return out, total
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "recorded": self.recorded,
+            "ingested": self.ingested,
+            "seededRows": self.seeded_rows,
+            "pagesServed": self.pages_served,
+        }
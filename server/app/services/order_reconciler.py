@@ -0,0 +1,403 @@
+from __future__ import annotations
+from datetime import datetime, timedelta
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+
+from ..db import SessionLocal
+from ..models.orm import Order, OrderReferenceEmail, SyncCursor, User
+from ..provider.client import ProviderClient
+from ..provider.registry import get_provider_client
+from .order_index import UserOrderIndex
+
+# 上游 /orders/list 的日期过滤格式
+_DATE_FMT = "%Y/%m/%d %H:%M:%S"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+class OrderReconciler:
+    """后台订单对账：按 start_date / end_date 时间窗增量扫描上游 /orders/list。
+
+    - 每个窗口分页拉取，按页批量 upsert order_reference_emails 与 orders.provider_order_id（一次提交）；
+    - 归属用户：已有映射 → 本地订单（order_reference 为本地订单 id 前 30 位）→ client_email 对应用户；
+    - 游标（已扫描到的上游时间）持久化在 sync_cursors，重启后继续；每轮从游标回退一小段重叠，覆盖迟到订单；
+    - 窗口内订单超过分页上限时折半窗口重扫，保证不漏单；
+    - 多进程部署时按 sync_cursors 行上的租约（lease_owner / lease_until）选出一个进程推进游标；
+    - 请求路径（/orders/mappings/init）只把需要补扫的日期范围放入队列，由后台线程扫描。
+    """
+
+    CURSOR_NAME = "orders_reconcile"
+
+    def __init__(self, provider: Optional[ProviderClient] = None, index: Optional[UserOrderIndex] = None) -> None:
+        self.provider = provider or get_provider_client()
+        self.index = index
+        self.enabled = os.getenv("ORDER_RECONCILE_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.interval = max(5, _env_int("ORDER_RECONCILE_INTERVAL_SECONDS", 60))
+        self.window = timedelta(seconds=max(60, _env_int("ORDER_RECONCILE_WINDOW_SECONDS", 6 * 3600)))
+        self.overlap = timedelta(seconds=max(0, _env_int("ORDER_RECONCILE_OVERLAP_SECONDS", 600)))
+        self.lookback = timedelta(days=max(1, _env_int("ORDER_RECONCILE_LOOKBACK_DAYS", 30)))
+        self.page_size = max(10, _env_int("ORDER_RECONCILE_PAGE_SIZE", 100))
+        self.max_pages = max(1, _env_int("ORDER_RECONCILE_MAX_PAGES", 20))
+        self.max_windows = max(1, _env_int("ORDER_RECONCILE_MAX_WINDOWS_PER_RUN", 48))
+        self.max_pending = max(1, _env_int("ORDER_RECONCILE_MAX_PENDING", 100))
+        self.lease = timedelta(seconds=max(30, _env_int("ORDER_RECONCILE_LEASE_SECONDS", 300)))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"[:64]
+        self._lock = threading.Lock()
+        # 待补扫的日期范围（请求线程入队，后台线程扫描）
+        self._pending: List[Tuple[datetime, datetime]] = []
+        self._pending_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.cursor: Optional[datetime] = None
+        self.runs = 0
+        self.windows = 0
+        self.split_windows = 0
+        self.pages = 0
+        self.orders_seen = 0
+        self.mappings_created = 0
+        self.mappings_updated = 0
+        self.orders_backfilled = 0
+        self.unmatched = 0
+        self.ranges_queued = 0
+        self.ranges_dropped = 0
+        self.lease_skipped = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_run_at: Optional[float] = None
+        self.last_run_ms: Optional[int] = None
+
+    # ===== 游标与租约 =====
+    def _load_cursor(self) -> Optional[datetime]:
+        db = SessionLocal()
+        try:
+            row = db.get(SyncCursor, self.CURSOR_NAME)
+            return row.cursor if row else None
+        finally:
+            db.close()
+
+    def _acquire_lease(self) -> bool:
+        """抢占游标行上的租约（条件 UPDATE，跨进程互斥）；租约过期后其他进程可接管。"""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            if db.get(SyncCursor, self.CURSOR_NAME) is None:
+                try:
+                    db.add(SyncCursor(name=self.CURSOR_NAME, updated_at=now))
+                    db.commit()
+                except Exception:
+                    # 其他进程同时创建了该行
+                    db.rollback()
+            got = (
+                db.query(SyncCursor)
+                .filter(
+                    SyncCursor.name == self.CURSOR_NAME,
+                    or_(
+                        SyncCursor.lease_owner.is_(None),
+                        SyncCursor.lease_owner == self.owner,
+                        SyncCursor.lease_until.is_(None),
+                        SyncCursor.lease_until < now,
+                    ),
+                )
+                .update({SyncCursor.lease_owner: self.owner, SyncCursor.lease_until: now + self.lease}, synchronize_session=False)
+            )
+            db.commit()
+            return got == 1
+        except Exception:
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    def _release_lease(self) -> None:
+        db = SessionLocal()
+        try:
+            db.query(SyncCursor).filter(SyncCursor.name == self.CURSOR_NAME, SyncCursor.lease_owner == self.owner).update(
+                {SyncCursor.lease_owner: None, SyncCursor.lease_until: None}, synchronize_session=False
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+        finally:
+            db.close()
+
+    def _save_cursor(self, cursor: datetime) -> bool:
+        """推进游标并续租；租约已被其他进程接管时返回 False（调用方停止本轮扫描）。"""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            saved = (
+                db.query(SyncCursor)
+                .filter(SyncCursor.name == self.CURSOR_NAME, SyncCursor.lease_owner == self.owner)
+                .update({SyncCursor.cursor: cursor, SyncCursor.updated_at: now, SyncCursor.lease_until: now + self.lease}, synchronize_session=False)
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            return False
+        finally:
+            db.close()
+        if saved != 1:
+            return False
+        self.cursor = cursor
+        return True
+
+    # ===== 扫描 =====
+    def _scan_window(self, start: datetime, end: datetime, request_id: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """拉取并落库一个时间窗内的全部订单；超过分页上限时返回 None（调用方折半重扫）。"""
+        filters = {"start_date": start.strftime(_DATE_FMT), "end_date": end.strftime(_DATE_FMT)}
+        seen: List[Dict[str, Any]] = []
+        for page in range(1, self.max_pages + 1):
+            data = self.provider.list_orders_v2(page_number=page, page_size=self.page_size, filters=filters, request_id=request_id)
+            orders = data.get("orders") or []
+            self.pages += 1
+            if orders:
+                self.apply(orders)
+                seen.extend(orders)
+            if len(orders) < self.page_size:
+                return seen
+        return None
+
+    def _sweep(
+        self,
+        start: datetime,
+        end: datetime,
+        max_windows: Optional[int] = None,
+        on_window: Optional[Callable[[datetime], bool]] = None,
+        request_id: Optional[str] = None,
+    ) -> Tuple[int, datetime]:
+        """按窗口扫描 [start, end]，最多 max_windows 个窗口；返回 (订单数, 已扫描到的位置)。
+
+        on_window 在每个窗口完成后调用，返回 False 时停止。
+        """
+        seen = 0
+        done = 0
+        cur = start
+        step = self.window
+        while cur < end and (max_windows is None or done < max_windows):
+            stop = min(cur + step, end)
+            orders = self._scan_window(cur, stop, request_id=request_id)
+            if orders is None and (stop - cur) > timedelta(seconds=60):
+                step = (stop - cur) / 2
+                self.split_windows += 1
+                continue
+            seen += len(orders or [])
+            self.windows += 1
+            done += 1
+            cur = stop
+            step = self.window
+            if on_window is not None and not on_window(stop):
+                break
+        return seen, cur
+
+    def reconcile_range(self, start: datetime, end: datetime, request_id: Optional[str] = None) -> int:
+        """同步扫描 [start, end]；返回扫描到的订单数。不移动持久化游标。"""
+        return self._sweep(start, end, request_id=request_id)[0]
+
+    def enqueue_range(self, start: datetime, end: datetime) -> bool:
+        """把 [start, end] 放入补扫队列并唤醒后台线程（与已排队范围重叠时合并）；队列满时返回 False。"""
+        if start >= end:
+            return False
+        with self._pending_lock:
+            merged: List[Tuple[datetime, datetime]] = []
+            for lo, hi in self._pending:
+                if lo <= end and start <= hi:
+                    start, end = min(lo, start), max(hi, end)
+                else:
+                    merged.append((lo, hi))
+            if len(merged) >= self.max_pending:
+                self.ranges_dropped += 1
+                return False
+            merged.append((start, end))
+            self._pending = sorted(merged)
+            self.ranges_queued += 1
+        self._wake.set()
+        return True
+
+    def _drain_pending(self) -> int:
+        """扫描排队的范围（每轮最多 max_windows 个窗口），未扫完的剩余部分放回队首。"""
+        seen = 0
+        budget = self.max_windows
+        while budget > 0:
+            with self._pending_lock:
+                if not self._pending:
+                    break
+                start, end = self._pending.pop(0)
+            windows_before = self.windows
+            n, reached = self._sweep(start, end, max_windows=budget)
+            seen += n
+            budget -= max(1, self.windows - windows_before)
+            if reached < end:
+                with self._pending_lock:
+                    self._pending.insert(0, (reached, end))
+        return seen
+
+    def run_once(self) -> int:
+        """扫描排队的补扫范围，再在持有租约时从持久化游标推进到当前时间（每轮最多 max_windows 个窗口）。"""
+        if not self._lock.acquire(blocking=False):
+            return 0
+        t0 = time.time()
+        seen = 0
+        try:
+            seen += self._drain_pending()
+            if self._acquire_lease():
+                try:
+                    now = datetime.utcnow().replace(microsecond=0)
+                    cursor = self._load_cursor()
+                    self.cursor = cursor or self.cursor
+                    start = (cursor - self.overlap) if cursor else (now - self.lookback)
+                    seen += self._sweep(start, now, max_windows=self.max_windows, on_window=self._save_cursor)[0]
+                finally:
+                    self._release_lease()
+            else:
+                # 其他进程持有租约，本轮不推进游标
+                self.lease_skipped += 1
+            self.runs += 1
+            self.last_error = None
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+        finally:
+            self.last_run_at = time.time()
+            self.last_run_ms = int((self.last_run_at - t0) * 1000)
+            self._lock.release()
+        return seen
+
+    # ===== 落库 =====
+    def apply(self, orders: List[Dict[str, Any]]) -> Dict[str, int]:
+        """批量写入一页上游订单的映射与本地订单回填（单次提交）。"""
+        items = [o for o in orders if o and o.get("order_reference")]
+        result = {"created": 0, "updated": 0, "backfilled": 0}
+        if not items:
+            return result
+        self.orders_seen += len(items)
+        refs = list({str(o.get("order_reference")) for o in items})
+        oids = list({str(o.get("order_id")) for o in items if o.get("order_id")})
+        emails = list({str(o.get("client_email") or "").strip().lower() for o in items} - {""})
+        db = SessionLocal()
+        try:
+            by_ref = {m.order_reference: m for m in db.query(OrderReferenceEmail).filter(OrderReferenceEmail.order_reference.in_(refs))}
+            oid_owner = {
+                m.provider_order_id: m.order_reference
+                for m in db.query(OrderReferenceEmail).filter(OrderReferenceEmail.provider_order_id.in_(oids or [""]))
+            }
+            # 本地订单：order_reference 为本地订单 id（32 位 hex）前 30 位；按主键范围匹配前缀，可走主键索引
+            local_by_ref: Dict[str, Order] = {}
+            prefixes = [r for r in refs if len(r) == 30]
+            if prefixes:
+                ranges = [and_(Order.id >= r, Order.id < r + "~") for r in prefixes]
+                for r in db.query(Order).filter(or_(*ranges)):
+                    local_by_ref.setdefault((r.id or "")[:30], r)
+            oid_taken = {r[0] for r in db.query(Order.provider_order_id).filter(Order.provider_order_id.in_(oids or [""]))}
+            uid_by_email: Dict[str, str] = {}
+            if emails:
+                for u in db.query(User.id, User.email).filter(func.lower(User.email).in_(emails)):
+                    uid_by_email[(u[1] or "").lower()] = u[0]
+            now = datetime.utcnow()
+            for o in items:
+                ref = str(o.get("order_reference"))
+                oid = str(o.get("order_id")) if o.get("order_id") else None
+                email = str(o.get("client_email") or "").strip().lower()
+                local = local_by_ref.get(ref)
+                # 上游 order_id 已映射到别的引用时不再写入（唯一约束）
+                oid_ok = bool(oid) and oid_owner.get(oid, ref) == ref
+                rec = by_ref.get(ref)
+                if rec is not None:
+                    if oid_ok and rec.provider_order_id != oid:
+                        rec.provider_order_id = oid
+                        rec.updated_at = now
+                        oid_owner[oid] = ref
+                        result["updated"] += 1
+                else:
+                    uid = (local.user_id if local is not None else None) or uid_by_email.get(email)
+                    if not uid:
+                        self.unmatched += 1
+                        continue
+                    rec = OrderReferenceEmail(
+                        order_reference=ref,
+                        provider_order_id=oid if oid_ok else None,
+                        user_id=uid,
+                        email=email or None,
+                        updated_at=now,
+                    )
+                    db.add(rec)
+                    by_ref[ref] = rec
+                    if oid_ok:
+                        oid_owner[oid] = ref
+                    result["created"] += 1
+                if local is not None and oid and not local.provider_order_id and oid not in oid_taken:
+                    local.provider_order_id = oid
+                    oid_taken.add(oid)
+                    result["backfilled"] += 1
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.errors += 1
+            self.last_error = str(e)
+            return result
+        finally:
+            db.close()
+        self.mappings_created += result["created"]
+        self.mappings_updated += result["updated"]
+        self.orders_backfilled += result["backfilled"]
+        if self.index is not None:
+            try:
+                self.index.ingest(items)
+            except Exception:
+                pass
+        return result
+
+    # ===== 后台线程 =====
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.run_once()
+            # 到下一轮间隔或有新的补扫范围入队时醒来
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self) -> None:
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="order-reconciler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def stats(self) -> Dict[str, Any]:
+        cursor = self.cursor
+        return {
+            "enabled": self.enabled,
+            "cursor": cursor.isoformat() + "Z" if cursor else None,
+            "lagSeconds": int((datetime.utcnow() - cursor).total_seconds()) if cursor else None,
+            "runs": self.runs,
+            "windows": self.windows,
+            "splitWindows": self.split_windows,
+            "pages": self.pages,
+            "ordersSeen": self.orders_seen,
+            "mappingsCreated": self.mappings_created,
+            "mappingsUpdated": self.mappings_updated,
+            "ordersBackfilled": self.orders_backfilled,
+            "unmatched": self.unmatched,
+            "pendingRanges": len(self._pending),
+            "rangesQueued": self.ranges_queued,
+            "rangesDropped": self.ranges_dropped,
+            "leaseSkipped": self.lease_skipped,
+            "errors": self.errors,
+            "lastError": self.last_error,
+            "lastRunMs": self.last_run_ms,
+            "lastRunAgeSeconds": int(time.time() - self.last_run_at) if self.last_run_at else None,
+        }
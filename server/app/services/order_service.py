@@ -1,6 +1,7 @@
 from __future__ import annotations
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Iterator, Optional
+import os
 
 from sqlalchemy.orm import Session
 
@@ -20,42 +21,65 @@ from ..models.dto import (
     OrdersListNormalizedQuery,
     OrdersListWithUsageQuery,
 )
-from ..models.orm import Order, OrderReferenceEmail, RefundRequest
+from ..models.orm import Order, OrderReferenceEmail, RefundRequest, UserOrder
 from ..provider.client import ProviderClient
+from ..provider.limiter import upstream_executor
+from ..provider.registry import get_provider_client
+from ..cache import BoundedCache, SingleFlight
+from .order_index import UserOrderIndex
+from .order_reconciler import OrderReconciler
+from .usage_store import UsageRefresher
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
 
 
 class OrderService:
-    def __init__(self):
-        self.provider = ProviderClient()
-        # simple in-memory cache for upstream reflection
-        self._orders: dict[str, OrderDTO] = {}
-        self._order_email_by_ref: dict[str, str] = {}
-        self._oid_ref_cache: dict[str, tuple[str, float]] = {}
-        self._ref_item_cache: dict[str, tuple[dict, float]] = {}
-        self._oid_item_cache: dict[str, tuple[dict, float]] = {}
-        self._ref_usage_cache: dict[str, tuple[dict, float]] = {}
-        self._ref_detail_cache: dict[str, tuple[dict, float]] = {}
+    def __init__(self, provider: Optional[ProviderClient] = None, index: Optional[UserOrderIndex] = None):
+        self.provider = provider or get_provider_client()
+        # 用户订单本地索引：列表接口按用户分页，不再拉取上游整页后过滤
+        self.index = index or UserOrderIndex()
+        # 后台订单对账：按日期窗扫描上游 /orders/list，全局维护引用映射
+        self.reconciler = OrderReconciler(provider=self.provider, index=self.index)
+        # 订单用量本地存储：后台按优先级刷新，列表接口一次本地读取整页用量
+        self.usage = UsageRefresher(provider=self.provider)
+        # simple in-memory cache for upstream reflection（有界 LRU，避免长期运行内存无限增长）
+        max_entries = _env_int("ORDER_CACHE_MAX_ENTRIES", 10000)
+        max_bytes = _env_int("ORDER_CACHE_MAX_BYTES", 16 * 1024 * 1024)
+        self._orders = BoundedCache("orders", max_entries=max_entries, max_bytes=max_bytes)
+        self._order_email_by_ref = BoundedCache("order_email_by_ref", max_entries=max_entries)
+        self._oid_ref_cache = BoundedCache("oid_ref", max_entries=max_entries, ttl=300)
+        self._ref_item_cache = BoundedCache("ref_item", max_entries=max_entries, max_bytes=max_bytes, ttl=120)
+        self._oid_item_cache = BoundedCache("oid_item", max_entries=max_entries, max_bytes=max_bytes, ttl=120)
+        self._ref_usage_cache = BoundedCache("ref_usage", max_entries=max_entries, max_bytes=max_bytes, ttl=60)
+        self._ref_detail_cache = BoundedCache("ref_detail", max_entries=max_entries, max_bytes=max_bytes, ttl=120)
+        # 同一引用的并发 consumption 请求（跨请求）只打一次上游
+        self._usage_flight = SingleFlight()
 
     def _get_db(self) -> Session:
         return SessionLocal()
 
-    def _cache_get(self, cache: dict, key: str):
-        import time
-        v = cache.get(key)
-        if not v:
-            return None
-        val, exp = v
-        if exp < time.time():
-            try:
-                del cache[key]
-            except Exception:
-                pass
-            return None
-        return val
+    def _cache_get(self, cache: BoundedCache, key: str):
+        return cache.get(key)
 
-    def _cache_put(self, cache: dict, key: str, val, ttl: float):
-        import time
-        cache[key] = (val, time.time() + ttl)
+    def _cache_put(self, cache: BoundedCache, key: str, val, ttl: float):
+        cache.set(key, val, ttl=ttl)
+
+    def cache_stats(self) -> dict:
+        caches = (
+            self._orders,
+            self._order_email_by_ref,
+            self._oid_ref_cache,
+            self._ref_item_cache,
+            self._oid_item_cache,
+            self._ref_usage_cache,
+            self._ref_detail_cache,
+        )
+        return {c.name: c.stats() for c in caches}
 
     def _lookup_ref_by_oid(self, oid: str, request_id: Optional[str] = None) -> tuple[str, dict]:
         ref = self._cache_get(self._oid_ref_cache, oid)
@@ -90,16 +114,51 @@ class OrderService:
             return o
         return {}
 
+    def _lookup_items_by_refs(self, refs: list[str], request_id: Optional[str] = None) -> dict:
+        """并发回查多个引用的上游条目（共享上游线程池，整批共用截止时间）；查不到的引用不在结果中。"""
+        refs = list(dict.fromkeys(r for r in refs if r))
+        found: dict = {}
+        if not refs:
+            return found
+        try:
+            ex = upstream_executor()
+            deadline = ex.deadline()
+            futs = {ex.submit(self._lookup_item_by_ref, r, request_id, deadline=deadline): r for r in refs}
+            ex.wait(futs, deadline)
+            for fut, r in futs.items():
+                try:
+                    item = fut.result()
+                except Exception:
+                    item = {}
+                if item:
+                    found[r] = item
+        except Exception:
+            for r in refs:
+                try:
+                    item = self._lookup_item_by_ref(r, request_id=request_id)
+                except Exception:
+                    item = {}
+                if item:
+                    found[r] = item
+        return found
+
     def _get_usage_by_ref(self, ref: str, request_id: Optional[str] = None) -> dict:
         cached = self._cache_get(self._ref_usage_cache, ref)
         if cached:
             return cached
-        try:
-            usage = self.provider.get_order_consumption_v2(order_reference=ref, request_id=request_id)
-        except Exception:
-            usage = {}
-        self._cache_put(self._ref_usage_cache, ref, usage, 60)
-        return usage
+        usage = self.usage.get_fresh(ref)
+        if usage:
+            self._cache_put(self._ref_usage_cache, ref, usage, 60)
+            return usage
+        def fetch() -> dict:
+            try:
+                fetched = self.provider.get_order_consumption_v2(order_reference=ref, request_id=request_id)
+            except Exception:
+                fetched = {}
+            self._cache_put(self._ref_usage_cache, ref, fetched, 60)
+            self.usage.put(ref, fetched)
+            return fetched
+        return self._usage_flight.do(ref, fetch)
 
     def _get_detail_by_ref(self, ref: str, request_id: Optional[str] = None) -> dict:
         cached = self._cache_get(self._ref_detail_cache, ref)
@@ -109,6 +168,93 @@ class OrderService:
         self._cache_put(self._ref_detail_cache, ref, detail or {}, 120)
         return detail or {}
 
+    @staticmethod
+    def _list_filters(body) -> dict:
+        return {
+            "bundle_code": body.bundle_code,
+            "order_id": body.order_id,
+            "order_reference": body.order_reference,
+            "start_date": body.start_date,
+            "end_date": body.end_date,
+            "iccid": body.iccid,
+        }
+
+    def _filter_for_user(self, orders: list[dict], uid: str, ue: str) -> list[dict]:
+        """旧路径：按 order_reference_emails 映射 / 邮箱过滤上游返回的一页订单。"""
+        def _lower(s: Optional[str]) -> str:
+            return (s or "").strip().lower()
+        refs = [str(o.get("order_reference")) for o in orders if o.get("order_reference")]
+        oids = [str(o.get("order_id")) for o in orders if o.get("order_id")]
+        uid_by_ref: dict[str, str] = {}
+        uid_by_oid: dict[str, str] = {}
+        email_by_ref: dict[str, str] = {}
+        db = self._get_db()
+        try:
+            if refs:
+                rows = db.query(OrderReferenceEmail).filter(OrderReferenceEmail.order_reference.in_(refs)).all()
+                for r in rows:
+                    uid_by_ref[r.order_reference] = (r.user_id or "").strip()
+                    email_by_ref[r.order_reference] = (r.email or "").strip().lower()
+            if oids:
+                rows2 = db.query(OrderReferenceEmail).filter(OrderReferenceEmail.provider_order_id.in_(oids)).all()
+                for r in rows2:
+                    uid_by_oid[r.provider_order_id or ""] = (r.user_id or "").strip()
+        finally:
+            db.close()
+        return [
+            o for o in orders
+            if (
+                (uid and (uid_by_ref.get(str(o.get("order_reference"))) == uid or uid_by_oid.get(str(o.get("order_id"))) == uid))
+                or (ue and (_lower(o.get("client_email")) == ue or _lower(self._order_email_by_ref.get(str(o.get("order_reference")))) == ue or _lower(email_by_ref.get(str(o.get("order_reference")))) == ue))
+            )
+        ]
+
+    def _user_orders(self, body, request_id: Optional[str], user_email: Optional[str], user_id: Optional[str], dev_all: Optional[bool]) -> tuple[list[dict], int]:
+        """当前用户的一页上游订单条目及过滤后的总数。
+
+        有 user_id 时走本地索引（user_orders）：分页与总数在本地完成，只对索引中缺少上游条目的
+        引用并发回查并写回；索引中还没有该用户任何订单时回退旧路径（拉取上游一页再过滤）。
+        """
+        uid = (user_id or "").strip()
+        ue = (user_email or "").strip().lower()
+        filters = self._list_filters(body)
+        if uid and not bool(dev_all):
+            page = None
+            try:
+                if self.index.ensure_user(uid, ue):
+                    # 映射表补入的引用缺少上游条目（ICCID、创建时间等）：一次并发回查写回，使过滤与排序生效
+                    refs = self.index.unsynced(uid, _env_int("ORDER_INDEX_BACKFILL_MAX", 200))
+                    found = self._lookup_items_by_refs(refs, request_id=request_id)
+                    if found:
+                        self.index.ingest(found.values(), user_id=uid)
+                page = self.index.page(uid, body.page_number, body.page_size, **filters)
+            except Exception:
+                page = None
+            if page is not None:
+                rows, total = page
+                # 页内仍缺少上游条目的引用并发回查；写回了上游创建时间则重新分页一次，使排序与上游一致
+                found = self._lookup_items_by_refs([row.order_reference for row in rows if not row.item], request_id=request_id)
+                if found and self.index.ingest(found.values(), user_id=uid):
+                    try:
+                        page = self.index.page(uid, body.page_number, body.page_size, **filters) or page
+                    except Exception:
+                        pass
+                    rows, total = page
+                orders = [row.item or found.get(row.order_reference) or row.stub for row in rows]
+                return orders, total
+        data = self.provider.list_orders_v2(
+            page_number=body.page_number,
+            page_size=body.page_size,
+            filters=filters,
+            request_id=request_id,
+        )
+        orders = data.get("orders", [])
+        if (uid or ue) and not bool(dev_all):
+            orders = self._filter_for_user(orders, uid, ue)
+            if uid and orders:
+                self.index.ingest(orders, user_id=uid)
+        return orders, len(orders)
+
     def create_order(self, body: CreateOrderBody, user_id: str | None = None) -> OrderDTO:
         if not body.bundleId:
             raise ValueError("bundleId is required")
@@ -196,8 +342,9 @@ class OrderService:
 
     def get_order(self, order_id: str, user_id: str | None = None, request_id: str | None = None) -> Optional[OrderDTO]:
         # Try local first
-        if order_id in self._orders:
-            return self._orders[order_id]
+        cached = self._orders.get(order_id)
+        if cached is not None:
+            return cached
         db = self._get_db()
         try:
             if user_id:
@@ -295,6 +442,8 @@ class OrderService:
                                 db.commit()
                         except Exception:
                             pass
+                        # 仅更新索引中已有的条目（未分配上游套餐的本地订单不入索引）
+                        self.index.record(order_reference, None, provider_order_id=provider_order_id)
                         self._orders[r.id] = OrderDTO(
                             id=r.id,
                             bundleId=r.bundle_id,
@@ -479,6 +628,14 @@ class OrderService:
             db.commit()
         finally:
             db.close()
+        self.index.record(
+            order_reference,
+            user_id,
+            email=email,
+            provider_order_id=provider_order_id,
+            bundle_code=bundle_code,
+            created_at=datetime.utcnow(),
+        )
         # Optionally cache minimal order info
         oid = str(data.get("order_id"))
         if oid:
@@ -513,92 +670,34 @@ class OrderService:
         return BundleAssignResultDTO(orderId=oid, iccid=str(data.get("iccid")))
 
     def init_mappings_for_user(self, user_id: str, request_id: Optional[str] = None) -> dict:
+        """补齐当前用户本地订单的上游映射。
+
+        映射由后台对账（OrderReconciler）全局维护；这里只把仍缺 provider_order_id 的本地订单的
+        创建时间范围放入对账补扫队列并立即返回，扫描与落库在后台线程完成（不在请求线程逐窗扫描）。
+        """
         db = self._get_db()
-        updated = 0
-        checked = 0
         try:
-            rows = db.query(Order).filter(Order.user_id == user_id).all()
-            for r in rows:
-                checked += 1
-                loc_id = (r.id or "")
-                ref = loc_id[:30]
-                try:
-                    detail = self.provider.get_order_detail_v2(order_reference=ref, request_id=request_id)
-                except Exception:
-                    continue
-                oid = detail.get("order_id")
-                if not oid:
-                    continue
-                oid = str(oid)
-                # upsert mapping
-                rec = db.query(OrderReferenceEmail).filter(OrderReferenceEmail.order_reference == ref).first()
-                if rec:
-                    rec.provider_order_id = oid
-                    rec.user_id = user_id
-                    rec.updated_at = datetime.utcnow()
-                else:
-                    rec = OrderReferenceEmail(order_reference=ref, provider_order_id=oid, user_id=user_id, email=None, updated_at=datetime.utcnow())
-                    db.add(rec)
-                # backfill local order
-                r.provider_order_id = oid
-                db.add(r)
-                db.commit()
-                updated += 1
+            checked = db.query(Order).filter(Order.user_id == user_id).count()
+            times = [r[0] for r in db.query(Order.created_at).filter(Order.user_id == user_id, Order.provider_order_id.is_(None)) if r[0]]
         finally:
             db.close()
-        return {"checked": checked, "updated": updated}
+        if not times:
+            return {"checked": checked, "updated": 0, "queued": 0}
+        margin = timedelta(hours=1)
+        queued = 0
+        try:
+            queued = 1 if self.reconciler.enqueue_range(min(times) - margin, max(times) + margin) else 0
+        except Exception:
+            pass
+        return {"checked": checked, "updated": 0, "queued": queued}
 
     def orders_list_v2(self, body: OrdersListQuery, request_id: Optional[str] = None, user_email: Optional[str] = None, user_id: Optional[str] = None, dev_all: Optional[bool] = None) -> dict:
         """Compat upstream '/orders/list': returns {orders, orders_count}.
 
         Accepts OrdersListQuery body and forwards filters to provider, along with Request-Id.
         """
-        data = self.provider.list_orders_v2(
-            page_number=body.page_number,
-            page_size=body.page_size,
-            filters={
-                "bundle_code": body.bundle_code,
-                "order_id": body.order_id,
-                "order_reference": body.order_reference,
-                "start_date": body.start_date,
-                "end_date": body.end_date,
-                "iccid": body.iccid,
-            },
-            request_id=request_id,
-        )
-        orders = data.get("orders", [])
-        ue = (user_email or "").strip().lower()
-        uid = (user_id or "").strip()
-        if (uid or ue) and not bool(dev_all):
-            def _lower(s: Optional[str]) -> str:
-                return (s or "").strip().lower()
-            # Load mappings for current batch
-            refs = [str(o.get("order_reference")) for o in orders if o.get("order_reference")]
-            oids = [str(o.get("order_id")) for o in orders if o.get("order_id")]
-            uid_by_ref: dict[str, str] = {}
-            uid_by_oid: dict[str, str] = {}
-            email_by_ref: dict[str, str] = {}
-            db = self._get_db()
-            try:
-                if refs:
-                    rows = db.query(OrderReferenceEmail).filter(OrderReferenceEmail.order_reference.in_(refs)).all()
-                    for r in rows:
-                        uid_by_ref[r.order_reference] = (r.user_id or "").strip()
-                        email_by_ref[r.order_reference] = (r.email or "").strip().lower()
-                if oids:
-                    rows2 = db.query(OrderReferenceEmail).filter(OrderReferenceEmail.provider_order_id.in_(oids)).all()
-                    for r in rows2:
-                        uid_by_oid[r.provider_order_id or ""] = (r.user_id or "").strip()
-            finally:
-                db.close()
-            orders = [
-                o for o in orders
-                if (
-                    (uid and (uid_by_ref.get(str(o.get("order_reference"))) == uid or uid_by_oid.get(str(o.get("order_id"))) == uid))
-                    or (ue and (_lower(o.get("client_email")) == ue or _lower(self._order_email_by_ref.get(str(o.get("order_reference")))) == ue or _lower(email_by_ref.get(str(o.get("order_reference")))) == ue))
-                )
-            ]
-        return {"orders": orders, "orders_count": len(orders)}
+        orders, total = self._user_orders(body, request_id, user_email, user_id, dev_all)
+        return {"orders": orders, "orders_count": total}
 
     def orders_detail_v2(self, body: OrdersDetailQuery, request_id: Optional[str] = None) -> dict:
         """Compat upstream '/orders/detail': returns order detail data dict.
@@ -706,87 +805,147 @@ class OrderService:
             installation=install,
         )
 
-    def orders_consumption_batch(self, body: OrdersConsumptionBatchQuery, request_id: Optional[str] = None) -> dict:
-        refs = list(set([str(r).strip() for r in (body.order_references or []) if str(r).strip()]))
-        ids = list(set([str(i).strip() for i in (body.order_ids or []) if str(i).strip()]))
-        if ids and not refs:
-            for oid in ids:
-                listing = self.provider.list_orders_v2(page_number=1, page_size=10, filters={"order_id": oid}, request_id=request_id)
+    def _refs_by_order_ids(self, ids: list[str], request_id: Optional[str] = None) -> dict[str, str]:
+        """批量把上游 order_id 解析为 order_reference。
+
+        依次查：内存缓存 → 本地映射（order_reference_emails / user_orders / orders）→ 一次按日期范围的
+        上游 /orders/list 扫描（ORDERS_BATCH_SCAN_DAYS 天内，最多 ORDERS_BATCH_SCAN_MAX_PAGES 页）→
+        仍未找到的才逐个按 order_id 回查。
+        """
+        resolved: dict[str, str] = {}
+        for oid in ids:
+            ref = self._cache_get(self._oid_ref_cache, oid)
+            if ref:
+                resolved[oid] = ref
+        missing = [oid for oid in ids if oid not in resolved]
+        if missing:
+            db = self._get_db()
+            try:
+                for m in db.query(OrderReferenceEmail.provider_order_id, OrderReferenceEmail.order_reference).filter(OrderReferenceEmail.provider_order_id.in_(missing)):
+                    resolved.setdefault(m[0], m[1])
+                for m in db.query(UserOrder.provider_order_id, UserOrder.order_reference).filter(UserOrder.provider_order_id.in_(missing)):
+                    resolved.setdefault(m[0], m[1])
+                for m in db.query(Order.provider_order_id, Order.id).filter(Order.provider_order_id.in_(missing)):
+                    # 本地订单 id 的前 30 位即 assign 时使用的 order_reference
+                    resolved.setdefault(m[0], (m[1] or "")[:30])
+            except Exception:
+                pass
+            finally:
+                db.close()
+            for oid in missing:
+                if resolved.get(oid):
+                    self._cache_put(self._oid_ref_cache, oid, resolved[oid], 300)
+        missing = [oid for oid in ids if oid not in resolved]
+        if missing:
+            resolved.update(self._scan_refs_by_order_ids(missing, request_id=request_id))
+        for oid in [oid for oid in ids if oid not in resolved]:
+            try:
+                ref, _item = self._lookup_ref_by_oid(oid, request_id=request_id)
+            except Exception:
+                ref = ""
+            if ref:
+                resolved[oid] = ref
+        return resolved
+
+    def _scan_refs_by_order_ids(self, ids: list[str], request_id: Optional[str] = None) -> dict[str, str]:
+        wanted = set(ids)
+        found: dict[str, str] = {}
+        items: list[dict] = []
+        end = datetime.utcnow()
+        start = end - timedelta(days=max(1, _env_int("ORDERS_BATCH_SCAN_DAYS", 30)))
+        filters = {"start_date": start.strftime("%Y/%m/%d %H:%M:%S"), "end_date": end.strftime("%Y/%m/%d %H:%M:%S")}
+        page_size = 100
+        try:
+            for page in range(1, max(1, _env_int("ORDERS_BATCH_SCAN_MAX_PAGES", 5)) + 1):
+                listing = self.provider.list_orders_v2(page_number=page, page_size=page_size, filters=filters, request_id=request_id)
                 orders = listing.get("orders", [])
                 for o in orders:
-                    r = str(o.get("order_reference") or "")
-                    if r:
-                        refs.append(r)
-                        break
+                    oid = str(o.get("order_id") or "")
+                    ref = str(o.get("order_reference") or "")
+                    if oid in wanted and ref:
+                        found[oid] = ref
+                        items.append(o)
+                        self._cache_put(self._oid_ref_cache, oid, ref, 300)
+                        self._cache_put(self._oid_item_cache, oid, o, 120)
+                        self._cache_put(self._ref_item_cache, ref, o, 120)
+                if len(found) == len(wanted) or len(orders) < page_size:
+                    break
+        except Exception:
+            pass
+        if items:
+            # 顺带写入映射，后续同一批 id 直接命中本地
+            self.reconciler.apply(items)
+        return found
+
+    def _owned_refs(self, refs: list[str], user_id: str) -> list[str]:
+        """只保留属于该用户的引用（订单索引或映射表中归属该用户），保持原顺序。"""
+        if not refs:
+            return []
+        owned: set[str] = set()
+        db = self._get_db()
+        try:
+            for r in db.query(UserOrder.order_reference).filter(UserOrder.user_id == user_id, UserOrder.order_reference.in_(refs)):
+                owned.add(r[0])
+            for r in db.query(OrderReferenceEmail.order_reference).filter(OrderReferenceEmail.user_id == user_id, OrderReferenceEmail.order_reference.in_(refs)):
+                owned.add(r[0])
+        except Exception:
+            return []
+        finally:
+            db.close()
+        return [r for r in refs if r in owned]
+
+    def _batch_refs(self, body: OrdersConsumptionBatchQuery, request_id: Optional[str] = None, user_id: Optional[str] = None) -> list[str]:
+        refs = list(dict.fromkeys([str(r).strip() for r in (body.order_references or []) if str(r).strip()]))
+        ids = list(dict.fromkeys([str(i).strip() for i in (body.order_ids or []) if str(i).strip()]))
+        if ids and not refs:
+            by_id = self._refs_by_order_ids(ids, request_id=request_id)
+            refs = list(dict.fromkeys([by_id[oid] for oid in ids if by_id.get(oid)]))
+        if user_id:
+            refs = self._owned_refs(refs, user_id)
+        return refs
+
+    def orders_consumption_batch(self, body: OrdersConsumptionBatchQuery, request_id: Optional[str] = None, user_id: Optional[str] = None) -> dict:
+        """user_id 不为空时只返回该用户自己的订单（其他引用 / id 静默忽略）。"""
+        refs = self._batch_refs(body, request_id=request_id, user_id=user_id)
         items: list[dict] = []
         if not refs:
             return {"items": items}
         try:
-            import concurrent.futures as _f, os as _os
-            try:
-                _c = int(_os.getenv("ORDERS_USAGE_CONCURRENCY", "5"))
-            except Exception:
-                _c = 5
-            workers = min(max(1, _c), max(1, len(refs)))
-            with _f.ThreadPoolExecutor(max_workers=workers) as ex:
-                futs = {ex.submit(self._get_usage_by_ref, r, request_id): r for r in refs}
-                for fut, r in list(futs.items()):
-                    try:
-                        usage = fut.result()
-                    except Exception:
-                        usage = {}
-                    items.append({"order_reference": r, "usage": usage})
+            # 共享上游线程池；/orders/consumption 的实际并发由进程级 UpstreamLimiter 按接口预算约束。
+            # 截止时间从提交时起算：到期未开始的任务取消，对应条目 usage 为空
+            ex = upstream_executor()
+            deadline = ex.deadline()
+            futs = {ex.submit(self._get_usage_by_ref, r, request_id, deadline=deadline): r for r in refs}
+            ex.wait(futs, deadline)
+            for fut, r in list(futs.items()):
+                try:
+                    usage = fut.result()
+                except Exception:
+                    usage = {}
+                items.append({"order_reference": r, "usage": usage})
         except Exception:
             for r in refs:
                 usage = self._get_usage_by_ref(r, request_id=request_id)
                 items.append({"order_reference": r, "usage": usage})
         return {"items": items}
 
-    def orders_list_normalized(self, body: OrdersListNormalizedQuery, request_id: Optional[str] = None, user_email: Optional[str] = None, user_id: Optional[str] = None, dev_all: Optional[bool] = None) -> list[OrderDTO]:
-        data = self.provider.list_orders_v2(
-            page_number=body.page_number,
-            page_size=body.page_size,
-            filters={
-                "bundle_code": body.bundle_code,
-                "order_id": body.order_id,
-                "order_reference": body.order_reference,
-                "start_date": body.start_date,
-                "end_date": body.end_date,
-                "iccid": body.iccid,
-            },
-            request_id=request_id,
-        )
-        orders = data.get("orders", [])
-        ue = (user_email or "").strip().lower()
-        uid = (user_id or "").strip()
-        if (uid or ue) and not bool(dev_all):
-            def _lower(s: Optional[str]) -> str:
-                return (s or "").strip().lower()
-            refs = [str(o.get("order_reference")) for o in orders if o.get("order_reference")]
-            oids = [str(o.get("order_id")) for o in orders if o.get("order_id")]
-            uid_by_ref: dict[str, str] = {}
-            uid_by_oid: dict[str, str] = {}
-            email_by_ref: dict[str, str] = {}
-            db = self._get_db()
+    def orders_consumption_stream(self, body: OrdersConsumptionBatchQuery, request_id: Optional[str] = None, user_id: Optional[str] = None) -> Iterator[dict]:
+        """与 orders_consumption_batch 相同的条目，按完成先后逐个产出（供 NDJSON 流式接口使用）。"""
+        refs = self._batch_refs(body, request_id=request_id, user_id=user_id)
+        if not refs:
+            return
+        ex = upstream_executor()
+        deadline = ex.deadline()
+        futs = {ex.submit(self._get_usage_by_ref, r, request_id, deadline=deadline): r for r in refs}
+        for fut in ex.as_completed(futs, deadline):
             try:
-                if refs:
-                    rows = db.query(OrderReferenceEmail).filter(OrderReferenceEmail.order_reference.in_(refs)).all()
-                    for r in rows:
-                        uid_by_ref[r.order_reference] = (r.user_id or "").strip()
-                        email_by_ref[r.order_reference] = (r.email or "").strip().lower()
-                if oids:
-                    rows2 = db.query(OrderReferenceEmail).filter(OrderReferenceEmail.provider_order_id.in_(oids)).all()
-                    for r in rows2:
-                        uid_by_oid[r.provider_order_id or ""] = (r.user_id or "").strip()
-            finally:
-                db.close()
-            orders = [
-                o for o in orders
-                if (
-                    (uid and (uid_by_ref.get(str(o.get("order_reference"))) == uid or uid_by_oid.get(str(o.get("order_id"))) == uid))
-                    or (ue and (_lower(o.get("client_email")) == ue or _lower(self._order_email_by_ref.get(str(o.get("order_reference")))) == ue or _lower(email_by_ref.get(str(o.get("order_reference")))) == ue))
-                )
-            ]
+                usage = fut.result()
+            except Exception:
+                usage = {}
+            yield {"order_reference": futs[fut], "usage": usage}
+
+    def orders_list_normalized(self, body: OrdersListNormalizedQuery, request_id: Optional[str] = None, user_email: Optional[str] = None, user_id: Optional[str] = None, dev_all: Optional[bool] = None) -> list[OrderDTO]:
+        orders, _total = self._user_orders(body, request_id, user_email, user_id, dev_all)
         def normalize_item(o: dict) -> OrderDTO:
             if not bool(dev_all):
                 body = OrdersDetailNormalizedQuery(order_id=str(o.get("order_id")), order_reference=str(o.get("order_reference")))
@@ -850,50 +1009,7 @@ class OrderService:
                     limit = max(0, int(max_usage))
                 except Exception:
                     pass
-            data = self.provider.list_orders_v2(
-                page_number=body.page_number,
-                page_size=body.page_size,
-                filters={
-                    "bundle_code": body.bundle_code,
-                    "order_id": body.order_id,
-                    "order_reference": body.order_reference,
-                    "start_date": body.start_date,
-                    "end_date": body.end_date,
-                    "iccid": body.iccid,
-                },
-                request_id=request_id,
-            )
-            orders = data.get("orders", [])
-            ue = (user_email or "").strip().lower()
-            uid = (user_id or "").strip()
-            if (uid or ue) and not bool(dev_all):
-                def _lower(s: Optional[str]) -> str:
-                    return (s or "").strip().lower()
-                refs = [str(o.get("order_reference")) for o in orders if o.get("order_reference")]
-                oids = [str(o.get("order_id")) for o in orders if o.get("order_id")]
-                uid_by_ref: dict[str, str] = {}
-                uid_by_oid: dict[str, str] = {}
-                email_by_ref: dict[str, str] = {}
-                db = self._get_db()
-                try:
-                    if refs:
-                        rows = db.query(OrderReferenceEmail).filter(OrderReferenceEmail.order_reference.in_(refs)).all()
-                        for r in rows:
-                            uid_by_ref[r.order_reference] = (r.user_id or "").strip()
-                            email_by_ref[r.order_reference] = (r.email or "").strip().lower()
-                    if oids:
-                        rows2 = db.query(OrderReferenceEmail).filter(OrderReferenceEmail.provider_order_id.in_(oids)).all()
-                        for r in rows2:
-                            uid_by_oid[r.provider_order_id or ""] = (r.user_id or "").strip()
-                finally:
-                    db.close()
-                orders = [
-                    o for o in orders
-                    if (
-                        (uid and (uid_by_ref.get(str(o.get("order_reference"))) == uid or uid_by_oid.get(str(o.get("order_id"))) == uid))
-                        or (ue and (_lower(o.get("client_email")) == ue or _lower(self._order_email_by_ref.get(str(o.get("order_reference")))) == ue or _lower(email_by_ref.get(str(o.get("order_reference")))) == ue))
-                    )
-                ]
+            orders, total = self._user_orders(body, request_id, user_email, user_id, dev_all)
             from datetime import datetime as _dt
             def to_dto(o: dict) -> OrderDTO:
                 v = o.get("created_at")
@@ -937,8 +1053,10 @@ class OrderService:
                     paymentMethod="alipay",
                     installation=None,
                 )
-            refs_for_usage = [str(o.get("order_reference")) for o in orders if o.get("order_reference")][:max(0, int(limit))]
-            usage_map: dict[str, dict] = {}
+            # 整页用量一次本地读取（并标记为最近查看，后台优先刷新）；本地尚无用量的引用最多按需拉取 limit 个
+            page_refs = [str(o.get("order_reference")) for o in orders if o.get("order_reference")]
+            usage_map: dict[str, dict] = self.usage.get_many(page_refs)
+            refs_for_usage = [r for r in page_refs if r not in usage_map][:max(0, int(limit))]
             if refs_for_usage:
                 batch = self.orders_consumption_batch(OrdersConsumptionBatchQuery(order_references=refs_for_usage), request_id=request_id)
                 for it in (batch.get("items") or []):
@@ -974,7 +1092,8 @@ class OrderService:
                         items.append({"order": dto, "usage": {}})
                 finally:
                     db.close()
-            return {"items": items, "orders_count": len(items)}
+                total = len(items)
+            return {"items": items, "orders_count": total}
 
     def _map_installation(self, provider_order: dict) -> Optional[InstallationDTO]:
         activation_code = provider_order.get("activation_code")
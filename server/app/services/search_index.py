@@ -0,0 +1,469 @@
+from __future__ import annotations
+from array import array
+from bisect import bisect_left
+import heapq
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from ..models.dto import SearchResultDTO
+
+# 前缀索引最大长度：更长的查询词先按前 MAX_PREFIX 个字符取候选，再逐文档校验
+MAX_PREFIX = 12
+# 无空格分词的文字（中日韩、泰文）：额外建立字符 1/2-gram 倒排，支持词内子串检索
+_UNSEGMENTED = re.compile(r"[\u0e00-\u0e7f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_KIND_BOOST = {"country": 3.0, "region": 2.0, "bundle": 0.0}
+
+
+def normalize(s: Optional[str]) -> str:
+    """与原 CatalogService.search 的规范化一致（去掉 plus / ＋ 差异）。"""
+    x = str(s or "").strip().lower()
+    x = x.replace("＋", "+")
+    x = x.replace("plus", "+")
+    x = x.replace(" ", " ")
+    x = x.replace("+", "")
+    return x
+
+
+def tokenize(s: Optional[str]) -> List[str]:
+    return _TOKEN.findall(normalize(s))
+
+
+def _grams(token: str) -> List[str]:
+    if len(token) == 1:
+        return ["~" + token]
+    return ["~" + token[i:i + 2] for i in range(len(token) - 1)]
+
+
+def _index_terms(token: str) -> Iterable[str]:
+    for n in range(1, min(len(token), MAX_PREFIX) + 1):
+        yield token[:n]
+    if _UNSEGMENTED.search(token):
+        for ch in set(token):
+            yield "~" + ch
+        for g in _grams(token):
+            yield g
+
+
+class SearchDoc:
+    """一个可检索实体。fields: (规范化文本, 词元, 权重, 语言, 是否代码字段)。"""
+
+    __slots__ = ("kind", "result", "fields", "tokens", "blob", "order")
+
+    def __init__(self, kind: str, result: SearchResultDTO) -> None:
+        self.kind = kind
+        self.result = result
+        self.fields: List[Tuple[str, Tuple[str, ...], float, Optional[str], bool]] = []
+        self.tokens: set[str] = set()
+        self.blob = ""
+        self.order = 0
+
+    def add(self, text: Optional[str], weight: float = 1.0, lang: Optional[str] = None, code: bool = False) -> None:
+        norm = normalize(text)
+        if not norm:
+            return
+        toks = tuple(_TOKEN.findall(norm))
+        for f in self.fields:
+            if f[0] == norm:
+                return
+        self.fields.append((norm, toks, weight, lang, code))
+        self.tokens.update(toks)
+
+    def seal(self, order: int) -> None:
+        self.order = order
+        self.blob = "\x00".join(f[0] for f in self.fields)
+
+
+class _Segment:
+    __slots__ = ("source", "version", "docs", "postings", "built_at", "build_ms")
+
+    def __init__(self, source: str, version: Hashable, docs: List[SearchDoc]) -> None:
+        t0 = time.perf_counter()
+        self.source = source
+        self.version = version
+        self.docs = docs
+        postings: Dict[str, List[int]] = {}
+        for i, d in enumerate(docs):
+            d.seal(i)
+            terms: set[str] = set()
+            for tok in d.tokens:
+                terms.update(_index_terms(tok))
+            for t in terms:
+                postings.setdefault(t, []).append(i)
+        self.postings = postings
+        self.built_at = time.time()
+        self.build_ms = int((time.perf_counter() - t0) * 1000)
+
+    def candidates(self, qtoks: Sequence[str]) -> Optional[set[int]]:
+        """所有查询词都命中（前缀或 n-gram）的文档集合。"""
+        result: Optional[set[int]] = None
+        lists: List[List[int]] = []
+        for t in qtoks:
+            if _UNSEGMENTED.search(t):
+                for g in (_grams(t) if len(t) > 1 else ["~" + t]):
+                    lists.append(self.postings.get(g, []))
+            else:
+                lists.append(self.postings.get(t[:MAX_PREFIX], []))
+        lists.sort(key=len)
+        for plist in lists:
+            if result is None:
+                result = set(plist)
+            else:
+                result.intersection_update(plist)
+            if not result:
+                return set()
+        return result
+
+
+def _field_score(norm: str, toks: Tuple[str, ...], code: bool, nq: str, qtoks: Sequence[str]) -> float:
+    if norm == nq:
+        return 100.0
+    if code:
+        # 代码字段（ISO2/ISO3/region/bundle code）只认精确匹配
+        return 0.0
+    if norm.startswith(nq):
+        return 70.0
+    if all(any(ft.startswith(t) for ft in toks) for t in qtoks):
+        exact = sum(1 for t in qtoks if t in toks)
+        return 40.0 + 10.0 * exact / max(1, len(qtoks))
+    if nq in norm:
+        return 20.0
+    return 0.0
+
+
+class SearchIndex:
+    """多数据源（country / region / bundle）的内存倒排索引。
+
+    每个数据源一个 segment，按版本号独立重建：目录或翻译变化时只重建受影响的 segment；
+    重建期间继续使用旧 segment 提供查询。
+    """
+
+    def __init__(self) -> None:
+        self._segments: Dict[str, _Segment] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.rebuilds = 0
+        self.queries = 0
+
+    def _lock_for(self, source: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._locks.get(source)
+            if lock is None:
+                lock = threading.Lock()
+                self._locks[source] = lock
+            return lock
+
+    def version(self, source: str) -> Optional[Hashable]:
+        seg = self._segments.get(source)
+        return seg.version if seg is not None else None
+
+    def refresh(self, source: str, version: Hashable, build: Callable[[], List[SearchDoc]]) -> None:
+        seg = self._segments.get(source)
+        if seg is not None and seg.version == version:
+            return
+        lock = self._lock_for(source)
+        # 已有旧 segment 且他人正在重建：直接使用旧 segment，不阻塞查询
+        if not lock.acquire(blocking=seg is None):
+            return
+        try:
+            seg = self._segments.get(source)
+            if seg is not None and seg.version == version:
+                return
+            self._segments[source] = _Segment(source, version, build())
+            self.rebuilds += 1
+        finally:
+            lock.release()
+
+    def search(
+        self,
+        variants: Sequence[Tuple[str, float]],
+        sources: Sequence[str],
+        limit: int = 20,
+        lang: Optional[str] = None,
+    ) -> List[SearchResultDTO]:
+        """variants: [(查询文本, 权重)]（原始查询 + 别名扩展）；返回按得分排序的前 limit 条。"""
+        self.queries += 1
+        best: Dict[Tuple[int, int], float] = {}
+        segs = [(rank, self._segments.get(s)) for rank, s in enumerate(sources)]
+        for text, vweight in variants:
+            nq = normalize(text)
+            qtoks = _TOKEN.findall(nq)
+            if not qtoks:
+                continue
+            for rank, seg in segs:
+                if seg is None:
+                    continue
+                cands = seg.candidates(qtoks)
+                if not cands:
+                    continue
+                for i in cands:
+                    d = seg.docs[i]
+                    if not self._verify(d, qtoks):
+                        continue
+                    score = 0.0
+                    for norm, toks, fweight, flang, code in d.fields:
+                        s = _field_score(norm, toks, code, nq, qtoks)
+                        if s:
+                            lw = 1.0 if (flang is None or flang == lang) else 0.95
+                            score = max(score, s * fweight * lw)
+                    if not score:
+                        # 查询词分散命中多个字段
+                        score = 10.0
+                    score = score * vweight + _KIND_BOOST.get(d.kind, 0.0)
+                    key = (rank, i)
+                    if score > best.get(key, 0.0):
+                        best[key] = score
+        top = heapq.nsmallest(max(0, limit), best.items(), key=lambda kv: (-kv[1], kv[0][0], kv[0][1]))
+        out: List[SearchResultDTO] = []
+        for (rank, i), _ in top:
+            seg = segs[rank][1]
+            if seg is not None:
+                out.append(seg.docs[i].result)
+        return out
+
+    @staticmethod
+    def _verify(d: SearchDoc, qtoks: Sequence[str]) -> bool:
+        for t in qtoks:
+            if _UNSEGMENTED.search(t):
+                if t not in d.blob:
+                    return False
+            elif len(t) > MAX_PREFIX and not any(tok.startswith(t) for tok in d.tokens):
+                return False
+        return True
+
+    def docs(self, source: str) -> List[SearchDoc]:
+        seg = self._segments.get(source)
+        return seg.docs if seg is not None else []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queries": self.queries,
+            "rebuilds": self.rebuilds,
+            "segments": {
+                s.source: {"docs": len(s.docs), "terms": len(s.postings), "buildMs": s.build_ms, "ageSeconds": int(time.time() - s.built_at)}
+                for s in list(self._segments.values())
+            },
+        }
+
+
+class SuggestTable:
+    """单语言的排序数组前缀索引（输入联想）。
+
+    keys 为规范化后的名称 / 词首后缀 / 代码，升序排列；bisect 定位前缀区间后顺序扫描，
+    每次查询只扫描有限条目（scan），不访问 DB 与上游。
+    """
+
+    def __init__(self, lang: str, version: Hashable, items: List[Tuple[str, SearchResultDTO]], rows: List[Tuple[str, int, float]]) -> None:
+        rows.sort()
+        self.lang = lang
+        self.version = version
+        self.items = items
+        self.keys: List[str] = [r[0] for r in rows]
+        self.refs = array("l", (r[1] for r in rows))
+        self.bonus = array("d", (r[2] for r in rows))
+
+    def lookup(self, prefix: str, kinds: Optional[Sequence[str]] = None, limit: int = 8, scan: int = 512) -> List[SearchResultDTO]:
+        p = normalize(prefix)
+        if not p:
+            return []
+        keys, refs, bonus, items = self.keys, self.refs, self.bonus, self.items
+        best: Dict[int, float] = {}
+        j = bisect_left(keys, p)
+        end = min(len(keys), j + scan)
+        while j < end:
+            k = keys[j]
+            if not k.startswith(p):
+                break
+            ref = refs[j]
+            if kinds is None or items[ref][0] in kinds:
+                score = bonus[j] + (50.0 if k == p else 0.0)
+                if score > best.get(ref, -1.0):
+                    best[ref] = score
+            j += 1
+        top = heapq.nsmallest(limit, best.items(), key=lambda kv: (-(kv[1] + _KIND_BOOST.get(items[kv[0]][0], 0.0)), len(items[kv[0]][1].title), kv[0]))
+        return [items[ref][1] for ref, _ in top]
+
+
+def build_suggest_table(lang: str, version: Hashable, docs: Iterable[SearchDoc], localize: Callable[[SearchDoc], str]) -> SuggestTable:
+    items: List[Tuple[str, SearchResultDTO]] = []
+    rows: List[Tuple[str, int, float]] = []
+    for d in docs:
+        title = localize(d) or d.result.title
+        ref = len(items)
+        items.append((d.kind, d.result.model_copy(update={"title": title})))
+        keys: Dict[str, float] = {}
+
+        def put(key: str, score: float) -> None:
+            if key and score > keys.get(key, -1.0):
+                keys[key] = score
+
+        names = [normalize(title)]
+        for norm, toks, weight, flang, code in d.fields:
+            if code:
+                put(norm, 20.0)
+            elif flang in (lang, "en", None):
+                names.append(norm)
+        for i, norm in enumerate(names):
+            base = 30.0 if i == 0 else 25.0
+            put(norm, base)
+            # 词首后缀："hong kong" → "kong"；无空格文字额外索引字符后缀
+            for m in _TOKEN.finditer(norm):
+                if m.start() > 0:
+                    put(norm[m.start():], base - 15.0)
+            if _UNSEGMENTED.search(norm):
+                for k in range(1, min(len(norm), 8)):
+                    put(norm[k:], base - 20.0)
+        for key, score in keys.items():
+            rows.append((key, ref, score))
+    return SuggestTable(lang, version, items, rows)
+
+
+# ===== 文档构建（国家 / 地区 / 套餐），包含 12 种语言名称与别名 =====
+def _reverse_aliases(aliases: Dict[str, str]) -> Dict[str, List[str]]:
+    out: Dict[str, List[str]] = {}
+    for alias, target in aliases.items():
+        out.setdefault(normalize(target), []).append(alias)
+    return out
+
+
+def _marketing_variants(name: Optional[str]) -> List[Tuple[str, str]]:
+    """营销名 → 各语言译名 [(lang, name)]（BUNDLE_MARKETING_NAMES）。"""
+    from ..i18n import BUNDLE_MARKETING_NAMES, MARKETING_CANONICAL_MAP, _norm as _mkt_norm
+    canon = MARKETING_CANONICAL_MAP.get(_mkt_norm(str(name or "")))
+    if not canon:
+        return []
+    return [(lang, m[canon]) for lang, m in BUNDLE_MARKETING_NAMES.items() if canon in m]
+
+
+def country_docs(countries: Sequence[Any], snap: Any) -> List[SearchDoc]:
+    from ..i18n import LANG_WHITELIST, _TERRITORY_ALIASES, country_code_table, territory_table
+    aliases = _reverse_aliases(_TERRITORY_ALIASES)
+    codes = country_code_table()
+    tables = [territory_table(lang) for lang in sorted(LANG_WHITELIST)]
+    docs: List[SearchDoc] = []
+    for c in countries:
+        code = str(c.code or "").upper()
+        if not code:
+            continue
+        iso2 = code if len(code) == 2 else (codes.iso2(code) or "")
+        iso3 = code if len(code) == 3 else (codes.iso3(code) or "")
+        d = SearchDoc("country", SearchResultDTO(kind="country", id=c.code, title=c.name, subtitle=None, countryCode=c.code))
+        d.add(c.name, 1.0, "en")
+        d.add(iso2, 1.0, None, code=True)
+        d.add(iso3, 1.0, None, code=True)
+        for lang, m in snap.countries.items():
+            rec = m.get(iso2) if iso2 else None
+            if rec:
+                d.add(rec[2], 1.0, lang)
+        for tbl in tables:
+            if iso2 and iso2 in tbl.names:
+                d.add(tbl.names[iso2], 0.9, tbl.lang)
+        for alias in aliases.get(normalize(c.name), []):
+            d.add(alias, 0.9, None)
+        docs.append(d)
+    return docs
+
+
+def region_docs(regions: Sequence[Any], snap: Any) -> List[SearchDoc]:
+    from ..i18n import _REGION_ALIASES
+    aliases = _reverse_aliases(_REGION_ALIASES)
+    docs: List[SearchDoc] = []
+    for r in regions:
+        if not r.code:
+            continue
+        d = SearchDoc("region", SearchResultDTO(kind="region", id=r.code, title=r.name, subtitle=None, regionCode=r.code))
+        d.add(r.name, 1.0, "en")
+        d.add(r.code, 1.0, None, code=True)
+        for lang, m in snap.regions.items():
+            if r.code in m:
+                d.add(m[r.code], 1.0, lang)
+        for lang, name in _marketing_variants(r.name):
+            d.add(name, 0.9, lang)
+        for alias in aliases.get(normalize(r.code), []):
+            d.add(alias, 0.9, None)
+        docs.append(d)
+    return docs
+
+
+def bundle_docs(bundles: Sequence[Dict[str, Any]], snap: Any) -> List[SearchDoc]:
+    from ..i18n import country_code_table
+    codes = country_code_table()
+    docs: List[SearchDoc] = []
+    for b in bundles:
+        code = str(b.get("bundle_code") or "")
+        name = str(b.get("bundle_name") or b.get("bundle_marketing_name") or "")
+        mkt = str(b.get("bundle_marketing_name") or "")
+        cc_list = [str(x) for x in (b.get("country_code") or [])]
+        cc = cc_list[0] if cc_list else ""
+        data_amt = (str(b.get("gprs_limit") or "") + " " + str(b.get("data_unit") or "")).strip()
+        try:
+            valid = int(float(str(b.get("validity") or 0)))
+        except Exception:
+            valid = 0
+        d = SearchDoc("bundle", SearchResultDTO(
+            kind="bundle",
+            id=code or name,
+            title=name,
+            subtitle=f"{data_amt} · {valid}d",
+            bundleCode=code,
+            countryCode=cc,
+        ))
+        d.add(name, 1.0, "en")
+        d.add(mkt, 0.9, "en")
+        d.add(code, 1.0, None, code=True)
+        for lang, m in snap.bundles.items():
+            rec = m.get(code)
+            if rec:
+                d.add(rec[0], 0.9, lang)
+                d.add(rec[1], 1.0, lang)
+        for lang, v in _marketing_variants(mkt):
+            d.add(v, 0.85, lang)
+        for c3 in cc_list:
+            d.add(c3, 0.8, None, code=True)
+            c2 = codes.iso2(c3)
+            if c2:
+                d.add(c2, 0.8, None, code=True)
+        for cname in (b.get("country_name") or []):
+            d.add(str(cname), 0.7, "en")
+        d.add(data_amt, 0.6, None)
+        d.add(data_amt.replace(" ", ""), 0.6, None)
+        docs.append(d)
+    return docs
+
+
+def expand_query(term: str, lang: Optional[str] = None) -> List[Tuple[str, float]]:
+    """查询别名扩展：营销名规范化、地区别名、地区名别名、本地化国家名 → ISO2、ISO2 → ISO3。"""
+    base = normalize(term)
+    variants: List[Tuple[str, float]] = [(base, 1.0)]
+    try:
+        from ..i18n import MARKETING_CANONICAL_MAP, _REGION_ALIASES, _TERRITORY_ALIASES, country_code_table, territory_code
+        canon = MARKETING_CANONICAL_MAP.get(base)
+        if canon:
+            variants.append((normalize(canon), 0.9))
+            rc = _REGION_ALIASES.get(normalize(canon))
+            if rc:
+                variants.append((normalize(rc), 0.85))
+        ali = _TERRITORY_ALIASES.get(base)
+        if ali:
+            variants.append((normalize(ali), 0.9))
+        codes = country_code_table()
+        iso2 = (territory_code(base, lang) if lang else None) or codes.code_for_name(base)
+        if iso2:
+            variants.append((normalize(iso2), 0.9))
+        # ISO2 -> ISO3（套餐 country_code 为 ISO3）：内存表查找，不再逐词查询 DB
+        for t, _ in list(variants):
+            if len(t) == 2:
+                iso3 = codes.iso3(t)
+                if iso3:
+                    variants.append((normalize(iso3), 0.8))
+    except Exception:
+        pass
+    seen: set[str] = set()
+    out: List[Tuple[str, float]] = []
+    for v, w in variants:
+        if v and v not in seen:
+            seen.add(v)
+            out.append((v, w))
+    return out
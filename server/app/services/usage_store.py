@@ -0,0 +1,360 @@
+from __future__ import annotations
+from concurrent.futures import wait
+from datetime import datetime, timedelta
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+
+from ..db import SessionLocal
+from ..models.orm import OrderUsage
+from ..provider.client import ProviderClient
+from ..provider.limiter import upstream_executor
+from ..provider.registry import get_provider_client
+from .order_index import parse_upstream_time
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _float(v: Any) -> Optional[float]:
+    try:
+        return float(v) if v is not None and v != "" else None
+    except Exception:
+        return None
+
+
+class _RateLimiter:
+    """令牌桶：平均 rate 次/秒，允许 burst 次突发。"""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = max(0.01, float(rate))
+        self.capacity = max(1, int(burst))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float) -> bool:
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait_s = (1 - self.tokens) / self.rate
+            if time.monotonic() + wait_s > deadline:
+                return False
+            time.sleep(wait_s)
+
+
+class UsageRefresher:
+    """订单用量本地存储（order_usages）与后台优先级刷新。
+
+    - 列表接口一次本地查询（只读）读取整页用量，超过 USAGE_MAX_AGE_SECONDS 的视为未命中；
+      查看记录先存在内存，由后台刷新每轮开始时批量写入（最近查看的引用提升为最高优先级）；
+    - 后台按优先级拉取到期条目：最近查看 > 即将到期 / 余量低 > 使用中 > 未激活；已结束的套餐不再刷新；
+    - 上游调用受令牌桶限速（USAGE_REFRESH_RATE_PER_SECOND，在刷新线程提交任务前等待令牌），失败按指数退避重试。
+    """
+
+    def __init__(self, provider: Optional[ProviderClient] = None) -> None:
+        self.provider = provider or get_provider_client()
+        self.enabled = os.getenv("USAGE_REFRESH_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.tick = max(1, _env_int("USAGE_REFRESH_TICK_SECONDS", 5))
+        self.batch = max(1, _env_int("USAGE_REFRESH_BATCH", 20))
+        self.fresh_seconds = max(0, _env_int("USAGE_FRESH_SECONDS", 60))
+        # 列表读取可接受的最大用量年龄（秒，0 表示不限）
+        self.max_age_seconds = max(0, _env_int("USAGE_MAX_AGE_SECONDS", 21600))
+        self.viewed_window = timedelta(seconds=max(60, _env_int("USAGE_VIEWED_WINDOW_SECONDS", 900)))
+        # 各优先级的刷新间隔（秒）
+        self.intervals = {
+            0: timedelta(seconds=max(10, _env_int("USAGE_REFRESH_VIEWED_SECONDS", 60))),
+            1: timedelta(seconds=max(10, _env_int("USAGE_REFRESH_URGENT_SECONDS", 300))),
+            2: timedelta(seconds=max(10, _env_int("USAGE_REFRESH_ACTIVE_SECONDS", 1800))),
+            3: timedelta(seconds=max(10, _env_int("USAGE_REFRESH_IDLE_SECONDS", 21600))),
+        }
+        self.near_expiry = timedelta(hours=max(1, _env_int("USAGE_NEAR_EXPIRY_HOURS", 24)))
+        self.low_ratio = 0.1
+        self.limiter = _RateLimiter(
+            rate=_float(os.getenv("USAGE_REFRESH_RATE_PER_SECOND", "5")) or 5.0,
+            burst=_env_int("USAGE_REFRESH_BURST", 10),
+        )
+        # 待写入的查看记录：引用 → 最近查看时间（有界，满时丢弃新引用）
+        self._viewed: Dict[str, datetime] = {}
+        self._viewed_lock = threading.Lock()
+        self.viewed_max = max(1, _env_int("USAGE_VIEWED_MAX_PENDING", 10000))
+        self._tick_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reads = 0
+        self.read_hits = 0
+        self.read_expired = 0
+        self.viewed_dropped = 0
+        self.refreshed = 0
+        self.fetch_errors = 0
+        self.rate_limited = 0
+        self.last_tick_ms: Optional[int] = None
+
+    # ===== 调度 =====
+    def _schedule(self, row: OrderUsage, now: datetime) -> None:
+        status = (row.plan_status or "").lower()
+        ended = any(k in status for k in ("expired", "terminated", "finished", "cancel")) or (
+            row.expires_at is not None and row.expires_at < now
+        )
+        if ended and row.fetched_at is not None:
+            row.priority = 3
+            row.next_refresh_at = None
+            return
+        viewed = row.last_viewed_at is not None and now - row.last_viewed_at <= self.viewed_window
+        low = bool(row.data_allocated) and row.data_remaining is not None and row.data_remaining / row.data_allocated < self.low_ratio
+        near = row.expires_at is not None and row.expires_at - now <= self.near_expiry
+        if viewed or row.fetched_at is None:
+            row.priority = 0
+        elif low or near:
+            row.priority = 1
+        elif "not started" in status:
+            row.priority = 3
+        else:
+            row.priority = 2
+        base = row.fetched_at or now
+        row.next_refresh_at = base + self.intervals[row.priority] if row.fetched_at else now
+
+    @staticmethod
+    def _fill(row: OrderUsage, usage: Dict[str, Any], now: datetime) -> None:
+        row.payload = json.dumps(usage, ensure_ascii=False, default=str)
+        row.plan_status = str(usage.get("plan_status") or "") or None
+        row.data_allocated = _float(usage.get("data_allocated"))
+        row.data_remaining = _float(usage.get("data_remaining"))
+        row.expires_at = parse_upstream_time(usage.get("bundle_expiry_date") or usage.get("expiry_date"))
+        row.fetched_at = now
+        row.errors = 0
+
+    # ===== 读写 =====
+    def get_many(self, refs: Iterable[str], viewed: bool = True) -> Dict[str, Dict[str, Any]]:
+        """一次只读查询读取多个引用的已存用量（过旧的视为未命中）；viewed=True 时记录查看，由后台批量写入。"""
+        keys = list({str(r) for r in refs if r})
+        if not keys:
+            return {}
+        now = datetime.utcnow()
+        oldest = now - timedelta(seconds=self.max_age_seconds) if self.max_age_seconds > 0 else None
+        out: Dict[str, Dict[str, Any]] = {}
+        expired = 0
+        db = SessionLocal()
+        try:
+            q = db.query(OrderUsage.order_reference, OrderUsage.payload, OrderUsage.fetched_at).filter(OrderUsage.order_reference.in_(keys))
+            for ref, payload, fetched_at in q:
+                if not payload:
+                    continue
+                if oldest is not None and (fetched_at is None or fetched_at < oldest):
+                    expired += 1
+                    continue
+                try:
+                    out[ref] = json.loads(payload)
+                except Exception:
+                    pass
+        except Exception:
+            pass
+        finally:
+            db.close()
+        if viewed:
+            with self._viewed_lock:
+                for ref in keys:
+                    if ref in self._viewed or len(self._viewed) < self.viewed_max:
+                        self._viewed[ref] = now
+                    else:
+                        self.viewed_dropped += 1
+        self.reads += len(keys)
+        self.read_hits += len(out)
+        self.read_expired += expired
+        return out
+
+    def flush_viewed(self) -> int:
+        """把内存中的查看记录批量写入并重新调度（未知引用加入刷新队列）；返回写入条数。"""
+        with self._viewed_lock:
+            viewed, self._viewed = self._viewed, {}
+        if not viewed:
+            return 0
+        now = datetime.utcnow()
+        refs = list(viewed)
+        db = SessionLocal()
+        try:
+            for i in range(0, len(refs), 500):
+                chunk = refs[i:i + 500]
+                rows = {r.order_reference: r for r in db.query(OrderUsage).filter(OrderUsage.order_reference.in_(chunk))}
+                for ref in chunk:
+                    row = rows.get(ref)
+                    if row is None:
+                        row = OrderUsage(order_reference=ref, errors=0)
+                        db.add(row)
+                    if row.last_viewed_at is None or row.last_viewed_at < viewed[ref]:
+                        row.last_viewed_at = viewed[ref]
+                    self._schedule(row, now)
+            db.commit()
+            return len(refs)
+        except Exception:
+            db.rollback()
+            return 0
+        finally:
+            db.close()
+
+    def get_fresh(self, ref: str) -> Optional[Dict[str, Any]]:
+        """USAGE_FRESH_SECONDS 内拉取过的用量（不改变调度）。"""
+        if not ref or self.fresh_seconds <= 0:
+            return None
+        db = SessionLocal()
+        try:
+            row = db.get(OrderUsage, ref)
+            if row is None or not row.payload or row.fetched_at is None:
+                return None
+            if (datetime.utcnow() - row.fetched_at).total_seconds() > self.fresh_seconds:
+                return None
+            return json.loads(row.payload)
+        except Exception:
+            return None
+        finally:
+            db.close()
+
+    def put(self, ref: str, usage: Dict[str, Any]) -> None:
+        """写入一次上游 consumption 结果并重新计算下次刷新时间。"""
+        if not ref or not usage:
+            return
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            row = db.get(OrderUsage, ref)
+            if row is None:
+                row = OrderUsage(order_reference=ref, errors=0)
+                db.add(row)
+            self._fill(row, usage, now)
+            self._schedule(row, now)
+            db.commit()
+        except Exception:
+            db.rollback()
+        finally:
+            db.close()
+
+    def _failed(self, ref: str) -> None:
+        db = SessionLocal()
+        try:
+            row = db.get(OrderUsage, ref)
+            if row is not None:
+                row.errors = (row.errors or 0) + 1
+                row.next_refresh_at = datetime.utcnow() + timedelta(seconds=min(3600, 30 * 2 ** min(row.errors, 7)))
+                db.commit()
+        except Exception:
+            db.rollback()
+        finally:
+            db.close()
+
+    # ===== 后台刷新 =====
+    def _refresh_one(self, ref: str) -> bool:
+        try:
+            usage = self.provider.get_order_consumption_v2(order_reference=ref)
+        except Exception:
+            usage = None
+        if not usage:
+            self.fetch_errors += 1
+            self._failed(ref)
+            return False
+        self.put(ref, usage)
+        self.refreshed += 1
+        return True
+
+    def due(self, limit: int) -> List[str]:
+        db = SessionLocal()
+        try:
+            q = (
+                db.query(OrderUsage.order_reference)
+                .filter(OrderUsage.next_refresh_at.isnot(None), OrderUsage.next_refresh_at <= datetime.utcnow())
+                .order_by(OrderUsage.priority, OrderUsage.next_refresh_at)
+                .limit(limit)
+            )
+            return [r[0] for r in q]
+        finally:
+            db.close()
+
+    def refresh_due(self, limit: Optional[int] = None) -> int:
+        """拉取一批到期条目（按优先级）；返回成功刷新数。"""
+        if not self._tick_lock.acquire(blocking=False):
+            return 0
+        t0 = time.time()
+        try:
+            self.flush_viewed()
+            refs = self.due(limit or self.batch)
+            if not refs:
+                return 0
+            # 共享上游线程池（后台任务，占用线程数受 UPSTREAM_BACKGROUND_WORKERS 限制）；
+            # 并发由 UpstreamLimiter 的 /orders/consumption 预算约束。限速令牌在本线程等待，
+            # 不让池内线程 sleep；本轮拿不到令牌的条目保持到期，下一轮再取
+            ex = upstream_executor()
+            futs = []
+            for r in refs:
+                if not self.limiter.acquire(timeout=self.tick):
+                    self.rate_limited += len(refs) - len(futs)
+                    break
+                futs.append(ex.submit(self._refresh_one, r, background=True))
+            wait(futs)
+            return sum(1 for f in futs if not f.exception() and f.result())
+        finally:
+            self.last_tick_ms = int((time.time() - t0) * 1000)
+            self._tick_lock.release()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.tick):
+            try:
+                self.refresh_due()
+            except Exception:
+                pass
+
+    def start(self) -> None:
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="usage-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        tracked: Dict[str, int] = {}
+        due = 0
+        oldest_due = None
+        db = SessionLocal()
+        try:
+            for prio, n in db.query(OrderUsage.priority, func.count()).group_by(OrderUsage.priority):
+                tracked[str(prio)] = int(n)
+            now = datetime.utcnow()
+            dq = db.query(func.count(), func.min(OrderUsage.next_refresh_at)).filter(
+                OrderUsage.next_refresh_at.isnot(None), OrderUsage.next_refresh_at <= now
+            ).one()
+            due = int(dq[0] or 0)
+            oldest_due = int((now - dq[1]).total_seconds()) if dq[1] else None
+        except Exception:
+            pass
+        finally:
+            db.close()
+        return {
+            "enabled": self.enabled,
+            "trackedByPriority": tracked,
+            "due": due,
+            "maxLagSeconds": oldest_due,
+            "reads": self.reads,
+            "readHits": self.read_hits,
+            "readExpired": self.read_expired,
+            "viewedPending": len(self._viewed),
+            "viewedDropped": self.viewed_dropped,
+            "refreshed": self.refreshed,
+            "fetchErrors": self.fetch_errors,
+            "rateLimited": self.rate_limited,
+            "lastTickMs": self.last_tick_ms,
+        }
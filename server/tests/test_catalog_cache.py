@@ -0,0 +1,166 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+
+class _SlowProvider:
+    """Counts upstream calls; each call takes `delay` seconds."""
+
+    def __init__(self, delay: float = 0.1):
+        self.delay = delay
+        self.calls = 0
+        self.fail = False
+        self._lock = threading.Lock()
+
+    def _hit(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream down")
+
+    def get_bundle_list(self, **kwargs):
+        self._hit()
+        return {"bundles": [{"bundle_code": f"B{self.calls}"}], "bundles_count": 1}
+
+    def get_bundle_networks_v2(self, **kwargs):
+        self._hit()
+        return {"networks": [{"country_code": "HKG", "operator_list": ["CSL"]}], "networks_count": 1}
+
+    def get_countries(self, request_id=None):
+        self._hit()
+        return [{"iso2_code": "HK", "iso3_code": "HKG", "country_name": "Hong Kong"}]
+
+    def get_regions(self, request_id=None):
+        self._hit()
+        return [{"region_code": "as", "region_name": "Asia"}]
+
+
+class TestCatalogCache(unittest.TestCase):
+    def _service(self, **provider_kwargs):
+        from server.app.services.catalog_service import CatalogService  # type: ignore
+        provider = _SlowProvider(**provider_kwargs)
+        return CatalogService(provider=provider), provider
+
+    def _concurrently(self, fn, n=10):
+        out = []
+        threads = [threading.Thread(target=lambda: out.append(fn())) for _ in range(n)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return out
+
+    def test_bundle_list_miss_is_coalesced(self):
+        svc, provider = self._service()
+        out = self._concurrently(lambda: svc.bundle_list(page_number=1, page_size=10, country_code="HK"))
+        self.assertEqual(provider.calls, 1)
+        self.assertEqual(len({r["bundles"][0]["bundle_code"] for r in out}), 1)
+
+    def test_countries_and_networks_miss_are_coalesced(self):
+        svc, provider = self._service()
+        self._concurrently(lambda: svc.get_countries_alias())
+        self.assertEqual(provider.calls, 1)
+        self._concurrently(lambda: svc.get_bundle_networks_v2("HKG_1"))
+        self.assertEqual(provider.calls, 2)
+
+    def _expire(self, svc, key):
+        entry = svc._entries[key]
+        entry.expires_at = time.time() - 1
+
+    def test_expired_entry_served_while_revalidating(self):
+        svc, provider = self._service(delay=0.2)
+        first = svc.bundle_list(page_number=1, page_size=10)
+        key = next(k for k in svc._entries if k.startswith("bundles:list:"))
+        self._expire(svc, key)
+        t0 = time.perf_counter()
+        stale = svc.bundle_list(page_number=1, page_size=10)
+        self.assertLess(time.perf_counter() - t0, 0.1)
+        self.assertEqual(stale["bundles"], first["bundles"])
+        deadline = time.time() + 2
+        while provider.calls < 2 and time.time() < deadline:
+            time.sleep(0.02)
+        time.sleep(0.3)
+        fresh = svc.bundle_list(page_number=1, page_size=10)
+        self.assertEqual(provider.calls, 2)
+        self.assertNotEqual(fresh["bundles"], first["bundles"])
+        self.assertEqual(svc.cache_stats()["staleServed"], 1)
+
+    def test_stale_served_on_upstream_error(self):
+        svc, provider = self._service(delay=0)
+        first = svc.get_regions_alias()
+        self._expire(svc, "regions:alias:v1")
+        svc._max_stale_seconds = 0
+        provider.fail = True
+        self.assertEqual(svc.get_regions_alias(), first)
+        self.assertEqual(svc.cache_stats()["staleOnError"], 1)
+        svc._stale_if_error = False
+        with self.assertRaises(RuntimeError):
+            svc.get_regions_alias()
+
+    def test_stale_if_error_outlives_max_stale(self):
+        svc, provider = self._service(delay=0)
+        svc._list_ttl_seconds = 10
+        svc._max_stale_seconds = 10
+        first = svc.get_regions_alias()
+        provider.fail = True
+        later = time.time() + 60
+        # 超过 ttl + max-stale 后上游失败：仍返回最后一次成功的值
+        with mock.patch("server.app.cache.time") as fake_time, mock.patch.object(svc, "_now", return_value=later):
+            fake_time.time.return_value = later
+            self.assertEqual(svc.get_regions_alias(), first)
+        self.assertEqual(svc.cache_stats()["staleOnError"], 1)
+        self.assertEqual(provider.calls, 2)
+
+
+class TestBoundedCache(unittest.TestCase):
+    def _cache(self, **kwargs):
+        from server.app.cache import BoundedCache  # type: ignore
+        return BoundedCache("test", **kwargs)
+
+    def test_lru_eviction_by_entries(self):
+        c = self._cache(max_entries=2)
+        c.set("a", 1)
+        c.set("b", 2)
+        self.assertEqual(c.get("a"), 1)  # a 变为最近使用
+        c.set("c", 3)
+        self.assertIsNone(c.get("b"))
+        self.assertEqual(c.keys(), ["a", "c"])
+        stats = c.stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_eviction_by_bytes(self):
+        c = self._cache(max_entries=100, max_bytes=300, sizeof=lambda v: len(v))
+        for i in range(5):
+            c.set(str(i), "x" * 100)
+        self.assertEqual(len(c), 3)
+        self.assertLessEqual(c.stats()["approxBytes"], 300)
+        self.assertNotIn("0", c)
+
+    def test_ttl_expiry(self):
+        c = self._cache(max_entries=10, ttl=60)
+        c.set("a", 1)
+        c.set("b", 2, ttl=-1)
+        self.assertEqual(c.get("a"), 1)
+        self.assertIsNone(c.get("b"))
+        self.assertEqual(c.stats()["expirations"], 1)
+
+    def test_catalog_entries_are_bounded(self):
+        import os
+        os.environ["CATALOG_CACHE_MAX_ENTRIES"] = "3"
+        try:
+            from server.app.services.catalog_service import CatalogService  # type: ignore
+            svc = CatalogService(provider=_SlowProvider(delay=0))
+        finally:
+            os.environ.pop("CATALOG_CACHE_MAX_ENTRIES", None)
+        for page in range(1, 6):
+            svc.bundle_list(page_number=page, page_size=10)
+        l1 = svc.cache_stats()["l1"]
+        self.assertEqual(l1["entries"], 3)
+        self.assertEqual(l1["evictions"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import time
+import unittest
+
+from server.tests.test_catalog_cache import _SlowProvider  # type: ignore
+
+
+class _FakeRedis:
+    """本地 Redis 替身：只实现 get / set / setex。"""
+
+    def __init__(self):
+        self.data = {}
+        self.down = False
+
+    def get(self, key):
+        if self.down:
+            raise ConnectionError("redis down")
+        item = self.data.get(key)
+        if item is None or item[1] <= time.time():
+            return None
+        return item[0]
+
+    def setex(self, key, ttl, value):
+        if self.down:
+            raise ConnectionError("redis down")
+        self.data[key] = (value, time.time() + ttl)
+
+    def set(self, key, value):
+        if self.down:
+            raise ConnectionError("redis down")
+        self.data[key] = (value, float("inf"))
+
+
+class TestCatalogRedisL2(unittest.TestCase):
+    def setUp(self):
+        from server.app.cache import RedisL2  # type: ignore
+        self.redis = _FakeRedis()
+        self.RedisL2 = RedisL2
+
+    def _worker(self):
+        from server.app.services.catalog_service import CatalogService  # type: ignore
+        provider = _SlowProvider(delay=0)
+        return CatalogService(provider=provider, l2=self.RedisL2(self.redis)), provider
+
+    def test_second_worker_hits_shared_cache(self):
+        w1, p1 = self._worker()
+        w2, p2 = self._worker()
+        first = w1.bundle_list(page_number=1, page_size=10, country_code="HK")
+        second = w2.bundle_list(page_number=1, page_size=10, country_code="HK")
+        self.assertEqual((p1.calls, p2.calls), (1, 0))
+        self.assertEqual(first, second)
+        self.assertEqual(w2.cache_stats()["l2"]["hits"], 1)
+
+    def test_dto_payloads_round_trip(self):
+        w1, _ = self._worker()
+        w2, p2 = self._worker()
+        self.assertEqual(w1.get_countries(), w2.get_countries())
+        self.assertEqual(w1.get_regions_alias(), w2.get_regions_alias())
+        self.assertEqual(p2.calls, 0)
+        self.assertEqual(type(w2.get_regions_alias()).__name__, "AliasRegionsDTO")
+
+    def test_stale_shared_entry_served_then_refreshed(self):
+        w1, _ = self._worker()
+        w1.get_bundle_networks_v2("HKG_1")
+        key, (blob, exp) = next(iter(self.redis.data.items()))
+        fetched_at, payload = self.RedisL2.decode(blob)
+        self.redis.data[key] = (self.RedisL2.encode(fetched_at - w1._list_ttl_seconds - 5, payload), exp)
+        w2, p2 = self._worker()
+        self.assertEqual(w2.get_bundle_networks_v2("HKG_1")["networks_count"], 1)
+        deadline = time.time() + 2
+        while p2.calls < 1 and time.time() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(p2.calls, 1)
+        self.assertEqual(w2.cache_stats()["staleServed"], 1)
+
+    def test_shared_entry_past_max_stale_kept_for_upstream_errors(self):
+        w1, _ = self._worker()
+        first = w1.get_regions_alias()
+        key, (blob, exp) = next(iter(self.redis.data.items()))
+        self.assertEqual(exp, float("inf"))
+        fetched_at, payload = self.RedisL2.decode(blob)
+        too_old = fetched_at - w1._list_ttl_seconds - w1._max_stale_seconds - 5
+        self.redis.data[key] = (self.RedisL2.encode(too_old, payload), exp)
+        w2, p2 = self._worker()
+        p2.fail = True
+        self.assertEqual(w2.get_regions_alias(), first)
+        # 返回旧值后还会触发一次后台刷新，它也可能失败并计数
+        self.assertGreaterEqual(w2.cache_stats()["staleOnError"], 1)
+
+    def test_redis_failure_falls_back_to_upstream(self):
+        w1, p1 = self._worker()
+        self.redis.down = True
+        w1.get_countries_alias()
+        self.assertEqual(p1.calls, 1)
+        stats = w1.cache_stats()["l2"]
+        self.assertEqual(stats["errors"], 1)
+        self.assertFalse(stats["available"])
+
+    def test_large_payloads_are_compressed(self):
+        payload = {"bundles": [{"bundle_code": f"B{i}", "bundle_name": "Hong Kong 1GB"} for i in range(200)]}
+        blob = self.RedisL2.encode(1.0, payload)
+        self.assertEqual(blob[:1], b"z")
+        self.assertEqual(self.RedisL2.decode(blob), (1.0, payload))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import unittest
+
+
+def _bundle(i):
+    cat = ["country", "region", "global"][i % 3]
+    return {
+        "bundle_code": f"B{i:03d}",
+        "bundle_name": f"Bundle {i:03d}",
+        "bundle_category": cat,
+        "country_code": ["HKG"] if i % 2 == 0 else ["FRA", "DEU"],
+        "region_code": "eu" if i % 2 else "",
+        "gprs_limit": (i % 5) + 1,
+        "data_unit": "GB" if i % 4 else "MB",
+        "bundle_price_final": float(100 - i),
+        "validity": 7,
+    }
+
+
+class _PagedProvider:
+    """Serves a fixed catalog through /bundle/list-style paging and counts calls."""
+
+    def __init__(self, n=25):
+        self.bundles = [_bundle(i) for i in range(n)]
+        self.calls = 0
+
+    def get_bundle_list(self, page_number, page_size, **kwargs):
+        self.calls += 1
+        start = (page_number - 1) * page_size
+        return {"bundles": self.bundles[start:start + page_size], "bundles_count": len(self.bundles)}
+
+
+class TestCatalogMirror(unittest.TestCase):
+    def setUp(self):
+        import os
+        os.environ["CATALOG_MIRROR_PAGE_SIZE"] = "10"
+        from server.app.db import Base, SessionLocal, engine  # type: ignore
+        from server.app.models.orm import CatalogBundle  # type: ignore
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        try:
+            db.query(CatalogBundle).delete()
+            db.commit()
+        finally:
+            db.close()
+        from server.app.services.catalog_mirror import BundleCatalogMirror  # type: ignore
+        self.provider = _PagedProvider()
+        self.mirror = BundleCatalogMirror(provider=self.provider)
+        os.environ.pop("CATALOG_MIRROR_PAGE_SIZE", None)
+
+    def test_sync_pages_through_catalog(self):
+        self.assertIsNone(self.mirror.query(1, 10))
+        self.assertEqual(self.mirror.sync(), 25)
+        self.assertEqual(self.provider.calls, 3)
+        self.assertEqual(self.mirror.stats()["lastChanges"]["added"], 25)
+
+    def test_local_filter_sort_and_paging(self):
+        self.mirror.sync()
+        res = self.mirror.query(1, 3, country_code="deu", region_code="EU", sort_by="price_asc")
+        expected = sorted([b for b in self.provider.bundles if "DEU" in b["country_code"]], key=lambda b: b["bundle_price_final"])
+        self.assertEqual(res["bundles_count"], len(expected))
+        self.assertEqual([b["bundle_code"] for b in res["bundles"]], [b["bundle_code"] for b in expected[:3]])
+        page2 = self.mirror.query(2, 10, bundle_category="country")
+        self.assertEqual(page2["bundles_count"], 9)
+        self.assertEqual(page2["bundles"], [])
+        self.assertEqual(self.mirror.query(1, 10, bundle_code="B007")["bundles"][0]["bundle_name"], "Bundle 007")
+        self.assertEqual(self.mirror.query(1, 10, bundle_code="B007", country_code="HKG")["bundles_count"], 0)
+
+    def test_incremental_sync_and_reload_from_db(self):
+        from server.app.services.catalog_mirror import BundleCatalogMirror  # type: ignore
+        self.mirror.sync()
+        self.provider.bundles[0]["bundle_price_final"] = 1.0
+        del self.provider.bundles[5]
+        self.mirror.sync()
+        self.assertEqual(self.mirror.stats()["lastChanges"]["removed"], 1)
+        self.assertGreaterEqual(self.mirror.stats()["lastChanges"]["updated"], 1)
+        restored = BundleCatalogMirror(provider=_PagedProvider(0))
+        self.assertTrue(restored.load_from_db())
+        self.assertEqual(restored.query(1, 100)["bundles_count"], 24)
+        self.assertEqual(restored.get("B000")["bundle_price_final"], 1.0)
+
+    def test_resync_selects_existing_rows_once(self):
+        from sqlalchemy import event
+        from server.app.db import engine  # type: ignore
+        self.mirror.sync()
+        self.provider.bundles[3]["bundle_price_final"] = 2.0
+        selects = []
+
+        def count(conn, cursor, statement, params, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT") and "catalog_bundles" in statement:
+                selects.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            self.mirror.sync()
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+        self.assertEqual(len(selects), 1)
+        self.assertEqual(self.mirror.stats()["lastChanges"], {"added": 0, "updated": 1, "removed": 0})
+
+    def test_mirror_is_off_by_default(self):
+        import os
+        from server.app.services.catalog_mirror import mirror_enabled  # type: ignore
+        saved = os.environ.pop("CATALOG_MIRROR_ENABLED", None)
+        try:
+            self.assertFalse(mirror_enabled())
+        finally:
+            if saved is not None:
+                os.environ["CATALOG_MIRROR_ENABLED"] = saved
+
+    def test_catalog_service_serves_from_mirror(self):
+        from server.app.services.catalog_service import CatalogService  # type: ignore
+        self.mirror.sync()
+        calls = self.provider.calls
+        svc = CatalogService(provider=self.provider, mirror=self.mirror)
+        res = svc.bundle_list(page_number=1, page_size=5, country_code="HKG", sort_by="data_dsc", q="bundle")
+        self.assertEqual(len(res["bundles"]), 5)
+        self.assertEqual(svc.get_bundle_by_code("B010").id, "B010")
+        self.assertEqual(self.provider.calls, calls)
+
+
+class TestBundleColumns(unittest.TestCase):
+    def test_matches_dict_filter_and_sort(self):
+        from server.app.provider.client import BUNDLE_SORTS, sort_bundles  # type: ignore
+        from server.app.services.bundle_index import BundleColumns  # type: ignore
+        bundles = [_bundle(i) for i in range(40)]
+        bundles[3]["unlimited"] = True
+        cols = BundleColumns(bundles)
+        filters = [
+            {},
+            {"country_code": "hkg"},
+            {"region_code": "EU"},
+            {"bundle_category": "region", "country_code": "FRA"},
+            {"bundle_code": "B004", "country_code": "HKG"},
+            {"bundle_code": "B004", "country_code": "FRA"},
+            {"bundle_category": "missing"},
+        ]
+
+        def reference(f):
+            out = bundles
+            if f.get("bundle_category"):
+                out = [b for b in out if b["bundle_category"] == f["bundle_category"].lower()]
+            if f.get("country_code"):
+                out = [b for b in out if f["country_code"].upper() in b["country_code"]]
+            if f.get("region_code"):
+                out = [b for b in out if b["region_code"] == f["region_code"].lower()]
+            if f.get("bundle_code"):
+                out = [b for b in out if b["bundle_code"] == f["bundle_code"]]
+            return out
+
+        for sort_by in [None, *BUNDLE_SORTS]:
+            for f in filters:
+                expected = [b["bundle_code"] for b in sort_bundles(reference(f), sort_by)]
+                got = [bundles[i]["bundle_code"] for i in cols.select(sort_by=sort_by, **f)]
+                self.assertEqual(got, expected, (sort_by, f))
+
+    def test_text_match(self):
+        from server.app.services.bundle_index import BundleColumns  # type: ignore
+        bundles = [_bundle(i) for i in range(10)]
+        cols = BundleColumns(bundles)
+        self.assertEqual(cols.match_text(range(10), " BUNDLE 00"), list(range(10)))
+        self.assertEqual(cols.match_text(range(10), "3 gb"), [2, 7])
+        # 字段间以分隔符隔开，不跨字段匹配
+        self.assertEqual(cols.match_text(range(10), "hkg1"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
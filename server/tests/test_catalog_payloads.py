@@ -0,0 +1,119 @@
+import os
+import unittest
+
+
+class TestLocalizedPayloadCache(unittest.TestCase):
+    def setUp(self):
+        from server.app.services.catalog_payloads import LocalizedPayloadCache  # type: ignore
+        self.cache = LocalizedPayloadCache()
+        self.calls = 0
+
+    def _build(self, value):
+        def build():
+            self.calls += 1
+            return value
+        return build
+
+    def test_built_once_per_version(self):
+        a = self.cache.get("countries", "en", "-", "v1", self._build([{"code": "HK", "name": "香港"}]))
+        b = self.cache.get("countries", "en", "-", "v1", self._build([{"code": "XX"}]))
+        self.assertIs(a, b)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(a.body, '[{"code":"HK","name":"香港"}]'.encode("utf-8"))
+        c = self.cache.get("countries", "en", "-", "v2", self._build([{"code": "XX"}]))
+        self.assertNotEqual(a.etag, c.etag)
+        self.assertEqual(self.calls, 2)
+
+    def test_warm_all_languages(self):
+        built = self.cache.warm("regions", ["en", "ja"], "-", "v1", lambda l: [{"code": "eu", "lang": l}])
+        self.assertEqual(built, 2)
+        self.assertEqual(self.cache.warm("regions", ["en", "ja"], "-", "v1", lambda l: []), 0)
+        p = self.cache.get("regions", "ja", "-", "v1", self._build([]))
+        self.assertIn(b'"ja"', p.body)
+        self.assertEqual(self.calls, 0)
+
+
+class TestCatalogPayloadRoutes(unittest.TestCase):
+    def setUp(self):
+        try:
+            from fastapi.testclient import TestClient  # type: ignore
+        except Exception:
+            self.skipTest("fastapi not installed")
+        os.environ["PROVIDER_FAKE"] = "true"
+        from server.app.main import app  # type: ignore
+        from server.app.db import Base, engine  # type: ignore
+        Base.metadata.create_all(bind=engine)
+        self.client = TestClient(app)
+
+    def test_countries_etag_and_304(self):
+        r1 = self.client.get("/catalog/countries", params={"lang": "en"})
+        self.assertEqual(r1.status_code, 200)
+        etag = r1.headers["ETag"]
+        r2 = self.client.get("/catalog/countries", params={"lang": "en"})
+        self.assertEqual((r2.headers["ETag"], r2.content), (etag, r1.content))
+        r3 = self.client.get("/catalog/countries", params={"lang": "en"}, headers={"If-None-Match": etag})
+        self.assertEqual(r3.status_code, 304)
+        self.assertEqual(r3.headers["ETag"], etag)
+
+    def test_not_modified_without_building_payload(self):
+        from server.app.main import catalog_payloads, catalog_service  # type: ignore
+        from server.app.services.catalog_payloads import versioned_etag  # type: ignore
+        _, version = catalog_service.get_regions_versioned()
+        etag = versioned_etag("regions", "ko", "-", version)
+        builds = catalog_payloads.builds
+        r = self.client.get("/catalog/regions", params={"lang": "ko"}, headers={"If-None-Match": f'W/"{etag}", "other"'})
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(catalog_payloads.builds, builds)
+        r = self.client.get("/catalog/regions", params={"lang": "ko"})
+        self.assertEqual((r.status_code, r.headers["ETag"]), (200, etag))
+
+    def test_networks_etag(self):
+        r1 = self.client.get("/catalog/bundles/hk-1/networks")
+        self.assertEqual(r1.json(), ["CSL", "HKT"])
+        r2 = self.client.get("/catalog/bundles/hk-1/networks", headers={"If-None-Match": r1.headers["ETag"]})
+        self.assertEqual(r2.status_code, 304)
+        self.assertEqual(self.client.get("/catalog/bundles/nope/networks").status_code, 404)
+
+    def test_bundle_list_does_not_mutate_source(self):
+        import copy
+        from server.app.main import catalog_service  # type: ignore
+        body = {"page_number": 1, "page_size": 5}
+        before = copy.deepcopy(catalog_service.bundle_list(page_number=1, page_size=5))
+        en = self.client.post("/bundle/list", json=body, params={"lang": "en"}).json()
+        self.assertEqual(en["code"], 200)
+        self.client.post("/bundle/list", json=body, params={"lang": "zh-Hans"})
+        self.assertEqual(catalog_service.bundle_list(page_number=1, page_size=5), before)
+        self.assertEqual(self.client.post("/bundle/list", json=body, params={"lang": "en"}).json(), en)
+
+
+    def _conditional(self, path, body, **params):
+        r1 = self.client.post(path, json=body, params=params)
+        self.assertEqual(r1.json()["code"], 200, path)
+        etag = r1.headers["ETag"]
+        self.assertIn("max-age", r1.headers["Cache-Control"])
+        r2 = self.client.post(path, json=body, params=params, headers={"If-None-Match": etag})
+        self.assertEqual(r2.status_code, 304, path)
+        return r1
+
+    def test_alias_routes_conditional(self):
+        listing = self._conditional("/bundle/list", {"page_number": 1, "page_size": 5}, lang="en")
+        other = self.client.post("/bundle/list", json={"page_number": 2, "page_size": 5}, params={"lang": "en"})
+        self.assertNotEqual(other.headers["ETag"], listing.headers["ETag"])
+        code = listing.json()["data"]["bundles"][0]["bundle_code"]
+        self._conditional("/bundle/detail-by-code", {"bundle_code": code}, lang="en")
+        self._conditional("/bundle/networks", {"bundle_code": code})
+        self._conditional("/bundle/countries", {}, lang="en")
+        self._conditional("/bundle/regions", {}, lang="en")
+        missing = self.client.post("/bundle/detail-by-code", json={"bundle_code": "NOPE"})
+        self.assertNotIn("ETag", missing.headers)
+
+    def test_alias_countries_do_not_mutate_cache(self):
+        from server.app.main import catalog_service  # type: ignore
+        before = catalog_service.get_countries_alias().model_dump()
+        zh = self.client.post("/bundle/countries", json={}, params={"lang": "zh-Hans"}).json()
+        self.assertEqual(zh["data"]["countries_count"], before["countries_count"])
+        self.assertEqual(catalog_service.get_countries_alias().model_dump(), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+
+try:
+    from fastapi.testclient import TestClient  # type: ignore
+except Exception:
+    TestClient = None
+
+
+class TestI18nSnapshot(unittest.TestCase):
+    def setUp(self):
+        if TestClient is None:
+            self.skipTest("fastapi not installed")
+        import os
+        os.environ["PROVIDER_FAKE"] = "true"
+        from server.app.main import app  # type: ignore
+        from server.app.db import Base, engine  # type: ignore
+        Base.metadata.create_all(bind=engine)
+        self.client = TestClient(app)
+
+    def test_upsert_swaps_snapshot(self):
+        from server.app import i18n  # type: ignore
+        v0 = i18n.translations_version()
+        r = self.client.post("/i18n/countries/upsert", json={"items": [
+            {"iso2_code": "ZZ", "iso3_code": "ZZZ", "lang_code": "en", "name": "Snapshot Land"},
+        ]})
+        self.assertEqual(r.status_code, 200)
+        self.assertGreater(i18n.translations_version(), v0)
+        self.assertEqual(i18n.translate_country("ZZ", None, "en"), "Snapshot Land")
+        self.assertEqual(i18n.translate_country("ZZZ", None, "en"), "Snapshot Land")
+        r = self.client.post("/i18n/countries/upsert", json={"items": [
+            {"iso2_code": "ZZ", "iso3_code": "ZZZ", "lang_code": "en", "name": "Snapshot Land 2"},
+        ]})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(i18n.translate_country("ZZ", None, "en"), "Snapshot Land 2")
+
+    def test_region_and_bundle_lookup(self):
+        from server.app import i18n  # type: ignore
+        self.client.post("/i18n/regions/upsert", json={"items": [
+            {"region_code": "zq", "lang_code": "ja", "name": "テスト地域"},
+        ]})
+        self.client.post("/i18n/bundles/upsert", json={"items": [
+            {"bundle_code": "SNAPSHOT_TEST_1", "lang_code": "ja", "marketing_name": "テスト", "name": "テスト 1GB 7日"},
+        ]})
+        self.assertEqual(i18n.translate_region("zq", None, "ja"), "テスト地域")
+        self.assertEqual(i18n.translate_marketing("Test", "ja", "SNAPSHOT_TEST_1"), "テスト")
+        self.assertEqual(i18n.translate_bundle_name("Test", "ja", "SNAPSHOT_TEST_1"), "テスト 1GB 7日")
+
+    def test_territory_tables(self):
+        try:
+            import babel  # type: ignore  # noqa: F401
+        except Exception:
+            self.skipTest("babel not installed")
+        from server.app import i18n  # type: ignore
+        i18n.load_territory_tables()
+        self.assertEqual(i18n.territory_name("DE", "ja"), "ドイツ")
+        self.assertEqual(i18n.territory_code("ドイツ", "ja"), "DE")
+        self.assertEqual(i18n.territory_code(" france ", "en"), "FR")
+        self.assertEqual(i18n.translate_marketing("Germany 5GB", "ja"), "ドイツ")
+
+
+    def test_country_code_table_and_query_expansion(self):
+        from server.app import i18n  # type: ignore
+        from server.app.services import search_index  # type: ignore
+        codes = i18n.country_code_table()
+        self.assertEqual(codes.iso3("hk"), "HKG")
+        self.assertEqual(codes.iso2("ABW"), "AW")
+        self.assertEqual(codes.code_for_name("Aruba"), "AW")
+        # 查询扩展只读内存表，不再打开 DB 会话
+        import server.app.db as db  # type: ignore
+        real = db.SessionLocal
+        db.SessionLocal = None
+        try:
+            variants = [v for v, _ in search_index.expand_query("hk", "en")]
+        finally:
+            db.SessionLocal = real
+        self.assertIn("hkg", variants)
+        self.assertIn("aw", [v for v, _ in search_index.expand_query("aruba", "en")])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import unittest
+
+
+def _order(i, email="someone@example.com"):
+    return {
+        "order_id": f"OID{i:04d}",
+        "order_reference": f"REF{i:04d}",
+        "client_email": email,
+        "bundle_code": "HKG_1GB" if i % 2 else "JPN_3GB",
+        "iccid": f"8900{i:04d}",
+        "bundle_name": "Bundle",
+        "reseller_retail_price": 3.5,
+        "currency_code": "GBP",
+        "created_at": 1714550000 + i * 60,
+        "order_status": "Successful",
+    }
+
+
+class _ListProvider:
+    """Serves /orders/list from a fixed set (newest first) and records the filters of every call."""
+
+    def __init__(self, orders):
+        self.orders = sorted(orders, key=lambda o: o["created_at"], reverse=True)
+        self.calls = []
+
+    def list_orders_v2(self, page_number, page_size, filters=None, request_id=None):
+        filters = {k: v for k, v in (filters or {}).items() if v}
+        self.calls.append(filters)
+        rows = self.orders
+        if filters.get("order_reference"):
+            rows = [o for o in rows if o["order_reference"] == filters["order_reference"]]
+        if filters.get("order_id"):
+            rows = [o for o in rows if o["order_id"] == filters["order_id"]]
+        start = (page_number - 1) * page_size
+        return {"orders": rows[start:start + page_size], "orders_count": len(rows)}
+
+    def get_order_consumption_v2(self, order_reference, request_id=None):
+        return {"order": {"order_reference": order_reference, "data_remaining": 100}}
+
+
+class TestUserOrderIndex(unittest.TestCase):
+    def setUp(self):
+        from server.app.db import Base, SessionLocal, engine  # type: ignore
+        from server.app.models.orm import OrderReferenceEmail, User, UserOrder  # type: ignore
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        try:
+            db.query(UserOrder).delete()
+            db.query(OrderReferenceEmail).filter(OrderReferenceEmail.order_reference.like("REF%")).delete(synchronize_session=False)
+            for uid in ("u1", "u2"):
+                if db.get(User, uid) is None:
+                    db.add(User(id=uid, name=uid))
+            db.flush()
+            # u1 owns the even orders through the reference mapping table
+            for i in range(0, 30, 2):
+                db.add(OrderReferenceEmail(order_reference=f"REF{i:04d}", user_id="u1", provider_order_id=f"OID{i:04d}"))
+            db.commit()
+        finally:
+            db.close()
+        from server.app.services.order_index import UserOrderIndex  # type: ignore
+        from server.app.services.order_service import OrderService  # type: ignore
+        self.provider = _ListProvider([_order(i) for i in range(40)])
+        self.index = UserOrderIndex()
+        self.service = OrderService(provider=self.provider, index=self.index)
+
+    def _query(self, **kw):
+        from server.app.models.dto import OrdersListQuery  # type: ignore
+        params = {"page_number": 1, "page_size": 10}
+        params.update(kw)
+        return OrdersListQuery(**params)
+
+    def test_pages_from_index_with_real_total(self):
+        self.index.ingest(self.provider.orders)
+        self.provider.calls.clear()
+        res = self.service.orders_list_v2(self._query(), user_id="u1")
+        self.assertEqual(res["orders_count"], 15)
+        refs = [o["order_reference"] for o in res["orders"]]
+        self.assertEqual(refs, [f"REF{i:04d}" for i in range(28, 8, -2)])
+        self.assertEqual(self.provider.calls, [])
+        page2 = self.service.orders_list_v2(self._query(page_number=2), user_id="u1")
+        self.assertEqual([o["order_reference"] for o in page2["orders"]], [f"REF{i:04d}" for i in range(8, -2, -2)])
+
+    def test_seeded_refs_are_fetched_once_and_written_back(self):
+        res = self.service.orders_list_v2(self._query(), user_id="u1")
+        self.assertEqual(res["orders_count"], 15)
+        self.assertTrue(all(c.get("order_reference") for c in self.provider.calls))
+        self.assertLessEqual(len(self.provider.calls), 15)
+        self.assertEqual([o["order_reference"] for o in res["orders"]], [f"REF{i:04d}" for i in range(28, 8, -2)])
+        self.service._ref_item_cache.clear()
+        self.provider.calls.clear()
+        again = self.service.orders_list_v2(self._query(), user_id="u1")
+        self.assertEqual(again["orders"], res["orders"])
+        self.assertEqual(self.provider.calls, [])
+
+    def test_seeded_refs_match_bundle_and_iccid_filters(self):
+        res = self.service.orders_list_v2(self._query(bundle_code="JPN_3GB", page_size=50), user_id="u1")
+        self.assertEqual(res["orders_count"], 15)
+        self.provider.calls.clear()
+        res = self.service.orders_list_v2(self._query(iccid="89000006"), user_id="u1")
+        self.assertEqual([o["order_reference"] for o in res["orders"]], ["REF0006"])
+        self.assertEqual(self.provider.calls, [])
+
+    def test_user_orders_removed_with_account(self):
+        from server.app.db import SessionLocal  # type: ignore
+        from server.app.models.orm import UserOrder  # type: ignore
+        from server.app.services.auth_service import AuthService  # type: ignore
+        self.index.record("REF9100", "u2", email="u2@example.com")
+        AuthService().delete_account("u2", None)
+        db = SessionLocal()
+        try:
+            self.assertIsNone(db.get(UserOrder, "REF9100"))
+        finally:
+            db.close()
+
+    def test_filters(self):
+        self.index.ingest(self.provider.orders)
+        res = self.service.orders_list_v2(self._query(bundle_code="JPN_3GB", page_size=50), user_id="u1")
+        self.assertEqual(res["orders_count"], 15)
+        res = self.service.orders_list_v2(self._query(order_id="OID0004"), user_id="u1")
+        self.assertEqual([o["order_reference"] for o in res["orders"]], ["REF0004"])
+        res = self.service.orders_list_v2(self._query(order_id="OID0005"), user_id="u1")
+        self.assertEqual(res["orders_count"], 0)
+        # 1714550000 + 10 * 60 = 2024/05/01 08:03:20 UTC
+        res = self.service.orders_list_v2(self._query(start_date="2024/05/01 08:03:20", page_size=50), user_id="u1")
+        self.assertEqual(res["orders_count"], 10)
+
+    def test_unknown_user_falls_back_to_upstream_filter(self):
+        res = self.service.orders_list_v2(self._query(page_size=50), user_email="someone@example.com", user_id="u2")
+        self.assertEqual(len(res["orders"]), 40)
+        self.assertEqual(self.provider.calls[0], {})
+
+    def test_normalized_and_with_usage_use_index(self):
+        from server.app.models.dto import OrdersListWithUsageQuery  # type: ignore
+        self.index.ingest(self.provider.orders)
+        self.provider.calls.clear()
+        res = self.service.orders_list_with_usage(OrdersListWithUsageQuery(page_number=1, page_size=10), user_id="u1", max_usage=0)
+        self.assertEqual(res["orders_count"], 15)
+        self.assertEqual([it["order"].id for it in res["items"]], [f"OID{i:04d}" for i in range(28, 8, -2)])
+        self.assertEqual(self.provider.calls, [])
+
+    def test_record_on_assign_and_stats(self):
+        self.assertTrue(self.index.record("REF9000", "u1", email="A@B.com", provider_order_id="OID9000", bundle_code="X"))
+        self.assertFalse(self.index.record("REF9001", None, provider_order_id="OID9001"))
+        rows, total = self.index.page("u1", 1, 50, order_reference="REF9000")
+        self.assertEqual(total, 1)
+        self.assertEqual(rows[0].stub["client_email"], "a@b.com")
+        self.assertIsNone(rows[0].item)
+        self.assertGreaterEqual(self.index.stats()["recorded"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+import calendar
+import unittest
+from datetime import datetime, timedelta
+
+
+def _ts(dt):
+    return calendar.timegm(dt.timetuple())
+
+
+class _DatedProvider:
+    """/orders/list with start_date/end_date filtering and paging; detail lookups are counted."""
+
+    def __init__(self, orders):
+        self.orders = sorted(orders, key=lambda o: o["created_at"], reverse=True)
+        self.calls = []
+        self.detail_calls = 0
+
+    def list_orders_v2(self, page_number, page_size, filters=None, request_id=None):
+        f = {k: v for k, v in (filters or {}).items() if v}
+        self.calls.append(f)
+        rows = self.orders
+        if f.get("start_date"):
+            lo = _ts(datetime.strptime(f["start_date"], "%Y/%m/%d %H:%M:%S"))
+            rows = [o for o in rows if o["created_at"] >= lo]
+        if f.get("end_date"):
+            hi = _ts(datetime.strptime(f["end_date"], "%Y/%m/%d %H:%M:%S"))
+            rows = [o for o in rows if o["created_at"] <= hi]
+        start = (page_number - 1) * page_size
+        return {"orders": rows[start:start + page_size], "orders_count": len(rows)}
+
+    def get_order_detail_v2(self, order_reference, request_id=None):
+        self.detail_calls += 1
+        return {}
+
+
+class TestOrderReconciler(unittest.TestCase):
+    def setUp(self):
+        from server.app.db import Base, SessionLocal, engine  # type: ignore
+        from server.app.models.orm import Order, OrderReferenceEmail, SyncCursor, User, UserOrder  # type: ignore
+        Base.metadata.create_all(bind=engine)
+        self.now = datetime.utcnow().replace(microsecond=0)
+        db = SessionLocal()
+        try:
+            db.query(SyncCursor).delete()
+            db.query(UserOrder).delete()
+            db.query(OrderReferenceEmail).filter(OrderReferenceEmail.user_id.in_(["rc1", "rc2"])).delete(synchronize_session=False)
+            db.query(Order).filter(Order.user_id.in_(["rc1", "rc2"])).delete(synchronize_session=False)
+            for uid, email in (("rc1", None), ("rc2", "rc2@example.com")):
+                if db.get(User, uid) is None:
+                    db.add(User(id=uid, name=uid, email=email))
+            db.flush()
+            # rc1: local orders whose reference (first 30 chars of the id) was sent upstream
+            self.local_ids = []
+            for i in range(6):
+                oid = f"{i:02d}" + "a" * 30
+                self.local_ids.append(oid)
+                db.add(Order(id=oid, user_id="rc1", bundle_id="B", amount=1.0, created_at=self.now - timedelta(days=2, hours=i)))
+            db.commit()
+        finally:
+            db.close()
+        orders = []
+        for i, lid in enumerate(self.local_ids):
+            orders.append({"order_id": f"RC-OID-{i}", "order_reference": lid[:30], "client_email": "", "created_at": _ts(self.now - timedelta(days=2, hours=i))})
+        # rc2 is matched by client email; the rest belong to nobody we know
+        for i in range(4):
+            orders.append({"order_id": f"RC-OID-E{i}", "order_reference": f"RC-E-{i}", "client_email": "RC2@example.com", "created_at": _ts(self.now - timedelta(days=1, minutes=i))})
+        for i in range(30):
+            orders.append({"order_id": f"RC-OID-X{i}", "order_reference": f"RC-X-{i}", "client_email": "stranger@example.com", "created_at": _ts(self.now - timedelta(hours=3, minutes=i))})
+        self.provider = _DatedProvider(orders)
+        from server.app.services.order_service import OrderService  # type: ignore
+        self.service = OrderService(provider=self.provider)
+        self.rec = self.service.reconciler
+        self.rec.page_size = 10
+        self.rec.window = timedelta(days=1)
+        self.rec.lookback = timedelta(days=5)
+
+    def _mappings(self, uid):
+        from server.app.db import SessionLocal  # type: ignore
+        from server.app.models.orm import OrderReferenceEmail  # type: ignore
+        db = SessionLocal()
+        try:
+            return {m.order_reference: m.provider_order_id for m in db.query(OrderReferenceEmail).filter(OrderReferenceEmail.user_id == uid)}
+        finally:
+            db.close()
+
+    def _backfilled(self):
+        from server.app.db import SessionLocal  # type: ignore
+        from server.app.models.orm import Order  # type: ignore
+        db = SessionLocal()
+        try:
+            return {r.id: r.provider_order_id for r in db.query(Order).filter(Order.user_id == "rc1")}
+        finally:
+            db.close()
+
+    def test_run_once_maps_backfills_and_persists_cursor(self):
+        seen = self.rec.run_once()
+        # window bounds are inclusive, so an order on a boundary may be read twice (writes are idempotent)
+        self.assertGreaterEqual(seen, 40)
+        self.assertEqual(self._mappings("rc1"), {lid[:30]: f"RC-OID-{i}" for i, lid in enumerate(self.local_ids)})
+        self.assertEqual(set(self._mappings("rc2")), {f"RC-E-{i}" for i in range(4)})
+        self.assertEqual(self._backfilled(), {lid: f"RC-OID-{i}" for i, lid in enumerate(self.local_ids)})
+        stats = self.rec.stats()
+        self.assertEqual(stats["mappingsCreated"], 10)
+        self.assertEqual(stats["unmatched"], 30)
+        self.assertLessEqual(stats["lagSeconds"], 5)
+        # the 30 orders inside one window exceed max_pages * page_size -> window is halved
+        self.rec.max_pages = 2
+        from server.app.db import SessionLocal  # type: ignore
+        from server.app.models.orm import SyncCursor  # type: ignore
+        db = SessionLocal()
+        try:
+            db.query(SyncCursor).delete()
+            db.commit()
+        finally:
+            db.close()
+        self.rec.run_once()
+        self.assertGreaterEqual(self.rec.stats()["splitWindows"], 1)
+
+    def test_next_run_resumes_from_cursor_with_overlap(self):
+        self.rec.run_once()
+        resume_from = (self.rec.cursor - self.rec.overlap).strftime("%Y/%m/%d %H:%M:%S")
+        self.provider.calls.clear()
+        self.rec.run_once()
+        self.assertEqual(min(c["start_date"] for c in self.provider.calls), resume_from)
+        self.assertEqual(self.rec.stats()["mappingsCreated"], 10)
+
+    def test_init_mappings_queues_range_for_worker(self):
+        res = self.service.init_mappings_for_user("rc1")
+        self.assertEqual(res, {"checked": 6, "updated": 0, "queued": 1})
+        # nothing is scanned on the request thread
+        self.assertEqual(self.provider.calls, [])
+        self.assertEqual(self.rec.stats()["pendingRanges"], 1)
+        self.rec._drain_pending()
+        self.assertEqual(self.provider.detail_calls, 0)
+        self.assertTrue(all(c.get("start_date") and c.get("end_date") for c in self.provider.calls))
+        self.assertEqual(self._backfilled(), {lid: f"RC-OID-{i}" for i, lid in enumerate(self.local_ids)})
+        self.assertEqual(self.rec.stats()["pendingRanges"], 0)
+        self.assertEqual(self.service.init_mappings_for_user("rc1"), {"checked": 6, "updated": 0, "queued": 0})
+
+    def test_queued_ranges_merge_and_resume(self):
+        self.rec.max_windows = 1
+        self.rec.window = timedelta(hours=1)
+        self.assertTrue(self.rec.enqueue_range(self.now - timedelta(hours=5), self.now - timedelta(hours=3)))
+        self.assertTrue(self.rec.enqueue_range(self.now - timedelta(hours=4), self.now - timedelta(hours=2)))
+        self.assertEqual(self.rec._pending, [(self.now - timedelta(hours=5), self.now - timedelta(hours=2))])
+        self.rec._drain_pending()
+        self.assertEqual(self.rec._pending, [(self.now - timedelta(hours=4), self.now - timedelta(hours=2))])
+
+    def test_cursor_sweep_needs_lease(self):
+        from server.app.db import SessionLocal  # type: ignore
+        from server.app.models.orm import SyncCursor  # type: ignore
+        db = SessionLocal()
+        try:
+            db.add(SyncCursor(name=self.rec.CURSOR_NAME, lease_owner="other-worker", lease_until=datetime.utcnow() + timedelta(minutes=5)))
+            db.commit()
+        finally:
+            db.close()
+        self.assertEqual(self.rec.run_once(), 0)
+        self.assertEqual(self.provider.calls, [])
+        self.assertEqual(self.rec.stats()["leaseSkipped"], 1)
+        # an expired lease is taken over, and released after the sweep
+        db = SessionLocal()
+        try:
+            db.get(SyncCursor, self.rec.CURSOR_NAME).lease_until = datetime.utcnow() - timedelta(seconds=1)
+            db.commit()
+        finally:
+            db.close()
+        self.assertGreaterEqual(self.rec.run_once(), 40)
+        db = SessionLocal()
+        try:
+            row = db.get(SyncCursor, self.rec.CURSOR_NAME)
+            self.assertIsNotNone(row.cursor)
+            self.assertIsNone(row.lease_owner)
+        finally:
+            db.close()
+
+    def test_indexes_mapped_orders(self):
+        self.rec.run_once()
+        rows, total = self.service.index.page("rc2", 1, 10)
+        self.assertEqual(total, 4)
+        self.assertTrue(all(r.item for r in rows))
+
+
+if __name__ == "__main__":
+    unittest.main()
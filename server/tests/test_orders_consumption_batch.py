@@ -0,0 +1,159 @@
+import calendar
+import json
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+
+
+class _BatchProvider:
+    """Counts /orders/list (by filter kind) and /orders/consumption calls."""
+
+    def __init__(self, orders, delay=0.0):
+        self.orders = orders
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.list_calls = []
+        self.consumption_calls = []
+
+    def list_orders_v2(self, page_number, page_size, filters=None, request_id=None):
+        f = {k: v for k, v in (filters or {}).items() if v}
+        with self.lock:
+            self.list_calls.append(f)
+        rows = self.orders
+        if f.get("order_id"):
+            rows = [o for o in rows if o["order_id"] == f["order_id"]]
+        if f.get("start_date"):
+            lo = calendar.timegm(datetime.strptime(f["start_date"], "%Y/%m/%d %H:%M:%S").timetuple())
+            rows = [o for o in rows if o["created_at"] >= lo]
+        start = (page_number - 1) * page_size
+        return {"orders": rows[start:start + page_size], "orders_count": len(rows)}
+
+    def get_order_consumption_v2(self, order_reference, request_id=None):
+        with self.lock:
+            self.consumption_calls.append(order_reference)
+        if self.delay:
+            time.sleep(self.delay)
+        return {"plan_status": "Active", "data_remaining": 100.0, "data_allocated": 1024.0}
+
+
+class TestConsumptionBatch(unittest.TestCase):
+    def setUp(self):
+        from server.app.db import Base, SessionLocal, engine  # type: ignore
+        from server.app.models.orm import OrderReferenceEmail, OrderUsage, User  # type: ignore
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        try:
+            db.query(OrderUsage).delete()
+            db.query(OrderReferenceEmail).filter(OrderReferenceEmail.order_reference.like("CB-%")).delete(synchronize_session=False)
+            if db.get(User, "cb1") is None:
+                db.add(User(id="cb1", name="cb1", email="cb1@example.com"))
+            db.flush()
+            # ids 0-9 are already mapped locally
+            for i in range(10):
+                db.add(OrderReferenceEmail(order_reference=f"CB-REF-{i}", provider_order_id=f"CB-OID-{i}", user_id="cb1"))
+            db.commit()
+        finally:
+            db.close()
+        now = datetime.utcnow()
+        recent = [
+            {"order_id": f"CB-OID-{i}", "order_reference": f"CB-REF-{i}", "client_email": "cb1@example.com", "created_at": calendar.timegm((now - timedelta(days=1)).timetuple())}
+            for i in range(20)
+        ]
+        old = [{"order_id": "CB-OID-OLD", "order_reference": "CB-REF-OLD", "created_at": calendar.timegm((now - timedelta(days=400)).timetuple())}]
+        self.provider = _BatchProvider(recent + old)
+        from server.app.services.order_service import OrderService  # type: ignore
+        self.service = OrderService(provider=self.provider)
+
+    def _body(self, ids=None, refs=None):
+        from server.app.models.dto import OrdersConsumptionBatchQuery  # type: ignore
+        return OrdersConsumptionBatchQuery(order_ids=ids, order_references=refs)
+
+    def test_ids_resolved_locally_then_one_scan(self):
+        ids = [f"CB-OID-{i}" for i in range(20)]
+        res = self.service.orders_consumption_batch(self._body(ids=ids))
+        self.assertEqual([it["order_reference"] for it in res["items"]], [f"CB-REF-{i}" for i in range(20)])
+        # 10 local hits, the other 10 found by a single date-bounded list call
+        self.assertEqual(len(self.provider.list_calls), 1)
+        self.assertIn("start_date", self.provider.list_calls[0])
+        self.assertEqual(len(self.provider.consumption_calls), 20)
+        # the scan wrote mappings back, so a second batch needs no list call
+        self.provider.list_calls.clear()
+        self.service._oid_ref_cache.clear()
+        self.service.orders_consumption_batch(self._body(ids=ids))
+        self.assertEqual(self.provider.list_calls, [])
+
+    def test_ids_outside_scan_window_fall_back_per_id(self):
+        res = self.service.orders_consumption_batch(self._body(ids=["CB-OID-1", "CB-OID-OLD", "CB-OID-NOPE"]))
+        self.assertEqual([it["order_reference"] for it in res["items"]], ["CB-REF-1", "CB-REF-OLD"])
+        per_id = [c for c in self.provider.list_calls if c.get("order_id")]
+        self.assertEqual(sorted(c["order_id"] for c in per_id), ["CB-OID-NOPE", "CB-OID-OLD"])
+
+    def test_concurrent_requests_share_in_flight_fetch(self):
+        self.provider.delay = 0.1
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.service.orders_consumption_batch(self._body(refs=["CB-REF-1", "CB-REF-2"]))))
+            for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(results), 4)
+        self.assertEqual(sorted(self.provider.consumption_calls), ["CB-REF-1", "CB-REF-2"])
+
+    def test_stream_yields_every_item(self):
+        items = list(self.service.orders_consumption_stream(self._body(refs=["CB-REF-3", "CB-REF-4", "CB-REF-5"])))
+        self.assertEqual(sorted(it["order_reference"] for it in items), ["CB-REF-3", "CB-REF-4", "CB-REF-5"])
+        self.assertTrue(all(it["usage"]["data_remaining"] == 100.0 for it in items))
+        self.assertEqual(list(self.service.orders_consumption_stream(self._body(refs=[]))), [])
+
+
+class TestConsumptionStreamRoute(unittest.TestCase):
+    def setUp(self):
+        try:
+            from fastapi.testclient import TestClient  # type: ignore
+        except Exception:
+            self.skipTest("fastapi not installed")
+        from server.app import main  # type: ignore
+        from server.app.db import SessionLocal  # type: ignore
+        from server.app.models.orm import User, UserOrder  # type: ignore
+        db = SessionLocal()
+        try:
+            db.query(UserOrder).filter(UserOrder.order_reference.like("S-%")).delete(synchronize_session=False)
+            for uid in ("cb1", "cb2"):
+                if db.get(User, uid) is None:
+                    db.add(User(id=uid, name=uid))
+            db.flush()
+            db.add(UserOrder(order_reference="S-1", user_id="cb1"))
+            db.add(UserOrder(order_reference="S-2", user_id="cb1"))
+            # another user's order
+            db.add(UserOrder(order_reference="S-9", user_id="cb2"))
+            db.commit()
+        finally:
+            db.close()
+        self.main = main
+        main.app.dependency_overrides[main.get_current_user] = lambda: User(id="cb1", name="cb1", language="en")
+        self.client = TestClient(main.app)
+
+    def tearDown(self):
+        self.main.app.dependency_overrides.pop(self.main.get_current_user, None)
+
+    def test_ndjson_lines(self):
+        resp = self.client.post("/orders/consumption/batch/stream", json={"order_references": ["S-1", "S-2", "S-9"]}, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(resp.status_code, 200, resp.text)
+        self.assertTrue(resp.headers["content-type"].startswith("application/x-ndjson"))
+        self.assertNotIn("content-encoding", resp.headers)
+        lines = [json.loads(l) for l in resp.text.splitlines() if l]
+        self.assertEqual(sorted(l["order_reference"] for l in lines), ["S-1", "S-2"])
+        self.assertTrue(all("plan_status_localized" in l["usage"] for l in lines))
+
+    def test_batch_skips_other_users_orders(self):
+        resp = self.client.post("/orders/consumption/batch", json={"order_references": ["S-9", "S-1"]})
+        self.assertEqual(resp.status_code, 200, resp.text)
+        self.assertEqual([it["order_reference"] for it in resp.json()["data"]["items"]], ["S-1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
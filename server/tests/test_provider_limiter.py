@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+import unittest
+
+try:
+    import httpx  # type: ignore
+except Exception:
+    httpx = None
+
+
+class _Peak:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.now = 0
+        self.peak = 0
+
+    def __enter__(self):
+        with self.lock:
+            self.now += 1
+            self.peak = max(self.peak, self.now)
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.now -= 1
+
+
+class TestUpstreamLimiter(unittest.TestCase):
+    def _limiter(self, **kw):
+        from server.app.provider.limiter import UpstreamLimiter  # type: ignore
+        params = {"total": 3, "budgets": {"/orders/consumption": 2}, "default_budget": 5, "queue_timeout_ms": 2000}
+        params.update(kw)
+        return UpstreamLimiter(**params)
+
+    def _hammer(self, limiter, paths, hold=0.03):
+        peaks = {p: _Peak() for p in set(paths)}
+        total = _Peak()
+
+        def call(path):
+            with limiter.slot(path):
+                with peaks[path], total:
+                    time.sleep(hold)
+
+        threads = [threading.Thread(target=call, args=(p,)) for p in paths]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return peaks, total
+
+    def test_endpoint_budget_and_global_cap(self):
+        limiter = self._limiter()
+        peaks, total = self._hammer(limiter, ["/orders/consumption"] * 6 + ["/bundle/list"] * 6)
+        self.assertLessEqual(peaks["/orders/consumption"].peak, 2)
+        self.assertLessEqual(total.peak, 3)
+        stats = limiter.stats()
+        self.assertEqual(stats["endpoints"]["/orders/consumption"]["acquired"], 6)
+        self.assertEqual(stats["endpoints"]["/orders/consumption"]["limit"], 2)
+        self.assertEqual(stats["global"]["inFlight"], 0)
+        self.assertGreater(stats["endpoints"]["/orders/consumption"]["maxQueued"], 0)
+
+    def test_queue_deadline(self):
+        from server.app.provider.limiter import UpstreamBusy  # type: ignore
+        limiter = self._limiter()
+        limiter.acquire("/orders/consumption")
+        limiter.acquire("/orders/consumption")
+        t0 = time.monotonic()
+        with self.assertRaises(UpstreamBusy):
+            limiter.acquire("/orders/consumption", timeout=0.05)
+        self.assertLess(time.monotonic() - t0, 1.0)
+        # the global slots are still available to other endpoints
+        with limiter.slot("/orders/detail", timeout=0):
+            pass
+        limiter.release("/orders/consumption")
+        limiter.release("/orders/consumption")
+        stats = limiter.stats()
+        self.assertEqual(stats["endpoints"]["/orders/consumption"]["timeouts"], 1)
+        self.assertEqual(stats["global"]["inFlight"], 0)
+
+    def test_budget_env_parsing(self):
+        from server.app.provider.limiter import _parse_budgets  # type: ignore
+        budgets = _parse_budgets("/orders/consumption=3, /custom=7,bad,/x=oops")
+        self.assertEqual(budgets["/orders/consumption"], 3)
+        self.assertEqual(budgets["/custom"], 7)
+        self.assertNotIn("/x", budgets)
+
+
+class TestUpstreamExecutor(unittest.TestCase):
+    def _executor(self, **kw):
+        from server.app.provider.limiter import UpstreamExecutor, UpstreamLimiter  # type: ignore
+        limiter = UpstreamLimiter(total=10, budgets={"/orders/consumption": 1}, queue_timeout_ms=5000)
+        params = {"workers": 2, "background_workers": 1, "limiter": limiter}
+        params.update(kw)
+        return UpstreamExecutor(**params), limiter
+
+    def test_saturated_pool_cancels_tasks_not_started_by_deadline(self):
+        ex, _ = self._executor()
+        release = threading.Event()
+        blockers = [ex.submit(release.wait, 5) for _ in range(2)]
+        ran = []
+        deadline = ex.deadline(0.1)
+        futs = [ex.submit(ran.append, i, deadline=deadline) for i in range(3)]
+        t0 = time.monotonic()
+        ex.wait(futs, deadline)
+        self.assertLess(time.monotonic() - t0, 1.0)
+        self.assertTrue(all(f.cancelled() for f in futs))
+        release.set()
+        for f in blockers:
+            f.result()
+        self.assertEqual(ran, [])
+        self.assertEqual(ex.stats()["cancelled"], 3)
+
+    def test_started_task_waits_for_slot_only_until_its_deadline(self):
+        from server.app.provider.limiter import UpstreamBusy  # type: ignore
+        ex, limiter = self._executor()
+        limiter.acquire("/orders/consumption")
+        try:
+            fut = ex.submit(lambda: limiter.slot("/orders/consumption").__enter__(), deadline=ex.deadline(0.1))
+            t0 = time.monotonic()
+            with self.assertRaises(UpstreamBusy):
+                fut.result(timeout=2)
+            # 限流器排队超时为 5s，任务截止时间 0.1s 生效
+            self.assertLess(time.monotonic() - t0, 1.0)
+        finally:
+            limiter.release("/orders/consumption")
+
+    def test_background_tasks_leave_workers_for_requests(self):
+        ex, _ = self._executor(workers=3, background_workers=1)
+        peak = _Peak()
+
+        def bg():
+            with peak:
+                time.sleep(0.1)
+
+        submitter = threading.Thread(target=lambda: [ex.submit(bg, background=True) for _ in range(4)])
+        submitter.start()
+        time.sleep(0.02)
+        t0 = time.monotonic()
+        started = ex.submit(time.monotonic, deadline=ex.deadline(1)).result(timeout=2)
+        self.assertLess(started - t0, 0.05)
+        submitter.join()
+        time.sleep(0.15)
+        self.assertEqual(peak.peak, 1)
+        self.assertEqual(ex.stats()["backgroundSubmitted"], 4)
+
+
+class TestProviderHTTPUsesLimiter(unittest.TestCase):
+    def setUp(self):
+        if httpx is None:
+            self.skipTest("httpx not installed")
+        self._env = {k: os.environ.get(k) for k in ("PROVIDER_FAKE", "PROVIDER_BASE_URL", "PROVIDER_ACCESS_TOKEN")}
+        os.environ["PROVIDER_FAKE"] = "false"
+        os.environ["PROVIDER_BASE_URL"] = "http://upstream.test"
+        os.environ["PROVIDER_ACCESS_TOKEN"] = "tok-1"
+
+    def tearDown(self):
+        for k, v in self._env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+    def test_sync_posts_are_bounded_per_endpoint(self):
+        from server.app.provider.auth import TokenManager  # type: ignore
+        from server.app.provider.http import ProviderHTTP  # type: ignore
+        from server.app.provider.limiter import UpstreamLimiter  # type: ignore
+        peak = _Peak()
+
+        def handler(request):
+            with peak:
+                time.sleep(0.02)
+            return httpx.Response(200, json={"code": 200, "msg": "", "data": {"order": {}}})
+
+        limiter = UpstreamLimiter(total=10, budgets={"/orders/consumption": 2}, queue_timeout_ms=2000)
+        http = ProviderHTTP(TokenManager(), limiter=limiter)
+        http._client = httpx.Client(transport=httpx.MockTransport(handler))
+        threads = [threading.Thread(target=http.post, args=("/orders/consumption", {"order_reference": str(i)})) for i in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(peak.peak, 2)
+        self.assertEqual(limiter.stats()["endpoints"]["/orders/consumption"]["acquired"], 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+
+
+class TestProviderRegistry(unittest.TestCase):
+    def setUp(self):
+        from server.app.provider import registry  # type: ignore
+        self.registry = registry
+        self._saved = registry._client
+        registry._client = None
+
+    def tearDown(self):
+        self.registry._client = self._saved
+
+    def test_shared_client_reused_until_closed(self):
+        first = self.registry.get_provider_client()
+        self.assertIs(self.registry.get_provider_client(), first)
+        self.registry.close_provider_clients()
+        self.assertTrue(first.http._client.is_closed)
+        second = self.registry.get_provider_client()
+        self.assertIsNot(second, first)
+        self.assertFalse(second.http._client.is_closed)
+        self.registry.close_provider_clients()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+import unittest
+
+
+class TestTokenManagerRefresh(unittest.TestCase):
+    def setUp(self):
+        self._env = {k: os.environ.get(k) for k in ("PROVIDER_FAKE", "PROVIDER_ACCESS_TOKEN")}
+        os.environ["PROVIDER_FAKE"] = "false"
+        os.environ.pop("PROVIDER_ACCESS_TOKEN", None)
+        from server.app.provider.auth import TokenManager  # type: ignore
+        self.mgr = TokenManager()
+        self.logins = 0
+        self._count_lock = threading.Lock()
+
+        def fake_login():
+            with self._count_lock:
+                self.logins += 1
+                n = self.logins
+            time.sleep(0.1)
+            self.mgr._token = f"tok-{n}"
+            self.mgr._expires_at = time.time() + 3600
+
+        self.mgr._agent_login = fake_login
+
+    def tearDown(self):
+        timer = self.mgr._timer
+        if timer is not None:
+            timer.cancel()
+        for k, v in self._env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+    def test_concurrent_expiry_logs_in_once(self):
+        tokens = []
+        threads = [threading.Thread(target=lambda: tokens.append(self.mgr.get_token())) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.logins, 1)
+        self.assertEqual(set(tokens), {"tok-1"})
+
+    def test_stale_401_refresh_is_coalesced(self):
+        first = self.mgr.get_token()
+        threads = [threading.Thread(target=self.mgr.refresh, kwargs={"stale_token": first}) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.logins, 2)
+        self.assertEqual(self.mgr.get_token(), "tok-2")
+
+    def test_coalesced_refresh_not_counted(self):
+        from server.app.provider.http import ProviderHTTP  # type: ignore
+        http = ProviderHTTP(self.mgr)
+        first = self.mgr.get_token()
+        threads = [threading.Thread(target=http._refresh_token, args=(first,)) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.logins, 2)
+        self.assertEqual(http.stats()["tokenRefreshes"], 1)
+
+    def test_early_renewal_does_not_block(self):
+        self.mgr._token = "old"
+        self.mgr._expires_at = time.time() + 60
+        self.mgr._renew_at = time.time() - 1
+        t0 = time.perf_counter()
+        self.assertEqual(self.mgr.get_token(), "old")
+        self.assertLess(time.perf_counter() - t0, 0.05)
+        deadline = time.time() + 2
+        while self.mgr._token == "old" and time.time() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(self.mgr._token, "tok-1")
+        self.assertGreater(self.mgr._renew_at, time.time())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+
+def _sample():
+    from server.app.models.dto import OrderDTO, UsageDTO  # type: ignore
+    order = OrderDTO(id="o1", bundleId="b1", amount=9.5, currency="GBP", createdAt=datetime(2024, 5, 1, 8, 30, 1, 250000), status="paid", paymentMethod="card")
+    usage = UsageDTO(remainingMb=512.0, expiresAt=datetime(2024, 6, 1, tzinfo=timezone.utc))
+    return {
+        "items": [{"order": order, "usage": usage, "extra": {"plan_status": "激活", "day": date(2024, 5, 2)}}],
+        "orders_count": 1,
+        "price": Decimal("3.50"),
+        "codes": ("HK", "JP"),
+        "raw": {1: "one"},
+    }
+
+
+class TestFastJSON(unittest.TestCase):
+    def _legacy(self, content):
+        from fastapi.encoders import jsonable_encoder  # type: ignore
+        from fastapi.responses import JSONResponse  # type: ignore
+        return JSONResponse(content=jsonable_encoder(content)).body
+
+    def test_matches_jsonable_encoder(self):
+        import json
+        from server.app.responses import FastJSONResponse, dumps  # type: ignore
+        content = _sample()
+        self.assertEqual(json.loads(dumps(content)), json.loads(self._legacy(content)))
+        self.assertEqual(FastJSONResponse(content=content).body, dumps(content))
+        self.assertIn("激活".encode("utf-8"), dumps(content))
+
+    def test_stdlib_fallback(self):
+        import json
+        from server.app import responses  # type: ignore
+        saved = responses.orjson
+        responses.orjson = None
+        try:
+            body = responses.dumps(_sample())
+            self.assertEqual(responses.json_backend(), "json")
+        finally:
+            responses.orjson = saved
+        self.assertEqual(json.loads(body), json.loads(self._legacy(_sample())))
+
+    def test_envelope(self):
+        from server.app.responses import envelope  # type: ignore
+        self.assertEqual(envelope([1]), {"code": 200, "data": [1], "msg": ""})
+        self.assertEqual(envelope(None, 404, "Bundle not found")["code"], 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+try:
+    from fastapi.testclient import TestClient  # type: ignore
+except Exception:
+    TestClient = None
+
+
+class TestRouteConcurrency(unittest.TestCase):
+    def setUp(self):
+        if TestClient is None:
+            self.skipTest("fastapi not installed")
+        import os
+        os.environ["PROVIDER_FAKE"] = "true"
+        from server.app import main  # type: ignore
+        self.main = main
+
+    def test_blocking_calls_do_not_serialize(self):
+        import asyncio
+        import time
+        import httpx
+
+        main = self.main
+        delay = 0.2
+        n = 8
+
+        def slow_regions(request_id=None):
+            time.sleep(delay)
+            return []
+
+        original = main.catalog_service.get_regions
+        main.catalog_service.get_regions = slow_regions
+        try:
+            async def run():
+                transport = httpx.ASGITransport(app=main.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    t0 = time.perf_counter()
+                    rs = await asyncio.gather(*(client.get("/catalog/regions") for _ in range(n)))
+                    return time.perf_counter() - t0, rs
+
+            elapsed, rs = asyncio.run(run())
+        finally:
+            main.catalog_service.get_regions = original
+        self.assertTrue(all(r.status_code == 200 for r in rs))
+        # 串行执行需要 n * delay；线程池并发时应接近单次延迟
+        self.assertLess(elapsed, n * delay / 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
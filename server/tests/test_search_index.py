@@ -0,0 +1,169 @@
+import unittest
+
+
+class _CatalogProvider:
+    def __init__(self):
+        self.countries = [
+            {"iso2_code": "HK", "iso3_code": "HKG", "country_name": "Hong Kong"},
+            {"iso2_code": "TR", "iso3_code": "TUR", "country_name": "Turkey"},
+            {"iso2_code": "HU", "iso3_code": "HUN", "country_name": "Hungary"},
+        ]
+        self.bundles = [
+            {"bundle_code": f"B{i:03d}", "bundle_name": f"Bundle {i:03d}", "bundle_marketing_name": "Global",
+             "country_code": [], "gprs_limit": 1, "data_unit": "GB", "validity": 7}
+            for i in range(150)
+        ]
+        self.bundles.append({"bundle_code": "HKG_9", "bundle_name": "Hong Kong 5GB", "bundle_marketing_name": "Hong Kong",
+                             "country_code": ["HKG"], "country_name": ["Hong Kong"], "gprs_limit": 5, "data_unit": "GB", "validity": 30})
+
+    def get_countries(self, request_id=None):
+        return self.countries
+
+    def get_regions(self, request_id=None):
+        return [{"region_code": "eu", "region_name": "Europe"}, {"region_code": "as", "region_name": "Asia"}]
+
+    def get_bundle_list(self, page_number, page_size, **kwargs):
+        start = (page_number - 1) * page_size
+        return {"bundles": self.bundles[start:start + page_size], "bundles_count": len(self.bundles)}
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        from server.app.db import Base, engine  # type: ignore
+        Base.metadata.create_all(bind=engine)
+        from server.app.services.catalog_service import CatalogService  # type: ignore
+        from server.app.services.catalog_mirror import BundleCatalogMirror  # type: ignore
+        self.provider = _CatalogProvider()
+        self.mirror = BundleCatalogMirror(provider=self.provider)
+        self.svc = CatalogService(provider=self.provider, mirror=self.mirror)
+
+    def _ids(self, q, **kwargs):
+        return [(r.kind, r.id) for r in self.svc.search(q, **kwargs)]
+
+    def test_prefix_and_ranking(self):
+        self.assertEqual(self._ids("hk", limit=1), [("country", "HK")])
+        self.assertEqual(self._ids("hu"), [("country", "HU")])
+        self.assertEqual(self._ids("hong ko", include=["country"]), [("country", "HK")])
+        self.assertEqual(self._ids("eur"), [("region", "eu")])
+
+    def test_aliases_expand(self):
+        # 索引时别名（_TERRITORY_ALIASES）与查询时别名（营销名 / 地区别名）
+        self.assertIn(("country", "TR"), self._ids("turkiye"))
+        self.assertIn(("region", "eu"), self._ids("europa"))
+
+    def test_full_catalog_once_mirror_ready(self):
+        self.assertNotIn(("bundle", "HKG_9"), self._ids("5gb", include=["bundle"]))
+        self.mirror.sync()
+        self.assertEqual(self._ids("5gb", include=["bundle"]), [("bundle", "HKG_9")])
+        top = self._ids("bundle 14", include=["bundle"], limit=3)
+        self.assertEqual(len(top), 3)
+        self.assertTrue(all(i.startswith("B14") for _, i in top))
+
+    def test_segments_rebuild_independently(self):
+        self.svc.search("hong")
+        stats = self.svc.search_stats()
+        rebuilds = stats["rebuilds"]
+        self.svc.search("hong")
+        self.assertEqual(self.svc.search_stats()["rebuilds"], rebuilds)
+        self.mirror.sync()
+        self.svc.search("hong")
+        self.assertEqual(self.svc.search_stats()["rebuilds"], rebuilds + 1)
+
+    def test_result_cache(self):
+        first = self._ids("Hong Kong", include=["country", "bundle"])
+        self.assertEqual(self._ids("  HONG kong ", include=["country", "bundle"]), first)
+        cache = self.svc.search_stats()["resultCache"]
+        self.assertEqual((cache["hits"], cache["misses"]), (1, 1))
+        # include 顺序、limit 不同 → 不同 key
+        self._ids("hong kong", include=["bundle", "country"])
+        self._ids("hong kong", include=["country", "bundle"], limit=1)
+        self.assertEqual(self.svc.search_stats()["resultCache"]["misses"], 3)
+        # 目录变化 → 旧结果失效
+        self.mirror.sync()
+        self.assertIn(("bundle", "HKG_9"), self._ids("hong kong", include=["country", "bundle"]))
+        cache = self.svc.search_stats()["resultCache"]
+        self.assertEqual((cache["hits"], cache["misses"]), (1, 4))
+
+    def test_cached_search_skips_data_sources(self):
+        self.svc.search("hong")
+        reads = []
+        orig = self.svc.get_countries_versioned
+        self.svc.get_countries_versioned = lambda request_id=None: reads.append(1) or orig(request_id=request_id)
+        self.svc.search("hong")
+        self.svc.search("turkey")
+        self.assertEqual(reads, [])
+        self.assertEqual(self.svc.search_stats()["resultCache"]["hits"], 1)
+
+    def test_source_change_rebuilds_segment_via_listener(self):
+        self.assertEqual(self._ids("xanadu", include=["country"]), [])
+        self.provider.countries.append({"iso2_code": "XA", "iso3_code": "XAN", "country_name": "Xanadu"})
+        self.svc._entries.clear()
+        self.svc.get_countries()
+        self.svc._refresher.shutdown(wait=True)
+        self.assertEqual(self._ids("xanadu", include=["country"]), [("country", "XA")])
+
+    def test_cjk_substring(self):
+        from server.app.services.search_index import SearchDoc, SearchIndex  # type: ignore
+        from server.app.models.dto import SearchResultDTO  # type: ignore
+        d = SearchDoc("country", SearchResultDTO(kind="country", id="HK", title="Hong Kong"))
+        d.add("中国香港", 1.0, "zh-Hans")
+        idx = SearchIndex()
+        idx.refresh("country", 1, lambda: [d])
+        for q in ("香港", "香", "中国香港"):
+            self.assertEqual([r.id for r in idx.search([(q, 1.0)], ["country"])], ["HK"], q)
+        self.assertEqual(idx.search([("港中", 1.0)], ["country"]), [])
+
+
+class TestSuggest(unittest.TestCase):
+    def setUp(self):
+        from server.app.db import Base, engine  # type: ignore
+        Base.metadata.create_all(bind=engine)
+        from server.app.services.catalog_service import CatalogService  # type: ignore
+        from server.app.services.catalog_mirror import BundleCatalogMirror  # type: ignore
+        provider = _CatalogProvider()
+        mirror = BundleCatalogMirror(provider=provider)
+        mirror.sync()
+        self.svc = CatalogService(provider=provider, mirror=mirror)
+
+    def test_prefix_suggestions(self):
+        out = self.svc.suggest("hon", lang="en")
+        self.assertEqual((out[0].kind, out[0].id), ("country", "HK"))
+        self.assertIn("HKG_9", [r.id for r in out])
+        self.assertEqual([r.id for r in self.svc.suggest("kong", include=["country"], lang="en")], ["HK"])
+        self.assertEqual([r.id for r in self.svc.suggest("tur", include=["country"])], ["TR"])
+        self.assertEqual(len(self.svc.suggest("bundle 1", include=["bundle"], limit=5)), 5)
+        self.assertEqual(self.svc.suggest("zzz"), [])
+
+    def test_exact_code_ranks_first(self):
+        out = self.svc.suggest("hu", limit=3)
+        self.assertEqual(out[0].id, "HU")
+
+    def test_tables_are_per_language_and_reused(self):
+        self.svc.suggest("hon", lang="en")
+        self.svc.suggest("hon", lang="ja")
+        table = self.svc._suggest_tables["en"]
+        self.svc.suggest("hung", lang="en")
+        self.assertIs(self.svc._suggest_tables["en"], table)
+        self.assertEqual(self.svc.search_stats()["suggestLanguages"], ["en", "ja"])
+
+
+class TestSuggestRoute(unittest.TestCase):
+    def test_route(self):
+        try:
+            from fastapi.testclient import TestClient  # type: ignore
+        except Exception:
+            self.skipTest("fastapi not installed")
+        import os
+        os.environ["PROVIDER_FAKE"] = "true"
+        from server.app.main import app  # type: ignore
+        from server.app.db import Base, engine  # type: ignore
+        Base.metadata.create_all(bind=engine)
+        client = TestClient(app)
+        r = client.get("/search/suggest", params={"q": "eu", "lang": "en"})
+        self.assertEqual(r.status_code, 200)
+        self.assertIn("eu", [x["id"] for x in r.json()])
+        self.assertEqual(client.get("/search/suggest", params={"q": "eu", "limit": 50}).status_code, 422)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import unittest
+from datetime import datetime, timedelta
+
+
+def _usage(remaining=800.0, allocated=1024.0, status="Active", expires_in=timedelta(days=10)):
+    return {
+        "plan_status": status,
+        "data_allocated": allocated,
+        "data_remaining": remaining,
+        "data_used": allocated - remaining,
+        "data_unit": "MB",
+        "bundle_expiry_date": (datetime.utcnow() + expires_in).strftime("%Y-%m-%d %H:%M:%S.%f"),
+    }
+
+
+class _UsageProvider:
+    def __init__(self, orders=()):
+        self.orders = list(orders)
+        self.consumption_calls = []
+
+    def get_order_consumption_v2(self, order_reference, request_id=None):
+        self.consumption_calls.append(order_reference)
+        return _usage()
+
+    def list_orders_v2(self, page_number, page_size, filters=None, request_id=None):
+        return {"orders": [], "orders_count": 0}
+
+
+class TestUsageRefresher(unittest.TestCase):
+    def setUp(self):
+        from server.app.db import Base, SessionLocal, engine  # type: ignore
+        from server.app.models.orm import OrderUsage  # type: ignore
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        try:
+            db.query(OrderUsage).delete()
+            db.commit()
+        finally:
+            db.close()
+        from server.app.services.usage_store import UsageRefresher  # type: ignore
+        self.provider = _UsageProvider()
+        self.usage = UsageRefresher(provider=self.provider)
+
+    def _row(self, ref):
+        from server.app.db import SessionLocal  # type: ignore
+        from server.app.models.orm import OrderUsage  # type: ignore
+        db = SessionLocal()
+        try:
+            return db.get(OrderUsage, ref)
+        finally:
+            db.close()
+
+    def test_viewed_refs_are_queued_and_refreshed(self):
+        self.assertEqual(self.usage.get_many(["U1", "U2"]), {})
+        # reads do not write; the refresher flushes the viewed refs in its tick
+        self.assertIsNone(self._row("U1"))
+        self.assertEqual(self.usage.flush_viewed(), 2)
+        self.assertEqual(sorted(self.usage.due(10)), ["U1", "U2"])
+        self.assertEqual(self.usage.refresh_due(), 2)
+        got = self.usage.get_many(["U1", "U2"])
+        self.assertEqual(set(got), {"U1", "U2"})
+        self.assertEqual(got["U1"]["data_remaining"], 800.0)
+        # viewed rows come back after the short viewed interval, not immediately
+        self.usage.flush_viewed()
+        self.assertEqual(self.usage.due(10), [])
+        self.assertEqual(self._row("U1").priority, 0)
+
+    def test_priority_schedule(self):
+        self.usage.put("NEAR", _usage(expires_in=timedelta(hours=2)))
+        self.usage.put("LOW", _usage(remaining=50.0))
+        self.usage.put("ACTIVE", _usage())
+        self.usage.put("IDLE", _usage(status="Plan Not Started", remaining=1024.0))
+        self.usage.put("DONE", _usage(status="Expired"))
+        self.assertEqual(self._row("NEAR").priority, 1)
+        self.assertEqual(self._row("LOW").priority, 1)
+        self.assertEqual(self._row("ACTIVE").priority, 2)
+        self.assertEqual(self._row("IDLE").priority, 3)
+        self.assertIsNone(self._row("DONE").next_refresh_at)
+        self.assertLess(self._row("NEAR").next_refresh_at, self._row("ACTIVE").next_refresh_at)
+        self.assertLess(self._row("ACTIVE").next_refresh_at, self._row("IDLE").next_refresh_at)
+
+    def test_old_usage_is_a_miss(self):
+        self.usage.put("AGED", _usage())
+        self.assertIn("AGED", self.usage.get_many(["AGED"]))
+        from server.app.db import SessionLocal  # type: ignore
+        from server.app.models.orm import OrderUsage  # type: ignore
+        db = SessionLocal()
+        try:
+            db.get(OrderUsage, "AGED").fetched_at = datetime.utcnow() - timedelta(seconds=self.usage.max_age_seconds + 60)
+            db.commit()
+        finally:
+            db.close()
+        self.assertEqual(self.usage.get_many(["AGED"]), {})
+        self.assertEqual(self.usage.stats()["readExpired"], 1)
+
+    def test_due_order_and_rate_limit(self):
+        self.usage.get_many(["A", "B", "C"])
+        self.usage.flush_viewed()
+        self.usage.put("OLD", _usage())
+        from server.app.db import SessionLocal  # type: ignore
+        from server.app.models.orm import OrderUsage  # type: ignore
+        db = SessionLocal()
+        try:
+            db.get(OrderUsage, "OLD").next_refresh_at = datetime.utcnow() - timedelta(hours=1)
+            db.commit()
+        finally:
+            db.close()
+        # priority 0 (viewed) before the long-overdue priority 2 row
+        self.assertEqual(self.usage.due(10)[-1], "OLD")
+        self.usage.limiter.tokens = 1
+        self.usage.limiter.rate = 0.001
+        self.usage.tick = 0
+        self.assertEqual(self.usage.refresh_due(), 1)
+        self.assertEqual(self.usage.stats()["rateLimited"], 3)
+
+    def test_failed_fetch_backs_off(self):
+        self.provider.get_order_consumption_v2 = lambda order_reference, request_id=None: {}
+        self.usage.get_many(["F1"])
+        self.usage.refresh_due()
+        row = self._row("F1")
+        self.assertEqual(row.errors, 1)
+        self.assertGreater(row.next_refresh_at, datetime.utcnow())
+
+
+class TestListWithUsageFromStore(unittest.TestCase):
+    def setUp(self):
+        from server.app.db import Base, SessionLocal, engine  # type: ignore
+        from server.app.models.orm import OrderReferenceEmail, OrderUsage, User, UserOrder  # type: ignore
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        try:
+            db.query(OrderUsage).delete()
+            db.query(UserOrder).delete()
+            db.query(OrderReferenceEmail).filter(OrderReferenceEmail.user_id == "us1").delete(synchronize_session=False)
+            if db.get(User, "us1") is None:
+                db.add(User(id="us1", name="us1"))
+            db.commit()
+        finally:
+            db.close()
+        from server.app.services.order_service import OrderService  # type: ignore
+        self.provider = _UsageProvider()
+        self.service = OrderService(provider=self.provider)
+        orders = [
+            {"order_id": f"US-OID-{i}", "order_reference": f"US-REF-{i}", "bundle_code": "B", "created_at": 1714550000 + i, "order_status": "Successful"}
+            for i in range(12)
+        ]
+        self.service.index.ingest(orders, user_id="us1")
+
+    def test_every_order_on_the_page_gets_stored_usage(self):
+        from server.app.models.dto import OrdersListWithUsageQuery  # type: ignore
+        for i in range(12):
+            self.service.usage.put(f"US-REF-{i}", _usage(remaining=100.0 + i))
+        res = self.service.orders_list_with_usage(OrdersListWithUsageQuery(page_number=1, page_size=10), user_id="us1")
+        self.assertEqual(len(res["items"]), 10)
+        self.assertTrue(all(it["usage"].get("data_remaining") for it in res["items"]))
+        self.assertEqual(self.provider.consumption_calls, [])
+
+    def test_missing_usage_is_fetched_up_to_limit_and_queued(self):
+        from server.app.models.dto import OrdersListWithUsageQuery  # type: ignore
+        res = self.service.orders_list_with_usage(OrdersListWithUsageQuery(page_number=1, page_size=10), user_id="us1", max_usage=3)
+        self.assertEqual(len(self.provider.consumption_calls), 3)
+        self.assertEqual(sum(1 for it in res["items"] if it["usage"]), 3)
+        # the other 7 are waiting for the background refresher
+        self.service.usage.flush_viewed()
+        self.assertEqual(len(self.service.usage.due(20)), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
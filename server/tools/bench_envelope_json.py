@@ -0,0 +1,107 @@
+"""Micro-benchmark for envelope serialization.
+
+Compares the previous encoding path (`jsonable_encoder(...)` + `JSONResponse`,
+stdlib json) with `FastJSONResponse` (orjson when installed, DTOs dumped by
+pydantic directly) on two representative bodies:
+
+- a 100-item `/bundle/list` envelope (plain dicts, as returned by the catalog)
+- a 100-item `/orders/list-with-usage` envelope (OrderDTO + usage dict per item)
+
+Usage (from server/):
+    python tools/bench_envelope_json.py --iterations 500
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from app.models.dto import InstallationDTO, OrderDTO  # noqa: E402
+from app.responses import FastJSONResponse, envelope, json_backend  # noqa: E402
+
+
+def bundle_list_body(n: int = 100) -> dict:
+    bundles = [
+        {
+            "bundle_code": f"HKG_{i:04d}",
+            "bundle_name": f"香港 {i % 20 + 1}GB {7 + i % 4 * 7}天",
+            "bundle_marketing_name": "中国香港",
+            "bundle_category": "country",
+            "bundle_price_final": 3.5 + i * 0.25,
+            "currency": "GBP",
+            "country_code": ["HKG"],
+            "country_name": ["中国香港"],
+            "region_code": "as",
+            "region_name": "亚洲",
+            "gprs_limit": i % 20 + 1,
+            "data_unit": "GB",
+            "validity": 7 + i % 4 * 7,
+            "unlimited": False,
+            "support_topup": True,
+            "sms_amount": 0,
+            "voice_amount": 0,
+        }
+        for i in range(n)
+    ]
+    return envelope({"bundles": bundles, "bundles_count": 1200})
+
+
+def list_with_usage_body(n: int = 100) -> dict:
+    base = datetime(2024, 5, 1, 8, 30)
+    items = []
+    for i in range(n):
+        order = OrderDTO(
+            id=f"ord_{i:06d}",
+            bundleId=f"HKG_{i % 50:04d}",
+            amount=9.99,
+            currency="GBP",
+            createdAt=base + timedelta(hours=i),
+            status="paid",
+            paymentMethod="card",
+            installation=InstallationDTO(activationCode=f"LPA:1$smdp.example.com${i:08d}", smdp="smdp.example.com"),
+        )
+        usage = {
+            "order_reference": f"ref_{i:06d}",
+            "plan_status": "Active",
+            "plan_status_localized": "使用中",
+            "data_allocated": 10240,
+            "data_remaining": 10240 - i * 37,
+            "data_used": i * 37,
+            "data_unit": "MB",
+            "bundle_expiry_date": (base + timedelta(days=30)).isoformat(),
+        }
+        items.append({"order": order, "usage": usage})
+    return envelope({"items": items, "orders_count": n})
+
+
+def _bench(fn, iterations: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - t0) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+    print(f"backend: {json_backend()}")
+    for name, body in (("/bundle/list x100", bundle_list_body()), ("/orders/list-with-usage x100", list_with_usage_body())):
+        legacy = JSONResponse(content=jsonable_encoder(body)).body
+        fast = FastJSONResponse(content=body).body
+        if json.loads(legacy) != json.loads(fast):
+            print(f"warning: {name} output differs")
+        before = _bench(lambda: JSONResponse(content=jsonable_encoder(body)), args.iterations)
+        after = _bench(lambda: FastJSONResponse(content=body), args.iterations)
+        print(f"{name:30s} jsonable_encoder+JSONResponse {before:9.1f} us | FastJSONResponse {after:8.1f} us | {before / after:5.1f}x | {len(fast)} bytes")
+
+
+if __name__ == "__main__":
+    main()
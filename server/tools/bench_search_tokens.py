@@ -0,0 +1,70 @@
+"""Micro-benchmark for /search query expansion.
+
+Compares the previous token expansion (one I18nCountryName query per 2-letter
+token, via a fresh DB session per search) with `expand_query`, which now
+resolves iso2 <-> iso3 <-> localized names from the in-memory country code
+table. Both produce the same ISO3 variants; only the lookup path differs.
+
+Usage (from server/):
+    python tools/bench_search_tokens.py --iterations 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.db import SessionLocal, init_db  # noqa: E402
+from app.i18n import country_code_table, reload_translations  # noqa: E402
+from app.models.orm import I18nCountryName  # noqa: E402
+from app.services.search_index import expand_query, normalize  # noqa: E402
+
+QUERIES = ["hk", "jp", "europe", "香港", "turkiye", "us", "japan", "th", "global", "de"]
+
+
+def legacy_iso3_variants(term: str) -> list:
+    """Previous behaviour: DB lookup for every 2-letter token."""
+    toks = [normalize(term)]
+    out = []
+    db = SessionLocal()
+    try:
+        for t in toks:
+            if len(t) == 2:
+                r = db.query(I18nCountryName).filter(I18nCountryName.iso2_code == t.upper()).first()
+                if r and r.iso3_code:
+                    out.append(normalize(r.iso3_code))
+    finally:
+        db.close()
+    return out
+
+
+def _bench(fn, iterations: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(iterations):
+        fn(QUERIES[i % len(QUERIES)])
+    return (time.perf_counter() - t0) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    init_db()
+    reload_translations()
+    country_code_table()
+    for q in QUERIES:
+        legacy = set(legacy_iso3_variants(q))
+        current = {v for v, _ in expand_query(q, "en")}
+        missing = legacy - current
+        if missing:
+            print(f"warning: {q!r} lost variants {sorted(missing)}")
+    before = _bench(legacy_iso3_variants, args.iterations)
+    after = _bench(lambda q: expand_query(q, "en"), args.iterations)
+    print(f"legacy DB lookups : {before:8.1f} us/query (iso3 lookup only)")
+    print(f"expand_query      : {after:8.1f} us/query (full alias expansion)")
+    print(f"speedup           : {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
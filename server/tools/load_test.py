@@ -0,0 +1,66 @@
+"""In-process load test for the sync-route execution model.
+
+Drives the ASGI app through httpx.ASGITransport with N concurrent clients while
+the catalog service is replaced by a stub that sleeps for a simulated upstream
+latency. Because routes are plain `def` handlers running in the anyio
+threadpool, throughput should grow with concurrency up to SERVER_THREADPOOL_SIZE.
+
+Usage (from server/):
+    python tools/load_test.py --concurrency 1 8 32 --latency-ms 100 --requests 64
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("PROVIDER_FAKE", "true")
+
+import anyio.to_thread  # noqa: E402
+import httpx  # noqa: E402
+
+from app import main  # noqa: E402
+
+
+async def _run_level(concurrency: int, total: int, path: str) -> float:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with sem:
+                r = await client.get(path)
+                r.raise_for_status()
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return time.perf_counter() - t0
+
+
+async def _main(args) -> None:
+    anyio.to_thread.current_default_thread_limiter().total_tokens = args.threadpool
+    delay = args.latency_ms / 1000.0
+
+    def slow_regions(request_id=None):
+        time.sleep(delay)
+        return []
+
+    main.catalog_service.get_regions = slow_regions  # type: ignore[assignment]
+    print(f"threadpool={args.threadpool} latency={args.latency_ms}ms requests={args.requests}")
+    for c in args.concurrency:
+        elapsed = await _run_level(c, args.requests, "/catalog/regions")
+        print(f"concurrency={c:>4}  elapsed={elapsed:6.2f}s  rps={args.requests / elapsed:8.1f}")
+
+
+def run() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    p.add_argument("--requests", type=int, default=64)
+    p.add_argument("--latency-ms", type=int, default=100)
+    p.add_argument("--threadpool", type=int, default=int(os.getenv("SERVER_THREADPOOL_SIZE", "40")))
+    asyncio.run(_main(p.parse_args()))
+
+
+if __name__ == "__main__":
+    run()